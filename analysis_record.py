@@ -0,0 +1,129 @@
+#@title ##**16.analysis_record.py**
+# %%writefile analysis_record.py
+import sys
+
+import numpy as np
+import pandas as pd
+
+from stock_analyzer import StockAnalyzer
+
+# 분석 결과 지표 순서 (마지막 항목은 '{검증일수}일후_평균_수익률')
+METRIC_KEYS = ('전체_매수_시그널', '성공_시그널', '실패_시그널', '성공률', '평균_수익률',
+               '최대_수익률', '평균_손실률', '최대_손실률')
+COUNT_KEYS = ('전체_매수_시그널', '성공_시그널', '실패_시그널')
+
+# records_frame 열 순서
+RECORD_COLUMNS = (['티커', '종목명', '시장', '시작일', '종료일', '검증일수', '최근_시그널', '마지막_시그널일'] +
+                  list(METRIC_KEYS) + ['기간_평균_수익률'])
+
+# 세션(분석 작업) 하나가 결과와 차트 데이터에 쓸 수 있는 메모리 (바이트)
+SESSION_MEMORY_BUDGET = 64 * 1024 * 1024
+
+
+class AnalysisRecord:
+    """종목 하나의 분석 결과 요약
+
+    StockAnalyzer와 전체 DataFrame 대신 지표 배열과 시그널 날짜/진입가/
+    검증기간 최고가/성공여부만 보관한다. 차트가 필요하면 load_analyzer로
+    로컬 저장소(또는 시장 패널)에서 다시 계산한다.
+    """
+
+    __slots__ = ('selected_stock', 'ticker', 'start_date', 'end_date', 'verify_days',
+                 'metrics', 'recent_signal', 'signal_dates', 'entry_prices', 'forward_max', 'outcomes')
+
+    def __init__(self, selected_stock, ticker, start_date, end_date, verify_days,
+                 metrics, recent_signal, signal_dates, entry_prices, forward_max, outcomes):
+        self.selected_stock = selected_stock
+        self.ticker = ticker
+        self.start_date = start_date
+        self.end_date = end_date
+        self.verify_days = verify_days
+        self.metrics = metrics
+        self.recent_signal = recent_signal
+        self.signal_dates = signal_dates
+        self.entry_prices = entry_prices
+        self.forward_max = forward_max
+        self.outcomes = outcomes
+
+    @classmethod
+    def from_analyzer(cls, selected_stock, analyzer, results):
+        """분석이 끝난 StockAnalyzer에서 요약 결과 생성"""
+        verify_days = analyzer.signal_verify_days
+        signal_mask = analyzer.df['Signal'].to_numpy() == 1
+        metrics = np.array([results[key] for key in METRIC_KEYS] +
+                           [results[f'{verify_days}일후_평균_수익률']], dtype=float)
+        return cls(
+            selected_stock, analyzer.ticker, analyzer.start_date, analyzer.end_date, verify_days,
+            metrics, analyzer.has_recent_signal(),
+            analyzer.df.index[signal_mask].to_numpy(),
+            analyzer.signal_outcomes['entry'][signal_mask],
+            analyzer.signal_outcomes['max'][signal_mask],
+            analyzer.signal_outcomes['outcome'][signal_mask]
+        )
+
+    @property
+    def name(self):
+        return self.selected_stock.split(":")[1].strip()
+
+    @property
+    def market(self):
+        return "KOSPI" if "[KOSPI]" in self.selected_stock else "KOSDAQ"
+
+    @property
+    def results(self):
+        """StockAnalyzer.analyze_stock이 반환하던 형식의 결과 dict"""
+        values = dict(zip(METRIC_KEYS, self.metrics[:-1].tolist()))
+        for key in COUNT_KEYS:
+            values[key] = int(values[key])
+        values[f'{self.verify_days}일후_평균_수익률'] = float(self.metrics[-1])
+        return values
+
+    def to_row(self):
+        """저장/내보내기용 한 행 dict (검증일수별 평균 수익률은 '기간_평균_수익률')"""
+        row = {
+            '티커': self.ticker,
+            '종목명': self.name,
+            '시장': self.market,
+            '시작일': self.start_date,
+            '종료일': self.end_date,
+            '검증일수': self.verify_days,
+            '최근_시그널': bool(self.recent_signal),
+            '마지막_시그널일': pd.Timestamp(self.signal_dates[-1]) if len(self.signal_dates) else pd.NaT
+        }
+        row.update(zip(METRIC_KEYS, self.metrics[:-1].tolist()))
+        for key in COUNT_KEYS:
+            row[key] = int(row[key])
+        row['기간_평균_수익률'] = float(self.metrics[-1])
+        return row
+
+    def nbytes(self):
+        """레코드가 차지하는 대략적인 메모리 (바이트)"""
+        arrays = (self.metrics, self.signal_dates, self.entry_prices, self.forward_max, self.outcomes)
+        return (sys.getsizeof(self) + sys.getsizeof(self.selected_stock) + sys.getsizeof(self.ticker) +
+                sum(array.nbytes for array in arrays))
+
+    def load_analyzer(self, panel=None, chart_indicators=()):
+        """차트 표시용 StockAnalyzer를 다시 계산해 반환"""
+        analyzer = StockAnalyzer(panel=panel)
+        analyzer.signal_verify_days = self.verify_days
+        analyzer.set_chart_indicators(chart_indicators)
+        analyzer.ticker, analyzer.start_date, analyzer.end_date = self.ticker, self.start_date, self.end_date
+        if analyzer.get_stock_data(self.ticker, self.start_date, self.end_date) is None:
+            return None
+        if 'Signal' not in analyzer.df.columns:
+            analyzer.calculate_technical_indicators()
+            analyzer.generate_signals()
+        analyzer.analyze_performance()
+        return analyzer
+
+
+def analyzer_nbytes(analyzer):
+    """차트용으로 다시 만든 StockAnalyzer의 DataFrame 메모리 (바이트)"""
+    if analyzer is None or analyzer.df is None:
+        return 0
+    return int(analyzer.df.memory_usage(deep=True).sum())
+
+
+def records_frame(records):
+    """AnalysisRecord 목록을 종목별 한 행의 DataFrame으로 변환"""
+    return pd.DataFrame([record.to_row() for record in records], columns=RECORD_COLUMNS)
@@ -2,112 +2,154 @@
 # %%writefile app.py
 
 # app.py
+import time
 import streamlit as st
-from stock_selector import StockSelector
-from stock_display import StockDisplay
-from stock_analyzer import StockAnalyzer
 from side_menu import SideMenu
+from page_profile import load_page, page_stats, record_run
+
+# 메뉴별 모듈(pykrx, pandas, plotly 등)은 page_profile.load_page로 처음 열 때 import
+
+# 분석 진행 중 화면 갱신 주기 (초)
+POLL_INTERVAL = 1.0
 
 def main():
     st.set_page_config(page_title="이호소프트 AI 시스템", layout="wide")
 
-    side_menu = SideMenu()
+    side_menu = SideMenu(show_stock_analysis, show_parameter_sweep, show_portfolio_backtest)
     selected_menu, sub_menu = side_menu.show_menu()
+    page = sub_menu or selected_menu
+
+    import_seconds = load_page(page)
+    side_menu.show_page_stats(page_stats(page), import_seconds)
 
-    if selected_menu == "Home":
-        side_menu.show_home()
-    elif selected_menu == "주식분석시스템":
-        if sub_menu == "증권분석(test)":
-            show_stock_analysis()
-        elif sub_menu == "증권분석2":
-            side_menu.show_analysis2()
-        elif sub_menu == "증권분석3":
-            side_menu.show_analysis3()
+    started = time.perf_counter()
+    try:
+        # 메뉴 이름 -> 화면 함수 (서브 메뉴가 있으면 서브 메뉴 이름으로 한 번 더 찾음)
+        handler = side_menu.menu_items[selected_menu]
+        if sub_menu is not None:
+            handler = handler[sub_menu]
+        handler()
+    finally:
+        # st.rerun()으로 빠져나가는 경우도 포함해 메뉴별 실행 시간 기록
+        record_run(page, time.perf_counter() - started)
 
 
 # app.py
 # @st.cache_data
 def show_stock_analysis():
-    st.title("주식 기술적 분석")
+    from stock_selector import StockSelector
+    from stock_display import StockDisplay
+    from job_runner import get_job_manager
 
-    # 세션 상태 초기화
-    if 'initialized' not in st.session_state:
-        st.session_state.initialized = True
-        st.session_state.analysis_running = False
-        st.session_state.analysis_paused = False
-        st.session_state.analysis_index = 0
-        st.session_state.current_stocks = []
-        st.session_state.analysis_results = {}
+    st.title("주식 기술적 분석")
 
     selector = StockSelector()
     selection = selector.show_selector()
 
     display_manager = StockDisplay()
-    display_manager.initialize_display()
-
-    if selection['selected_stocks']:
-        if st.session_state.analysis_running and not st.session_state.analysis_paused:
-            # 새로운 분석 시작 시
-            if not st.session_state.current_stocks:
-                st.session_state.current_stocks = selection['selected_stocks']
-                display_manager.create_placeholders(st.session_state.current_stocks)
-
-            error_stocks = []
-            total_stocks = len(st.session_state.current_stocks)
-
-            # 이전 결과 표시
-            if st.session_state.analysis_results:
-                for stock in st.session_state.analysis_results:
-                    analyzer, results = st.session_state.analysis_results[stock]
-                    display_manager.display_stock_result(stock, analyzer, results, selector.signal_verify_days)
-
-            # 새로운 분석 진행
-            for idx in range(st.session_state.analysis_index, total_stocks):
-                if st.session_state.analysis_paused:
-                    st.warning(f"분석이 일시중지되었습니다. ({idx}/{total_stocks})")
-                    break
-
-                selected_stock = st.session_state.current_stocks[idx]
-                display_manager.update_progress(idx, total_stocks)
-
-                try:
-                    ticker = selected_stock.split(":")[0].split("]")[1].strip()
-                    stock_name = selected_stock.split(":")[1].strip()
-
-                    # display_manager.status_text.text(f"분석 중: {stock_name}")
-                    display_manager.update_status(f"분석 중: {stock_name}")
-                    analyzer = StockAnalyzer()
-                    analyzer.set_display_option(selection['show_all'], selection['show_recent_only'], selection['market_cap_filter'], selection['signal_verify_days'], selection['daekum_cap_filter'])
-                    df, results = analyzer.analyze_stock(ticker, selection['start_date'], selection['end_date'])
-
-                    if df is not None and results is not None:
-                        st.session_state.analysis_results[selected_stock] = (analyzer, results)
-                        display_manager.display_stock_result(selected_stock, analyzer, results, selector.signal_verify_days)
-                    else:
-                        if selected_stock in display_manager.result_placeholders:
-                            display_manager.result_placeholders[selected_stock].empty()
-
-                except Exception as e:
-                    error_stocks.append(f"{stock_name} (오류: {str(e)})")
-                    if selected_stock in display_manager.result_placeholders:
-                        display_manager.result_placeholders[selected_stock].empty()
-                    continue
-
-                st.session_state.analysis_index = idx + 1
-
-            if st.session_state.analysis_index >= total_stocks:
-                st.session_state.analysis_running = False
-                st.session_state.analysis_paused = False
-                display_manager.display_analysis_summary(len(st.session_state.analysis_results), error_stocks)
-
-        elif st.session_state.analysis_paused:
-            st.warning("분석이 일시중지되었습니다. '분석 재시작' 버튼을 클릭하여 계속하세요.")
-            # 일시정지 상태에서도 이전 결과 표시
-            for stock in st.session_state.analysis_results:
-                analyzer, results = st.session_state.analysis_results[stock]
-                display_manager.display_stock_result(stock, analyzer, results, selector.signal_verify_days)
-    else:
-        st.warning("분석할 종목을 선택해주세요.")
+    job_manager = get_job_manager()
+    job = job_manager.get(st.session_state.analysis_job_id)
+
+    if display_manager.initialize_display(job):
+        if selection['selected_stocks']:
+            # 새로운 분석 시작 시 이전 작업은 취소하고 백그라운드 작업 제출
+            if job is not None:
+                job.cancel()
+            job = job_manager.submit(selection)
+            st.session_state.analysis_job_id = job.job_id
+            st.session_state.result_page = 1
+
+    if job is None:
+        if not selection['selected_stocks']:
+            st.warning("분석할 종목을 선택해주세요.")
+        return
+
+    # 작업 진행 상태와 중간 결과 표시 (작업은 스크립트 재실행과 무관하게 계속 진행)
+    snapshot = job.snapshot()
+    display_manager.update_progress(snapshot)
+    display_manager.display_diagnostics(snapshot['diagnostics'], job.profiler)
+    verify_days = job.selection['signal_verify_days']
+
+    if snapshot['state'] == 'paused':
+        st.warning(f"분석이 일시중지되었습니다. '분석 재시작' 버튼을 클릭하여 계속하세요. ({snapshot['completed']}/{snapshot['total']})")
+    elif snapshot['state'] == 'cancelled':
+        st.warning(f"분석이 취소되었습니다. ({snapshot['completed']}/{snapshot['total']})")
+    elif snapshot['state'] == 'failed':
+        st.error(snapshot['status_text'])
+
+    display_manager.display_worker_stats(snapshot['worker_stats'])
+
+    display_manager.display_memory_usage(snapshot['memory'])
+
+    # 요약 표와 현재 페이지만 표시하고 차트는 펼친 종목만 생성
+    display_manager.display_results(snapshot['results'], verify_days, job.load_analyzer, job.profiler)
+
+    if snapshot['state'] == 'done':
+        display_manager.display_analysis_summary(len(snapshot['results']), snapshot['errors'])
+    elif snapshot['state'] == 'running':
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+
+def show_parameter_sweep():
+    from stock_selector import StockSelector
+    from sweep_display import SweepDisplay
+    from job_runner import load_market_panel
+    from param_sweep import ParameterSweep, parameter_grid
+
+    st.title("전략 파라미터 스윕")
+
+    sweep_display = SweepDisplay()
+    market_filter, start_date, end_date, grid = sweep_display.show_inputs()
+    if grid is not None:
+        st.caption(f"평가할 조합 수: {sum(1 for _ in parameter_grid(grid))}개")
+
+    if st.button("스윕 실행", key="sweep_button", disabled=grid is None):
+        stocks = StockSelector().get_all_stock_codes(market_filter)
+        tickers = [stock.split(":")[0].split("]")[1].strip() for stock in stocks]
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        try:
+            # 분석 작업과 같은 시장 전체 패널을 공유하고, 이동평균 등 중간 결과는 조합끼리 재사용
+            status_text.text("시장 전체 데이터 조회 중...")
+            panel = load_market_panel(start_date, end_date)
+            status_text.text("파라미터 조합 평가 중...")
+            results = ParameterSweep(panel, tickers).run(
+                grid, progress=lambda done, total: progress_bar.progress(done / total))
+            st.session_state.sweep_results = results
+            status_text.text(f"스윕 완료: {len(results)}개 조합, {len(tickers)}개 종목")
+        except Exception as e:
+            st.error(f"파라미터 스윕 중 오류 발생: {str(e)}")
+
+    if st.session_state.sweep_results is not None:
+        sweep_display.display_results(st.session_state.sweep_results)
+
+def show_portfolio_backtest():
+    from stock_selector import StockSelector
+    from portfolio_display import PortfolioDisplay
+    from job_runner import load_market_panel
+    from portfolio_backtest import PortfolioBacktest
+
+    st.title("포트폴리오 백테스트")
+
+    portfolio_display = PortfolioDisplay()
+    market_filter, start_date, end_date, config = portfolio_display.show_inputs()
+
+    if st.button("백테스트 실행", key="portfolio_button"):
+        stocks = StockSelector().get_all_stock_codes(market_filter)
+        tickers = [stock.split(":")[0].split("]")[1].strip() for stock in stocks]
+        status_text = st.empty()
+        try:
+            # 분석 작업/파라미터 스윕과 같은 시장 전체 패널을 공유
+            status_text.text("시장 전체 데이터 조회 중...")
+            panel = load_market_panel(start_date, end_date)
+            status_text.text("포트폴리오 시뮬레이션 중...")
+            st.session_state.portfolio_result = PortfolioBacktest(panel, tickers).run(config)
+            status_text.text(f"백테스트 완료: {len(tickers)}개 종목, {len(panel.dates)}거래일")
+        except Exception as e:
+            st.error(f"포트폴리오 백테스트 중 오류 발생: {str(e)}")
+
+    if st.session_state.portfolio_result is not None:
+        portfolio_display.display_results(st.session_state.portfolio_result)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,84 @@
+#@title ##**11.backtest_engine.py**
+# %%writefile backtest_engine.py
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def forward_max(close, verify_days):
+    """각 거래일 다음날부터 verify_days 거래일 동안의 최고 종가 (기간이 부족하면 NaN)
+
+    close는 1차원(종목 하나) 또는 날짜 x 종목 2차원 배열.
+    """
+    close = np.asarray(close, dtype=float)
+    out = np.full(close.shape, np.nan)
+    n = close.shape[0]
+    if n > verify_days:
+        out[:n - verify_days] = sliding_window_view(close[1:], verify_days, axis=0).max(axis=-1)
+    return out
+
+
+def forward_max_sweep(close, max_days):
+    """검증일수 1~max_days의 forward max를 앞 결과를 재사용해 차례로 생성"""
+    close = np.asarray(close, dtype=float)
+    current = np.full(close.shape, np.nan)
+    for days in range(1, max_days + 1):
+        shifted = np.full(close.shape, np.nan)
+        shifted[:-days] = close[days:]
+        current = shifted if days == 1 else np.maximum(current, shifted)
+        yield days, current
+
+
+def evaluate_signals(close, signal, fwd_max):
+    """시그널별 진입가/최고가/수익률/성공여부 계산
+
+    outcome은 성공 1, 실패 0, 시그널이 아니거나 검증 기간이 부족하면 NaN.
+    """
+    close = np.asarray(close, dtype=float)
+    valid = (np.asarray(signal) == 1) & ~np.isnan(fwd_max)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit = np.where(valid, ((fwd_max - close) / close) * 100, np.nan)
+    outcome = np.where(valid, (fwd_max > close).astype(float), np.nan)
+    return {'valid': valid, 'entry': close, 'max': fwd_max, 'profit': profit, 'outcome': outcome}
+
+
+def final_results(profits, success_count, verify_days):
+    """최종 결과 계산 (StockAnalyzer.calculate_final_results와 동일한 형식)"""
+    total = len(profits)
+    if total == 0:
+        return {
+            '전체_매수_시그널': 0,
+            '성공_시그널': 0,
+            '실패_시그널': 0,
+            '성공률': 0,
+            '평균_수익률': 0,
+            '최대_수익률': 0,
+            '평균_손실률': 0,
+            '최대_손실률': 0,
+            f'{verify_days}일후_평균_수익률': 0
+        }
+
+    수익률_array = np.array(profits)
+    양수_수익률 = 수익률_array[수익률_array > 0]
+    음수_수익률 = 수익률_array[수익률_array <= 0]
+
+    return {
+        '전체_매수_시그널': total,
+        '성공_시그널': success_count,
+        '실패_시그널': total - success_count,
+        '성공률': (success_count / total) * 100,
+        '평균_수익률': np.mean(양수_수익률) if len(양수_수익률) > 0 else 0,
+        '최대_수익률': np.max(수익률_array) if len(수익률_array) > 0 else 0,
+        '평균_손실률': np.mean(음수_수익률) if len(음수_수익률) > 0 else 0,
+        '최대_손실률': np.min(수익률_array) if len(수익률_array) > 0 else 0,
+        f'{verify_days}일후_평균_수익률': np.mean(수익률_array)
+    }
+
+
+def summarize(evaluated, verify_days):
+    """evaluate_signals 결과를 종목별 최종 결과로 요약 (1차원이면 dict, 2차원이면 dict 리스트)"""
+    valid, profit, outcome = evaluated['valid'], evaluated['profit'], evaluated['outcome']
+    if valid.ndim == 1:
+        return final_results(profit[valid], int(outcome[valid].sum()), verify_days)
+    return [final_results(profit[valid[:, j], j], int(outcome[valid[:, j], j].sum()), verify_days)
+            for j in range(valid.shape[1])]
+
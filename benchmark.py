@@ -0,0 +1,215 @@
+#@title ##**23.benchmark.py**
+# %%writefile benchmark.py
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import indicator_registry
+import job_runner
+import stock_analyzer
+from fake_krx import FakeKrx
+from job_runner import AnalysisJob
+from krx_fetcher import KrxClient, TokenBucket, get_default_client, set_default_client
+from stock_analyzer import StockAnalyzer
+from stock_store import StockDataStore
+
+# 실행한 컴퓨터의 측정 기록 (컴퓨터마다 다르므로 저장소에는 올리지 않음)
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_results.jsonl")
+DEFAULT_SIZES = (100, 1000, 2500)
+# 이전 기록보다 이 비율 이상 느려지면 회귀로 표시
+REGRESSION_THRESHOLD = 0.25
+
+
+def _clear_memory_caches():
+    """지표/차트/패널/분석 결과/pykrx 응답 메모리 캐시를 비워 매번 계산 비용을 측정"""
+    indicator_registry._indicator_cache.clear()
+    stock_analyzer._chart_cache.clear()
+    job_runner._panel_cache.clear()
+    job_runner._result_cache.clear()
+    get_default_client().cache.clear()
+
+
+def _timed(timings, name, func):
+    started = time.perf_counter()
+    result = func()
+    timings.setdefault(name, []).append(time.perf_counter() - started)
+    return result
+
+
+def bench_components(fake, start_date, end_date, sample):
+    """StockAnalyzer 단계별 종목당 평균 시간 (ms)"""
+    client = KrxClient(source=fake, limiter=TokenBucket(rate=1e9, capacity=1e9))
+    store = StockDataStore(os.path.join(os.getcwd(), "components"))
+    timings = {}
+    for ticker in fake.tickers[:sample]:
+        _clear_memory_caches()
+        analyzer = StockAnalyzer(store=store, krx=client)
+        analyzer.ticker, analyzer.start_date, analyzer.end_date = ticker, start_date, end_date
+        if _timed(timings, 'get_stock_data(조회)', lambda: analyzer.get_stock_data(ticker, start_date, end_date)) is None:
+            continue
+        _timed(timings, 'get_stock_data(저장소)', lambda: analyzer.get_stock_data(ticker, start_date, end_date))
+        _timed(timings, 'calculate_technical_indicators', analyzer.calculate_technical_indicators)
+        _timed(timings, 'generate_signals', analyzer.generate_signals)
+        _timed(timings, 'analyze_performance', analyzer.analyze_performance)
+        _timed(timings, 'filter_by_market_cap', lambda: analyzer.filter_by_market_cap(ticker, end_date))
+        _timed(timings, 'plot_stock_chart', analyzer.plot_stock_chart)
+    return {name: round(float(np.mean(values)) * 1000, 3) for name, values in timings.items()}
+
+
+def bench_scan(fake, start_date, end_date, n_tickers):
+    """분석 화면과 같은 백그라운드 작업으로 n_tickers개 종목 전체 스캔
+
+    cold/warm은 빈 저장소와 디스크 캐시 재실행, recent는 최근 시그널 종목만 보는 일일 스캔.
+    """
+    selection = {
+        'start_date': start_date, 'end_date': end_date,
+        'show_all': True, 'show_recent_only': False,
+        'market_cap_filter': (0, 100000000), 'daekum_cap_filter': (0, 100000),
+        'signal_verify_days': 3, 'use_process_pool': False,
+        'selected_stocks': [f"[{fake.markets[t]}] {t}: {fake.get_market_ticker_name(t)}" for t in fake.tickers[:n_tickers]]
+    }
+    result = {}
+    # 종목 수마다 빈 저장소에서 시작 (cold: 스냅샷 조회부터, warm: 디스크 스냅샷 재사용)
+    os.makedirs(f"scan_{n_tickers}")
+    os.chdir(f"scan_{n_tickers}")
+    for run in ('cold', 'warm', 'recent'):
+        _clear_memory_caches()
+        calls = fake.calls
+        started = time.perf_counter()
+        job = AnalysisJob(dict(selection, show_recent_only=run == 'recent')).start()
+        job.wait()
+        elapsed = time.perf_counter() - started
+        snapshot = job.snapshot()
+        result[run] = {
+            'seconds': round(elapsed, 3),
+            'tickers_per_second': round(n_tickers / elapsed, 1),
+            'krx_calls': fake.calls - calls,
+            'results': len(snapshot['results']),
+            'errors': len(snapshot['errors']),
+            'state': snapshot['state']
+        }
+    os.chdir("..")
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _config_key(record):
+    config = record['config']
+    return (config['days'], config['latency'], config['sample'], config['start_date'], config['end_date'])
+
+
+def _flatten(record):
+    values = {f"component:{name}": ms for name, ms in record['components'].items()}
+    for size, runs in record['scan'].items():
+        for run, stats in runs.items():
+            values[f"scan:{size}:{run}"] = stats['seconds'] * 1000
+    return values
+
+
+def compare(record, previous):
+    """같은 설정의 직전 기록과 비교해 (항목, 이전 ms, 현재 ms, 변화율) 목록 반환"""
+    if previous is None:
+        return []
+    before, after = _flatten(previous), _flatten(record)
+    return [(name, before[name], after[name], after[name] / before[name] - 1)
+            for name in after if name in before and before[name] > 0]
+
+
+def load_previous(config_record, path=RESULTS_FILE):
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path, "r", encoding='utf-8') as file:
+        for line in file:
+            record = json.loads(line)
+            if _config_key(record) == _config_key(config_record):
+                previous = record
+    return previous
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, days=250, latency=0.0, sample=50, seed=0):
+    end = pd.bdate_range(end="20241231", periods=days)
+    start_date, end_date = end[0].strftime("%Y%m%d"), end[-1].strftime("%Y%m%d")
+    # 40일선 계산을 위한 여유 기간을 포함해 가짜 데이터 생성
+    fake = FakeKrx(max(sizes), start_date=(end[0] - pd.Timedelta(days=120)).strftime("%Y%m%d"),
+                   end_date=end_date, latency=latency, seed=seed).prepare()
+    set_default_client(KrxClient(source=fake, limiter=TokenBucket(rate=1e9, capacity=1e9)))
+
+    workdir = tempfile.mkdtemp(prefix="krx_bench_")
+    cwd = os.getcwd()
+    os.chdir(workdir)  # 저장소 기본 경로(.stock_cache)를 임시 디렉터리로
+    try:
+        components = bench_components(fake, start_date, end_date, min(sample, max(sizes)))
+        scan = {str(size): bench_scan(fake, start_date, end_date, size) for size in sorted(sizes)}
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'cpus': os.cpu_count(), 'numpy': np.__version__, 'pandas': pd.__version__},
+        'config': {'days': days, 'latency': latency, 'sample': sample, 'start_date': start_date, 'end_date': end_date},
+        'components': components,
+        'scan': scan
+    }
+
+
+def print_report(record, comparison):
+    print(f"\n[{record['timestamp']}] commit={record['commit']} 거래일={record['config']['days']} "
+          f"지연={record['config']['latency']}초")
+    print("\n단계별 종목당 평균 (ms)")
+    for name, ms in record['components'].items():
+        print(f"  {name:<34}{ms:>10.2f}")
+    print("\n전체 스캔")
+    for size, runs in record['scan'].items():
+        for run, stats in runs.items():
+            print(f"  {size:>5}종목 {run:<5}{stats['seconds']:>9.2f}초 {stats['tickers_per_second']:>9.1f}종목/초 "
+                  f"KRX 호출 {stats['krx_calls']:>6}회 결과 {stats['results']:>5}")
+    regressions = [row for row in comparison if row[3] > REGRESSION_THRESHOLD]
+    if comparison:
+        print("\n직전 기록 대비")
+        for name, before, after, change in comparison:
+            mark = "  <-- 회귀" if change > REGRESSION_THRESHOLD else ""
+            print(f"  {name:<40}{before:>10.2f} -> {after:>10.2f} ms ({change*100:+.1f}%){mark}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="가짜 KRX 데이터로 분석 단계/전체 스캔 성능 측정")
+    parser.add_argument("--sizes", nargs="+", type=int, default=list(DEFAULT_SIZES), help="전체 스캔 종목 수")
+    parser.add_argument("--days", type=int, default=250, help="분석 거래일 수")
+    parser.add_argument("--latency", type=float, default=0.0, help="가짜 KRX 요청당 지연 (초)")
+    parser.add_argument("--sample", type=int, default=50, help="단계별 측정 종목 수")
+    parser.add_argument("--no-record", action="store_true", help=f"{os.path.basename(RESULTS_FILE)}에 기록하지 않음")
+    parser.add_argument("--fail-on-regression", action="store_true", help="회귀가 있으면 종료 코드 1")
+    args = parser.parse_args(argv)
+
+    record = run_benchmarks(args.sizes, args.days, args.latency, args.sample)
+    regressions = print_report(record, compare(record, load_previous(record)))
+    if not args.no_record:
+        with open(RESULTS_FILE, "a", encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return 1 if regressions and args.fail_on_regression else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+#@title ##**24.diagnostics.py**
+# %%writefile diagnostics.py
+import json
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 내보내기용으로 보관할 최근 이벤트 수
+MAX_EVENTS = 20000
+
+_local = threading.local()
+
+
+def result_nbytes(result):
+    """pykrx 응답 크기 (DataFrame은 메모리 사용량, 그 외는 객체 크기)"""
+    if hasattr(result, 'memory_usage'):
+        try:
+            return int(result.memory_usage(deep=True).sum())
+        except Exception:
+            pass
+    return sys.getsizeof(result) if result is not None else 0
+
+
+class Profiler:
+    """분석 작업 하나의 단계별 소요 시간과 pykrx 호출 수/시간/응답 크기 집계
+
+    activate()로 현재 스레드에 연결해 두면 그 안의 stage()와 KrxClient 호출이
+    자동으로 기록된다. 연결되지 않은 스레드에서는 기록 비용이 없다.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.stages = {}  # 단계 -> {'calls', 'seconds', 'max'}
+        self.krx = {}  # pykrx 함수 -> {'calls', 'errors', 'seconds', 'bytes'}
+        self.events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def activate(self, ticker=None):
+        stack = getattr(_local, 'stack', None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append((self, ticker))
+        try:
+            yield self
+        finally:
+            stack.pop()
+
+    def record_stage(self, name, seconds, ticker=None):
+        with self._lock:
+            stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0})
+            stats['calls'] += 1
+            stats['seconds'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            self.events.append({'ts': time.time(), 'kind': 'stage', 'name': name, 'ticker': ticker,
+                                'seconds': seconds})
+
+    def record_krx(self, name, seconds, nbytes, error=False, ticker=None):
+        with self._lock:
+            stats = self.krx.setdefault(name, {'calls': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0})
+            stats['calls'] += 1
+            stats['errors'] += int(error)
+            stats['seconds'] += seconds
+            stats['bytes'] += nbytes
+            self.events.append({'ts': time.time(), 'kind': 'krx', 'name': name, 'ticker': ticker,
+                                'seconds': seconds, 'bytes': nbytes, 'error': error})
+
+    def merge(self, data):
+        """다른 프로세스의 Profiler.to_dict() 결과 합산"""
+        with self._lock:
+            for name, other in data['stages'].items():
+                stats = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max': 0.0})
+                stats['calls'] += other['calls']
+                stats['seconds'] += other['seconds']
+                stats['max'] = max(stats['max'], other['max'])
+            for name, other in data['krx'].items():
+                stats = self.krx.setdefault(name, {'calls': 0, 'errors': 0, 'seconds': 0.0, 'bytes': 0})
+                for key in stats:
+                    stats[key] += other[key]
+            self.events.extend(data['events'])
+
+    def summary(self):
+        """화면 표시용 집계 사본"""
+        with self._lock:
+            return {'stages': {name: dict(stats) for name, stats in self.stages.items()},
+                    'krx': {name: dict(stats) for name, stats in self.krx.items()}}
+
+    def to_dict(self):
+        with self._lock:
+            summary = {'stages': {name: dict(stats) for name, stats in self.stages.items()},
+                       'krx': {name: dict(stats) for name, stats in self.krx.items()}}
+            summary['events'] = list(self.events)
+        return summary
+
+    def to_jsonl(self):
+        """이벤트별 한 줄과 단계/pykrx 함수별 집계 한 줄씩의 JSON lines 문자열"""
+        data = self.to_dict()
+        lines = [json.dumps(event, ensure_ascii=False) for event in data['events']]
+        lines += [json.dumps({'kind': 'stage_total', 'name': name, **stats}, ensure_ascii=False)
+                  for name, stats in data['stages'].items()]
+        lines += [json.dumps({'kind': 'krx_total', 'name': name, **stats}, ensure_ascii=False)
+                  for name, stats in data['krx'].items()]
+        return "\n".join(lines) + "\n"
+
+
+def current():
+    """현재 스레드에 연결된 (Profiler, 종목) 또는 (None, None)"""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else (None, None)
+
+
+@contextmanager
+def stage(name):
+    """현재 스레드의 Profiler에 단계 소요 시간 기록"""
+    profiler, ticker = current()
+    if profiler is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_stage(name, time.perf_counter() - started, ticker)
+
+
+def record_krx_call(name, seconds, result=None, error=False):
+    """KrxClient가 pykrx 호출마다 부르는 기록 함수"""
+    profiler, ticker = current()
+    if profiler is not None:
+        profiler.record_krx(name, seconds, 0 if error else result_nbytes(result), error, ticker)
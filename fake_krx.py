@@ -0,0 +1,161 @@
+#@title ##**14.fake_krx.py**
+# %%writefile fake_krx.py
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class FakeKrxError(ConnectionError):
+    """주입된 가짜 KRX 오류"""
+
+
+class FakeKrx:
+    """pykrx stock 모듈을 흉내 내는 로컬 가짜 데이터 소스
+
+    KrxClient(source=FakeKrx(...))처럼 끼워 넣어 네트워크 없이 동작을 확인한다.
+    latency(초)와 error_rate(0~1)로 요청마다 지연과 오류를 주입할 수 있다.
+    """
+
+    def __init__(self, n_tickers=100, start_date="20150101", end_date=None,
+                 latency=0.0, error_rate=0.0, seed=0):
+        self.days = pd.bdate_range(start_date, end_date or pd.Timestamp.now().strftime("%Y%m%d"))
+        self.tickers = [f"{i:06d}" for i in range(n_tickers)]
+        self.markets = {ticker: ("KOSPI" if i % 2 == 0 else "KOSDAQ") for i, ticker in enumerate(self.tickers)}
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._cache = {}
+        self._stacked = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # 프로세스 풀 워커로 넘길 때 잠금과 생성한 데이터는 빼고 보냄 (시드로 같은 데이터를 다시 생성)
+        state = self.__dict__.copy()
+        state.update(_cache={}, _stacked={}, _lock=None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _request(self):
+        with self._lock:
+            self.calls += 1
+            failed = self._rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            raise FakeKrxError("injected KRX error")
+
+    def prepare(self):
+        """모든 종목 데이터를 미리 생성 (벤치마크에서 생성 비용을 측정에서 제외)"""
+        for part, columns in enumerate([['종가'], ['외국인합계'], ['시가총액']]):
+            self._snapshot(part, self.days[0], columns)
+        return self
+
+    def _series(self, ticker):
+        """종목별 가짜 일봉/투자자/시가총액 데이터 (종목마다 고정된 시드로 생성)
+
+        로그 정규 가격 흐름, 갭/장중 변동이 있는 시가/고가/저가, 변동성에 비례하는
+        거래량, 거래량에 비례하는 외인/기관 순매수, 고정 상장주식수 기준 시가총액을
+        만든다. 일부 종목은 기간 중간에 상장하고, 드물게 거래정지(거래량 0)일이 있다.
+        """
+        if ticker in self._cache:
+            return self._cache[ticker]
+        index = self.tickers.index(ticker)
+        rng = np.random.default_rng(self.seed * 100003 + index)
+        listed_from = int(rng.integers(0, len(self.days) // 2)) if rng.random() < 0.1 else 0
+        days = self.days[listed_from:]
+        n = len(days)
+
+        returns = rng.normal(0.0002, rng.uniform(0.01, 0.03), n)
+        close = np.round(rng.lognormal(9, 1) * np.exp(np.cumsum(returns)))
+        close = np.maximum(close, 1)
+        prev_close = np.concatenate([[close[0]], close[:-1]])
+        open_ = np.round(prev_close * (1 + rng.normal(0, 0.005, n)))
+        high = np.round(np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.01, n))))
+        low = np.round(np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.01, n))))
+        volume = np.round(rng.lognormal(13, 1.5) * (1 + 20 * np.abs(returns)) * rng.lognormal(0, 0.3, n))
+        volume[rng.random(n) < 0.002] = 0  # 거래정지
+        typical = (high + low + close) / 3
+        ohlcv = pd.DataFrame({
+            '시가': open_, '고가': high, '저가': low, '종가': close,
+            '거래량': volume, '거래대금': np.round(volume * typical),
+            '등락률': np.round((close / prev_close - 1) * 100, 2)
+        }, index=days)
+        investor = pd.DataFrame({
+            '외국인합계': np.round(volume * rng.normal(0.03, 0.15, n)),
+            '기관합계': np.round(volume * rng.normal(0.02, 0.15, n))
+        }, index=days)
+        shares = float(rng.integers(5_000_000, 500_000_000))
+        cap = pd.DataFrame({'시가총액': close * shares}, index=days)
+
+        with self._lock:
+            self._cache[ticker] = (ohlcv, investor, cap)
+        return self._cache[ticker]
+
+    def _snapshot(self, part, date, columns):
+        """모든 종목의 특정 거래일 데이터 (종목별 데이터를 한 번 쌓아 두고 행만 꺼냄)"""
+        date = pd.Timestamp(date)
+        if date not in self.days:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='티커'))
+        with self._lock:
+            stacked = self._stacked.get(part)
+        if stacked is None:
+            frames = [self._series(ticker)[part].reindex(self.days) for ticker in self.tickers]
+            stacked = {column: np.column_stack([df[column].to_numpy() for df in frames])
+                       for column in frames[0].columns}
+            with self._lock:
+                self._stacked[part] = stacked
+        row = self.days.get_loc(date)
+        # 아직 상장하지 않은 종목은 스냅샷에 없음
+        listed = ~np.isnan(stacked[next(iter(stacked))][row])
+        df = pd.DataFrame({column: stacked[column][row][listed] for column in columns},
+                          index=pd.Index(np.array(self.tickers)[listed], name='티커'))
+        return df
+
+    # --- 종목별 조회 ---
+    def get_market_ohlcv_by_date(self, fromdate, todate, ticker, adjusted=True, **kwargs):
+        self._request()
+        return self._series(ticker)[0].loc[pd.Timestamp(fromdate):pd.Timestamp(todate)].copy()
+
+    def get_market_trading_volume_by_date(self, fromdate, todate, ticker, **kwargs):
+        self._request()
+        return self._series(ticker)[1].loc[pd.Timestamp(fromdate):pd.Timestamp(todate)].copy()
+
+    def get_market_cap_by_date(self, fromdate, todate, ticker, **kwargs):
+        self._request()
+        return self._series(ticker)[2].loc[pd.Timestamp(fromdate):pd.Timestamp(todate)].copy()
+
+    # --- 시장 전체 스냅샷 ---
+    def get_market_ohlcv_by_ticker(self, date, market="KOSPI", **kwargs):
+        self._request()
+        return self._snapshot(0, date, ['시가', '고가', '저가', '종가', '거래량', '거래대금', '등락률'])
+
+    def get_market_cap_by_ticker(self, date, market="ALL", **kwargs):
+        self._request()
+        return self._snapshot(2, date, ['시가총액'])
+
+    def get_market_net_purchases_of_equities_by_ticker(self, fromdate, todate, market="KOSPI", investor="개인"):
+        self._request()
+        column = {'외국인': '외국인합계', '기관합계': '기관합계'}.get(investor)
+        if column is None:
+            df = self._snapshot(1, fromdate, ['외국인합계'])
+            return pd.DataFrame({'순매수거래량': 0.0}, index=df.index)
+        return self._snapshot(1, fromdate, [column]).rename(columns={column: '순매수거래량'})
+
+    # --- 종목 목록/달력 ---
+    def get_previous_business_days(self, fromdate=None, todate=None, **kwargs):
+        return list(self.days[(self.days >= pd.Timestamp(fromdate)) & (self.days <= pd.Timestamp(todate))])
+
+    def get_market_ticker_list(self, date=None, market="KOSPI"):
+        self._request()
+        return [ticker for ticker in self.tickers if market == "ALL" or self.markets[ticker] == market]
+
+    def get_market_ticker_name(self, ticker):
+        return f"가짜종목{ticker}"
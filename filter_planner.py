@@ -0,0 +1,81 @@
+#@title ##**25.filter_planner.py**
+# %%writefile filter_planner.py
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from diagnostics import stage
+from market_panel import OHLCV_FIELDS, MarketPanelLoader
+
+# 이보다 적은 종목은 시장 전체 스냅샷 조회(최대 6회)보다 종목별 조회가 싸므로 사전 필터를 건너뜀
+PUSHDOWN_MIN_TICKERS = 20
+# StockAnalyzer.analyze_stock의 거래대금 필터 기준: 마지막 거래일을 뺀 최근 5거래일 평균
+DAEKUM_WINDOW = 5
+# StockAnalyzer.filter_by_market_cap이 시가총액을 찾는 기간 (일)
+MARKET_CAP_LOOKBACK = 10
+
+
+class FilterPlan:
+    """사전 필터 결과: 분석할 종목, 조건 미달로 제외한 종목, 종목별 시가총액(억원)"""
+
+    __slots__ = ('stocks', 'rejected', 'market_caps')
+
+    def __init__(self, stocks, rejected=(), market_caps=None):
+        self.stocks = list(stocks)
+        self.rejected = list(rejected)
+        self.market_caps = market_caps  # 티커 -> 시가총액(억원), 스냅샷이 없으면 None
+
+
+class FilterPlanner:
+    """시가총액/거래대금 필터를 시장 전체 스냅샷으로 먼저 적용해 종목별 조회 대상을 줄임
+
+    싼 필터부터 적용한다: 시가총액(스냅샷 1회) -> 최근 5거래일 거래대금(스냅샷 5회).
+    스냅샷은 MarketPanelLoader와 같은 디스크 캐시를 쓴다.
+    스냅샷에 없거나 값이 비어 있는 종목처럼 종목별 결과와 같다고 확신할 수 없는
+    경우에는 제외하지 않고 종목별 분석에 맡긴다. 그래서 사전 필터를 쓰든 안 쓰든
+    최종 결과는 같다.
+    """
+
+    def __init__(self, loader=None):
+        self.loader = loader if loader is not None else MarketPanelLoader()
+
+    def plan(self, stocks, selection, parse_ticker):
+        """stocks 중 시가총액/거래대금 조건을 통과할 수 있는 종목만 남긴 FilterPlan 반환"""
+        if len(stocks) < PUSHDOWN_MIN_TICKERS:
+            return FilterPlan(stocks)
+
+        end = datetime.strptime(selection['end_date'], '%Y%m%d')
+        lookback = (end - timedelta(days=max(MARKET_CAP_LOOKBACK, DAEKUM_WINDOW * 4))).strftime('%Y%m%d')
+        days = self.loader.business_days(max(lookback, selection['start_date']), selection['end_date'])
+        if not days:
+            return FilterPlan(stocks)
+
+        tickers = pd.Index([parse_ticker(stock) for stock in stocks])
+        keep = np.ones(len(tickers), dtype=bool)
+
+        market_caps = None
+        if days[-1] >= (end - timedelta(days=MARKET_CAP_LOOKBACK)).strftime('%Y%m%d'):
+            with stage('사전 필터: 시가총액'):
+                caps = self.loader.snapshot('cap', days[-1])['시가총액'].reindex(tickers) / 100000000
+            low, high = selection['market_cap_filter']
+            known = caps.notna().to_numpy()
+            keep &= ~known | ((low <= caps) & (caps <= high)).to_numpy()
+            market_caps = caps[known].to_dict()
+
+        # 거래대금 평균은 종목의 최근 6거래일이 모두 조회 기간 안에 있을 때만 종목별 계산과 같음
+        if len(days) > DAEKUM_WINDOW and keep.any():
+            window = days[-(DAEKUM_WINDOW + 1):-1]
+            with stage('사전 필터: 거래대금'):
+                frames = [self.loader.snapshot('ohlcv', day).reindex(tickers) for day in (*window, days[-1])]
+            # 종목별 조회는 값이 빈 날을 지우므로(dropna) 빈 날이 있는 종목은 판단하지 않음
+            complete = np.logical_and.reduce([np.isfinite(df[OHLCV_FIELDS].to_numpy(dtype=float)).all(axis=1)
+                                              for df in frames])
+            values = pd.DataFrame({day: (df['거래대금'] / 100000000).round(2) for day, df in zip(window, frames)})
+            daekum = values.mean(axis=1)
+            low, high = selection['daekum_cap_filter']
+            keep &= ~complete | ((low <= daekum) & (daekum <= high)).to_numpy()
+
+        kept = [stock for stock, passed in zip(stocks, keep) if passed]
+        rejected = [stock for stock, passed in zip(stocks, keep) if not passed]
+        return FilterPlan(kept, rejected, market_caps)
@@ -0,0 +1,211 @@
+#@title ##**22.indicator_registry.py**
+# %%writefile indicator_registry.py
+import numpy as np
+import pandas as pd
+
+from shared_cache import LRUCache
+
+# StockAnalyzer.get_stock_data가 만드는 기본 열 (지표 입력으로 사용 가능)
+BASE_COLUMNS = ('시가', '고가', '저가', '종가', '거래량', '거래대금', '평균거래가', '외인순매수금액', '기관순매수금액')
+
+# 매수 시그널 전략과 기본 차트(이동평균선)에 필요한 지표
+STRATEGY_INDICATORS = ('외인_매수', '기관_매수', '10일_매수금액', 'Signal')
+CHART_INDICATORS = ('5일선', '40일선')
+
+
+def _value_nbytes(value):
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=False))
+    return int(value.nbytes)
+
+
+def _cacheable(name, value):
+    """캐시에 보관할 값: 배열 크기로 잴 수 있는 Series/ndarray 결과만 ('_' 중간 계산 객체 제외)"""
+    return not name.startswith('_') and isinstance(value, (pd.Series, np.ndarray))
+
+
+# 종목/기간/데이터 버전별 지표 계산 결과 (세션 간 공유, 약 128MB 제한)
+_indicator_cache = LRUCache(max_entries=8192, max_bytes=128 * 1024 * 1024, sizeof=_value_nbytes)
+
+
+class Indicator:
+    """입력 열/지표 이름과 계산 함수로 선언하는 지표
+
+    func는 inputs 순서대로 Series(또는 '_'로 시작하는 중간 결과 객체)를 받는다.
+    label과 overlay는 차트 표시용 (overlay=True면 주가 위에, 아니면 아래 패널에).
+    """
+
+    __slots__ = ('name', 'inputs', 'func', 'label', 'overlay')
+
+    def __init__(self, name, inputs, func, label=None, overlay=True):
+        self.name = name
+        self.inputs = tuple(inputs)
+        self.func = func
+        self.label = label
+        self.overlay = overlay
+
+
+class IndicatorRegistry:
+    """지표 선언 목록과 의존 관계 해석"""
+
+    def __init__(self):
+        self.indicators = {}
+
+    def register(self, name, inputs, label=None, overlay=True):
+        """데코레이터: @registry.register('5일선', ['평균거래가'])"""
+        def decorator(func):
+            if name in self.indicators or name in BASE_COLUMNS:
+                raise ValueError(f"이미 등록된 지표입니다: {name}")
+            self.indicators[name] = Indicator(name, inputs, func, label, overlay)
+            return func
+        return decorator
+
+    def chart_options(self):
+        """차트 보조지표로 고를 수 있는 {표시 이름: 지표 이름 목록}"""
+        options = {}
+        for indicator in self.indicators.values():
+            if indicator.label is not None:
+                options.setdefault(indicator.label, []).append(indicator.name)
+        return options
+
+    def resolve(self, targets):
+        """targets 계산에 필요한 지표를 의존 순서대로 나열 (순환 의존이면 ValueError)"""
+        order, visiting, done = [], set(), set()
+
+        def visit(name):
+            if name in done or name in BASE_COLUMNS:
+                return
+            if name not in self.indicators:
+                raise ValueError(f"등록되지 않은 지표입니다: {name}")
+            if name in visiting:
+                raise ValueError(f"지표 의존 관계에 순환이 있습니다: {name}")
+            visiting.add(name)
+            for dependency in self.indicators[name].inputs:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+            order.append(name)
+
+        for target in targets:
+            visit(target)
+        return order
+
+
+class IndicatorEngine:
+    """등록된 지표 중 요청된 것과 그 의존 지표만 계산하고 결과를 공유 캐시에 보관
+
+    key는 (종목, 시작일, 종료일, 데이터 버전, ...) 등 데이터를 구분하는 튜플이며,
+    같은 key의 지표 값(Series)은 다른 지표나 다음 재실행에서 다시 계산하지 않는다.
+    '_'로 시작하는 중간 계산 객체(MACD/볼린저 등)는 크기를 잴 수 없으므로 캐시하지
+    않고, 캐시에 없는 지표를 계산할 때만 만든다.
+    """
+
+    def __init__(self, registry=None, cache=None):
+        self.registry = registry if registry is not None else default_registry
+        self.cache = cache if cache is not None else _indicator_cache
+
+    def compute(self, df, targets, key=None):
+        """{지표 이름: 값} 반환 (BASE_COLUMNS 입력은 df에서 읽음)"""
+        values = {}
+
+        def evaluate(name):
+            if name in BASE_COLUMNS:
+                return df[name]
+            if name in values:
+                return values[name]
+            value = self.cache.get((key, name)) if key is not None else None
+            if value is None:
+                indicator = self.registry.indicators[name]
+                value = indicator.func(*[evaluate(dependency) for dependency in indicator.inputs])
+                if key is not None and _cacheable(name, value):
+                    self.cache.put((key, name), value)
+            values[name] = value
+            return value
+
+        for name in self.registry.resolve(targets):
+            if not name.startswith('_'):
+                evaluate(name)
+        return values
+
+    def apply(self, df, targets, key=None):
+        """targets 지표를 df 열로 추가 ('_'로 시작하는 중간 결과는 제외)"""
+        for name, value in self.compute(df, targets, key).items():
+            if not name.startswith('_'):
+                df[name] = value
+        return df
+
+
+default_registry = IndicatorRegistry()
+register = default_registry.register
+
+
+# --- 이동평균 교차/수급 전략 ---
+@register('5일선', ['평균거래가'])
+def _short_ma(avg_price):
+    return avg_price.rolling(window=5).mean()
+
+
+@register('40일선', ['평균거래가'])
+def _long_ma(avg_price):
+    return avg_price.rolling(window=40).mean()
+
+
+@register('외인_매수', ['외인순매수금액'])
+def _foreign_buy(amount):
+    return amount.fillna(0)
+
+
+@register('기관_매수', ['기관순매수금액'])
+def _institution_buy(amount):
+    return amount.fillna(0)
+
+
+@register('10일_매수금액', ['외인_매수', '기관_매수'])
+def _flow_mean(foreign, institution):
+    return (foreign + institution).rolling(window=10).mean()
+
+
+@register('Signal', ['5일선', '40일선', '10일_매수금액'])
+def _signal(short_ma, long_ma, flow_mean):
+    조건1 = (short_ma > long_ma) & (short_ma.shift(1) <= long_ma.shift(1))
+    조건2 = flow_mean >= 10
+    return (조건1 & 조건2).astype(int)
+
+
+# --- 보조지표 (ta) ---
+@register('RSI', ['종가'], label='RSI', overlay=False)
+def _rsi(close):
+    from ta.momentum import RSIIndicator
+    return RSIIndicator(close=close, window=14).rsi()
+
+
+@register('_MACD', ['종가'])
+def _macd(close):
+    from ta.trend import MACD
+    return MACD(close=close, window_slow=26, window_fast=12, window_sign=9)
+
+
+@register('MACD', ['_MACD'], label='MACD', overlay=False)
+def _macd_line(macd):
+    return macd.macd()
+
+
+@register('MACD_시그널', ['_MACD'], label='MACD', overlay=False)
+def _macd_signal(macd):
+    return macd.macd_signal()
+
+
+@register('_볼린저', ['종가'])
+def _bollinger(close):
+    from ta.volatility import BollingerBands
+    return BollingerBands(close=close, window=20, window_dev=2)
+
+
+@register('볼린저_상단', ['_볼린저'], label='볼린저밴드')
+def _bollinger_upper(bands):
+    return bands.bollinger_hband()
+
+
+@register('볼린저_하단', ['_볼린저'], label='볼린저밴드')
+def _bollinger_lower(bands):
+    return bands.bollinger_lband()
@@ -0,0 +1,229 @@
+#@title ##**21.indicator_state.py**
+# %%writefile indicator_state.py
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from krx_fetcher import get_default_client
+from signal_engine import average_price
+from stock_store import DATE_FORMAT, DEFAULT_STORE_DIR, StockDataStore
+
+
+class RollingWindow:
+    """고정 길이 이동평균 (새 값 추가/오래된 값 제거를 누적합으로 O(1) 처리)
+
+    누적합은 보정 항(Kahan)을 함께 유지해 긴 기간 동안의 오차 누적을 막는다.
+    더하고 빼는 순서가 pandas rolling과 달라 평균값은 마지막 자리(ulp) 수준에서
+    다를 수 있다 (tests/test_indicator_state.py가 허용 오차 안인지 확인).
+    값이 window개 모이기 전의 평균은 pandas rolling(window).mean()처럼 NaN.
+    """
+
+    __slots__ = ('window', 'values', 'total', 'compensation')
+
+    def __init__(self, window, values=(), total=0.0, compensation=0.0):
+        self.window = window
+        self.values = deque(values, maxlen=window)
+        self.total = total
+        self.compensation = compensation
+
+    def _add(self, value):
+        y = value - self.compensation
+        t = self.total + y
+        self.compensation = (t - self.total) - y
+        self.total = t
+
+    def push(self, value):
+        if len(self.values) == self.window:
+            self._add(-self.values[0])
+        self.values.append(value)
+        self._add(value)
+
+    def mean(self):
+        if len(self.values) < self.window:
+            return np.nan
+        return self.total / self.window
+
+    def to_dict(self):
+        return {'window': self.window, 'values': list(self.values),
+                'total': self.total, 'compensation': self.compensation}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['window'], data['values'], data['total'], data['compensation'])
+
+
+class IndicatorState:
+    """종목 하나의 이동평균/수급/교차 상태
+
+    새 거래일 봉 하나를 update로 넣으면 전체 기간을 다시 계산하지 않고
+    StockAnalyzer.calculate_technical_indicators/generate_signals의 지표와
+    시그널을 O(1)로 갱신한다. 지표 값은 전체 재계산과 부동소수점 오차 범위에서
+    같고(정확히 같지는 않음), 시그널은 같다.
+    """
+
+    __slots__ = ('short', 'long', 'flow', 'flow_threshold', 'prev_short', 'prev_long', 'last_date', 'last')
+
+    def __init__(self, short_window=5, long_window=40, flow_window=10, flow_threshold=10):
+        self.short = RollingWindow(short_window)
+        self.long = RollingWindow(long_window)
+        self.flow = RollingWindow(flow_window)
+        self.flow_threshold = flow_threshold
+        self.prev_short = np.nan
+        self.prev_long = np.nan
+        self.last_date = None  # 마지막으로 반영한 거래일 (YYYYMMDD)
+        self.last = None  # 마지막 거래일의 지표/시그널
+
+    @property
+    def params(self):
+        return (self.short.window, self.long.window, self.flow.window, self.flow_threshold)
+
+    def update(self, date, avg_price, flow):
+        """거래일 하나의 평균거래가와 외인+기관 순매수 금액(억원)을 반영"""
+        self.short.push(avg_price)
+        self.long.push(avg_price)
+        self.flow.push(flow)
+        short_ma, long_ma, flow_mean = self.short.mean(), self.long.mean(), self.flow.mean()
+
+        조건1 = short_ma > long_ma and self.prev_short <= self.prev_long
+        조건2 = flow_mean >= self.flow_threshold
+        self.prev_short, self.prev_long = short_ma, long_ma
+        self.last_date = date
+        self.last = {'5일선': short_ma, '40일선': long_ma, '10일_매수금액': flow_mean,
+                     'Signal': int(조건1 and 조건2)}
+        return self.last
+
+    def extend(self, bars):
+        """bar_inputs 결과 중 마지막 반영일 이후 거래일만 차례로 반영"""
+        for date, avg_price, flow in zip(bars.index.strftime(DATE_FORMAT), bars['평균거래가'], bars['수급']):
+            if self.last_date is None or date > self.last_date:
+                self.update(date, avg_price, flow)
+        return self.last
+
+    def copy(self):
+        return IndicatorState.from_dict(self.to_dict())
+
+    def to_dict(self):
+        return {
+            'short': self.short.to_dict(), 'long': self.long.to_dict(), 'flow': self.flow.to_dict(),
+            'flow_threshold': self.flow_threshold,
+            'prev_short': None if np.isnan(self.prev_short) else self.prev_short,
+            'prev_long': None if np.isnan(self.prev_long) else self.prev_long,
+            'last_date': self.last_date, 'last': self.last
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        state = cls.__new__(cls)
+        state.short = RollingWindow.from_dict(data['short'])
+        state.long = RollingWindow.from_dict(data['long'])
+        state.flow = RollingWindow.from_dict(data['flow'])
+        state.flow_threshold = data['flow_threshold']
+        state.prev_short = np.nan if data['prev_short'] is None else data['prev_short']
+        state.prev_long = np.nan if data['prev_long'] is None else data['prev_long']
+        state.last_date = data['last_date']
+        state.last = data['last']
+        return state
+
+
+def bar_inputs(ohlcv, investor):
+    """일봉/투자자 데이터를 평균거래가와 수급(억원) 열로 변환 (StockAnalyzer.get_stock_data와 같은 전처리)"""
+    df = ohlcv.replace([np.inf, -np.inf], np.nan).dropna()
+    avg_price = average_price(df['종가'].to_numpy(dtype=float), df['거래량'].to_numpy(dtype=float),
+                              df['거래대금'].to_numpy(dtype=float))
+    investor = investor.reindex(df.index)
+    foreign = ((investor['외국인합계'] * avg_price) / 100000000).fillna(0)
+    institution = ((investor['기관합계'] * avg_price) / 100000000).fillna(0)
+    return pd.DataFrame({'평균거래가': avg_price, '수급': foreign + institution}, index=df.index)
+
+
+class IndicatorStateStore:
+    """종목별 IndicatorState를 파라미터 조합별 파일 하나에 저장하고 일 단위로 갱신
+
+    refresh는 종목마다 마지막 반영일 이후의 봉만 로컬 저장소(StockDataStore)로
+    조회해 반영하므로, 전일 상태가 있으면 하루치 갱신 비용은 종목당 봉 하나다.
+    장중 변동이 있는 당일 봉은 저장하지 않고 반환하는 상태에만 반영한다.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, root=DEFAULT_STORE_DIR, store=None, krx=None,
+                 short_window=5, long_window=40, flow_window=10, flow_threshold=10):
+        self.root = root
+        self.store = store if store is not None else StockDataStore(root)
+        self.krx = krx if krx is not None else get_default_client()
+        self.params = (short_window, long_window, flow_window, flow_threshold)
+        self.states = None
+
+    @property
+    def path(self):
+        return os.path.join(self.root, "indicator_state", "_".join(str(p) for p in self.params) + ".json")
+
+    def load(self):
+        if self.states is None:
+            self.states = {}
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding='utf-8') as file:
+                    self.states = {ticker: IndicatorState.from_dict(data) for ticker, data in json.load(file).items()}
+        return self.states
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding='utf-8') as file:
+                json.dump({ticker: state.to_dict() for ticker, state in self.states.items()}, file)
+            os.replace(self.path + ".tmp", self.path)
+
+    def _business_days(self, start_date, end_date):
+        return self.krx.get_previous_business_days(fromdate=start_date, todate=end_date)
+
+    def _bars(self, ticker, start_date, end_date):
+        ohlcv = self.store.get('ohlcv', ticker, start_date, end_date,
+                               lambda s, e: self.krx.get_market_ohlcv_by_date(s, e, ticker, adjusted=False),
+                               self._business_days)
+        investor = self.store.get('investor', ticker, start_date, end_date,
+                                  lambda s, e: self.krx.get_market_trading_volume_by_date(s, e, ticker),
+                                  self._business_days)
+        if ohlcv is None or ohlcv.empty or investor is None:
+            return None
+        return bar_inputs(ohlcv, investor)
+
+    def refresh(self, tickers, end_date, seed_start):
+        """종목별 상태를 end_date까지 갱신해 {티커: IndicatorState} 반환
+
+        상태가 없는 종목은 seed_start부터의 기록으로 한 번 초기화한다.
+        """
+        states = self.load()
+        today = datetime.now().strftime(DATE_FORMAT)
+        refreshed = {}
+        for ticker in tickers:
+            state = states.get(ticker)
+            start = seed_start if state is None else (pd.Timestamp(state.last_date) + pd.Timedelta(days=1)).strftime(DATE_FORMAT)
+            if start > end_date:
+                refreshed[ticker] = state
+                continue
+            try:
+                bars = self._bars(ticker, start, end_date)
+            except Exception as e:
+                print(f"지표 상태 갱신 중 오류 발생 ({ticker}): {str(e)}")
+                bars = None
+            if bars is None:
+                if state is not None:
+                    refreshed[ticker] = state
+                continue
+
+            if state is None:
+                state = states[ticker] = IndicatorState(*self.params)
+            state.extend(bars[bars.index < pd.Timestamp(today)])
+            current = bars[bars.index >= pd.Timestamp(today)]
+            if not current.empty:
+                state = state.copy()
+                state.extend(current)
+            if state.last_date is not None:
+                refreshed[ticker] = state
+        self.save()
+        return refreshed
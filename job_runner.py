@@ -0,0 +1,547 @@
+#@title ##**15.job_runner.py**
+# %%writefile job_runner.py
+import inspect
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+
+from analysis_record import SESSION_MEMORY_BUDGET, AnalysisRecord, analyzer_nbytes
+from diagnostics import Profiler, stage
+from filter_planner import FilterPlanner
+from krx_fetcher import (KRX_BURST, KRX_REQUESTS_PER_SECOND, KrxClient, KrxFetchPool, TokenBucket, get_default_client,
+                         set_default_client)
+from market_panel import OHLCV_FIELDS, MarketPanel, MarketPanelLoader
+from nightly_screen import get_nightly_store
+from shared_cache import LRUCache, SingleFlight
+from signal_events import get_event_store
+from signal_engine import SignalEngine
+from stock_analyzer import StockAnalyzer
+from stock_store import DATE_FORMAT, StockDataStore
+
+# 이 종목 수 이상이면 종목별 조회 대신 시장 전체 패널을 사용
+BULK_PANEL_THRESHOLD = 100
+# 한 번에 스레드 풀에 넣을 종목 수
+FETCH_BATCH_SIZE = 32
+# 끝난 작업을 보관하는 시간 (초)
+FINISHED_JOB_TTL = 3600
+# 프로세스 풀 모드에서 워커 하나에 넘기는 종목 수
+PROCESS_CHUNK_SIZE = 64
+# 오늘이 포함된 패널을 다시 만드는 주기 (초, 장중 데이터 반영)
+LIVE_PANEL_TTL = 300
+# 종목별 분석 결과 캐시 크기 (모든 세션 공유)
+RESULT_CACHE_BYTES = 64 * 1024 * 1024
+# 시장 패널 캐시 크기 (이보다 큰 패널은 캐시하지 않음)
+PANEL_CACHE_BYTES = 1024 * 1024 * 1024
+
+# (시작일, 종료일) -> (패널, 생성 시각)
+_panel_cache = LRUCache(max_entries=2, max_bytes=PANEL_CACHE_BYTES, sizeof=lambda entry: entry[0].nbytes())
+_panel_flights = SingleFlight()
+
+
+def _record_nbytes(entry):
+    record = entry[0]
+    return record.nbytes() if record is not None else sys.getsizeof(record)
+
+
+# 파라미터/데이터 버전별 (AnalysisRecord, 만료 시각) (조건 미통과 종목은 None, 지난 기간은 만료 없음)
+_result_cache = LRUCache(max_entries=200000, max_bytes=RESULT_CACHE_BYTES, sizeof=_record_nbytes)
+_MISSING = object()
+result_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def _cached_panel(key):
+    """캐시된 패널 (없거나 오늘이 포함된 패널이 LIVE_PANEL_TTL보다 오래되었으면 None)"""
+    cached = _panel_cache.get(key)
+    if cached is None:
+        return None
+    live = key[1] >= datetime.now().strftime(DATE_FORMAT)
+    if live and time.monotonic() - cached[1] > LIVE_PANEL_TTL:
+        return None
+    return cached[0]
+
+
+def _build_panel(key):
+    panel = MarketPanelLoader().load(*key)
+    SignalEngine().run(panel)
+    _panel_cache.put(key, (panel, time.monotonic()))
+    return panel
+
+
+def load_market_panel(start_date, end_date):
+    """조회 구간별 시장 전체 패널 (지표/시그널 포함, 모든 작업이 공유)
+
+    같은 구간을 동시에 요청하면 한 번만 만들고, 다른 구간의 요청이나 캐시에
+    있는 패널 조회는 만드는 중인 패널을 기다리지 않는다.
+    """
+    key = (start_date, end_date)
+    panel = _cached_panel(key)
+    if panel is not None:
+        return panel
+    return _panel_flights.do(key, lambda: _build_panel(key), lookup=lambda: _cached_panel(key))
+
+
+def parse_stock(selected_stock):
+    """'[KOSPI] 005930: 삼성전자' -> ('005930', '삼성전자')"""
+    ticker = selected_stock.split(":")[0].split("]")[1].strip()
+    stock_name = selected_stock.split(":")[1].strip()
+    return ticker, stock_name
+
+
+def analyze_selected_stock(selected_stock, selection, panel=None, market_caps=None):
+    """선택 항목 하나를 분석해 (analyzer, df, results) 반환"""
+    ticker, _ = parse_stock(selected_stock)
+    analyzer = StockAnalyzer(panel=panel)
+    analyzer.market_caps = market_caps
+    analyzer.tail_window = selection.get('tail_window', True)
+    analyzer.set_display_option(selection['show_all'], selection['show_recent_only'], selection['market_cap_filter'], selection['signal_verify_days'], selection['daekum_cap_filter'])
+    df, results = analyzer.analyze_stock(ticker, selection['start_date'], selection['end_date'])
+    return analyzer, df, results
+
+
+def result_key(ticker, selection, panel=None):
+    """분석 결과 캐시 키: 분석 파라미터/필터와 종목 데이터 버전
+
+    데이터 버전은 패널이면 패널 식별값, 아니면 로컬 저장소의 일봉/투자자 버전이라
+    거래일 데이터가 새로 바뀌면 키가 달라져 이전 결과를 쓰지 않는다.
+    """
+    if panel is not None and ticker in panel:
+        data = panel.version
+    else:
+        store = StockDataStore()
+        data = (store.version('ohlcv', ticker), store.version('investor', ticker))
+    return (ticker, selection['start_date'], selection['end_date'], selection['signal_verify_days'],
+            selection['show_all'], selection['show_recent_only'],
+            tuple(selection['market_cap_filter']), tuple(selection['daekum_cap_filter']), data)
+
+
+def cache_record(key, record):
+    """분석 결과를 공유 캐시에 보관
+
+    오늘이 포함된 결과는 장중 데이터가 바뀌어도 저장소 버전이 그대로라(당일은 보유
+    구간으로 기록하지 않음) 키로 구분되지 않으므로 LIVE_PANEL_TTL 동안만 쓴다.
+    """
+    live = key[2] >= datetime.now().strftime(DATE_FORMAT)
+    _result_cache.put(key, (record, time.monotonic() + LIVE_PANEL_TTL if live else None))
+
+
+def cached_record(ticker, selection, panel=None):
+    """캐시된 분석 결과 (AnalysisRecord 또는 조건 미통과 None), 없거나 만료되었으면 _MISSING"""
+    entry = _result_cache.get(result_key(ticker, selection, panel))
+    record = _MISSING
+    if entry is not None and (entry[1] is None or time.monotonic() < entry[1]):
+        record = entry[0]
+    result_cache_stats['hits' if record is not _MISSING else 'misses'] += 1
+    return record
+
+
+def analyze_record(selected_stock, selection, panel=None, market_caps=None):
+    """선택 항목 하나를 분석해 (AnalysisRecord 또는 None, 캐시 키) 반환
+
+    같은 파라미터와 데이터의 결과가 캐시에 있으면 다시 계산하지 않는다.
+    데이터가 없는 종목은 다음에 다시 시도하도록 캐시하지 않고 (키는 None),
+    조회/분석에 실패한 종목은 조건 미달과 구분되도록 예외를 낸다 (캐시하지 않음).
+    """
+    ticker, _ = parse_stock(selected_stock)
+    record = cached_record(ticker, selection, panel)
+    if record is not _MISSING:
+        return record, None
+    analyzer, df, results = analyze_selected_stock(selected_stock, selection, panel, market_caps)
+    if analyzer.error is not None:
+        raise RuntimeError(analyzer.error)
+    record = AnalysisRecord.from_analyzer(selected_stock, analyzer, results) if df is not None and results is not None else None
+    if analyzer.df is None:
+        return record, None
+    if analyzer.signal_outcomes is not None and (panel is None or ticker not in panel):
+        try:
+            get_event_store().add_analyzer(analyzer)
+        except Exception as e:
+            print(f"시그널 이벤트 저장 중 오류 발생: {str(e)}")
+    # 조회 중 저장소 데이터가 갱신되었을 수 있으므로 분석 후의 버전으로 보관
+    key = result_key(ticker, selection, panel)
+    cache_record(key, record)
+    return record, key
+
+
+_worker_panels = {}  # 워커 프로세스: 패널 파일 경로 -> MarketPanel
+
+
+def _init_process_worker(requests_per_second, burst, source=None):
+    """워커 프로세스마다 요청 제한을 나눠 가져 전체 요청 수가 KRX 한도를 넘지 않도록 함
+
+    source가 있으면 부모 프로세스와 같은 데이터 소스(가짜 KRX 등)로 조회한다.
+    """
+    limiter = TokenBucket(rate=requests_per_second, capacity=burst)
+    if source is not None:
+        set_default_client(KrxClient(source=source, limiter=limiter))
+    else:
+        get_default_client().limiter = limiter
+
+
+def _attach_panel(path):
+    """부모 프로세스가 저장한 패널을 메모리 매핑으로 열기 (워커마다 한 번)"""
+    panel = _worker_panels.get(path)
+    if panel is None:
+        panel = _worker_panels[path] = MarketPanel.open(path)
+    return panel
+
+
+def analyze_chunk(stocks, selection, panel_path=None, market_caps=None):
+    """프로세스 풀 작업 단위: 종목 묶음을 분석해 AnalysisRecord(캐시 키 포함)와 처리 시간 반환"""
+    started = time.perf_counter()
+    profiler = Profiler()
+    with profiler.activate():
+        panel = _attach_panel(panel_path) if panel_path is not None else None
+    records = []
+    for selected_stock in stocks:
+        try:
+            with profiler.activate(parse_stock(selected_stock)[0]):
+                record, key = analyze_record(selected_stock, selection, panel, market_caps)
+        except Exception as e:
+            records.append((selected_stock, None, str(e), None))
+            continue
+        records.append((selected_stock, record, None, key))
+    return {'pid': os.getpid(), 'count': len(stocks), 'elapsed': time.perf_counter() - started, 'records': records,
+            'profile': profiler.to_dict()}
+
+
+class AnalysisJob:
+    """Streamlit 스크립트 실행과 분리된 백그라운드 분석 작업
+
+    상태는 running / paused / cancelled / done / failed 중 하나이며, 화면은
+    snapshot()으로 진행률과 중간 결과를 주기적으로 읽어 간다.
+    """
+
+    def __init__(self, selection):
+        self.job_id = uuid.uuid4().hex
+        self.selection = dict(selection)
+        self.stocks = list(selection['selected_stocks'])
+        self.total = len(self.stocks)
+        self.completed = 0
+        self.state = 'running'
+        self.status_text = ""
+        self.results = OrderedDict()  # 선택 항목 -> AnalysisRecord
+        self.errors = []
+        self.failed = []  # 오류가 난 선택 항목
+        self.created_at = time.time()
+        self.finished_at = None
+        self.use_processes = bool(selection.get('use_process_pool', False))
+        self.worker_stats = {}  # pid -> {'tickers': 처리 종목 수, 'seconds': 처리 시간}
+        self.profiler = Profiler()  # 단계별 소요 시간과 pykrx 호출 기록
+        # 차트용으로 다시 만든 분석기 (결과 레코드를 뺀 나머지 메모리 예산 안에서 보관)
+        self._reloaded = LRUCache(max_entries=64, max_bytes=SESSION_MEMORY_BUDGET, sizeof=analyzer_nbytes)
+        self._record_bytes = 0  # 보관 중인 결과 레코드 크기 합
+        self._panel = None
+        self._market_caps = None  # 사전 필터가 조회한 종목별 시가총액(억원)
+        self._lock = threading.Lock()
+        self._resume = threading.Event()
+        self._resume.set()
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"analysis-{self.job_id[:8]}", daemon=True)
+
+    @property
+    def finished(self):
+        return self.state in ('cancelled', 'done', 'failed')
+
+    @property
+    def progress(self):
+        return self.completed / self.total if self.total else 1.0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def load_results(self, records, status_text):
+        """미리 계산된 결과로 분석 없이 바로 완료 (야간 분석 결과 등)"""
+        with self._lock:
+            for record in records:
+                self._store(record.selected_stock, record)
+            self.completed = self.total
+            self.state = 'done'
+            self.status_text = status_text
+            self.finished_at = time.time()
+        return self
+
+    def wait(self, timeout=None):
+        """작업이 끝날 때까지 대기 (timeout 초가 지나면 반환), 끝났으면 True"""
+        if self._thread.ident is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    def pause(self):
+        with self._lock:
+            if self.state == 'running':
+                self.state = 'paused'
+                self._resume.clear()
+
+    def resume(self):
+        with self._lock:
+            if self.state == 'paused':
+                self.state = 'running'
+                self._resume.set()
+
+    def cancel(self):
+        with self._lock:
+            if not self.finished:
+                self.state = 'cancelled'
+                self.finished_at = time.time()
+        self._cancel.set()
+        self._resume.set()
+
+    def snapshot(self):
+        """화면 표시용 현재 상태 사본"""
+        with self._lock:
+            return {
+                'state': self.state,
+                'completed': self.completed,
+                'total': self.total,
+                'progress': self.progress,
+                'status_text': self.status_text,
+                'results': list(self.results.values()),
+                'errors': list(self.errors),
+                'worker_stats': {pid: dict(stats) for pid, stats in self.worker_stats.items()},
+                'memory': self.memory_usage(),
+                'diagnostics': dict(self.profiler.summary(), client=dict(get_default_client().stats),
+                                    results=dict(result_cache_stats))
+            }
+
+    def memory_usage(self):
+        """작업이 보관 중인 결과/차트 데이터 메모리 (바이트)"""
+        return {'records': self._record_bytes, 'charts': self._reloaded.total_bytes, 'budget': SESSION_MEMORY_BUDGET}
+
+    def load_analyzer(self, record):
+        """결과 레코드의 차트 표시용 분석기 (다시 계산해 메모리 예산 안에서 보관)"""
+        analyzer = self._reloaded.get(record.selected_stock)
+        if analyzer is None:
+            analyzer = record.load_analyzer(self._panel, self.selection.get('chart_indicators', ()))
+            self._reloaded.put(record.selected_stock, analyzer)
+        return analyzer
+
+    def _wait_if_paused(self):
+        """일시정지 중이면 재개/취소될 때까지 대기, 취소되었으면 False"""
+        self._resume.wait()
+        return not self._cancel.is_set()
+
+    def _analyze(self, selected_stock):
+        if not self._wait_if_paused():
+            return None
+        with self.profiler.activate(parse_stock(selected_stock)[0]):
+            return analyze_record(selected_stock, self.selection, self._panel, self._market_caps)[0]
+
+    def _record(self, selected_stock, record, error):
+        _, stock_name = parse_stock(selected_stock)
+        with self._lock:
+            self.completed += 1
+            self.status_text = f"분석 완료: {stock_name}"
+            if error is not None:
+                self.errors.append(f"{stock_name} (오류: {str(error)})")
+                self.failed.append(selected_stock)
+            elif record is not None:
+                self._store(selected_stock, record)
+
+    def _store(self, selected_stock, record):
+        """결과 레코드 보관 (self._lock 안에서 호출)
+
+        차트용 분석기는 결과 레코드를 뺀 나머지 메모리 예산 안에서만 보관한다.
+        """
+        previous = self.results.get(selected_stock)
+        if previous is not None:
+            self._record_bytes -= previous.nbytes()
+        self.results[selected_stock] = record
+        self._record_bytes += record.nbytes()
+        self._reloaded.max_bytes = max(0, SESSION_MEMORY_BUDGET - self._record_bytes)
+
+    def _plan(self):
+        """시가총액/거래대금 조건을 시장 전체 스냅샷으로 먼저 적용해 분석할 종목을 줄임"""
+        with self._lock:
+            self.status_text = "시가총액/거래대금 사전 필터 적용 중..."
+        with self.profiler.activate():
+            plan = FilterPlanner().plan(self.stocks, self.selection, lambda stock: parse_stock(stock)[0])
+        self._market_caps = plan.market_caps
+        with self._lock:
+            self.stocks = plan.stocks
+            self.completed += len(plan.rejected)
+
+    def _screen_recent(self):
+        """최근 시그널 종목만 볼 때 마지막 몇 거래일의 패널로 시그널이 없는 종목을 먼저 제외
+
+        전체 기간 패널 대신 시그널 계산에 필요한 거래일만 조회하고, 남은 종목만
+        전체 기간으로 분석(백테스트)한다.
+        """
+        start_date, end_date = self.selection['start_date'], self.selection['end_date']
+        bars = SignalEngine().warmup_bars
+        with self._lock:
+            self.status_text = "최근 거래일 시그널 확인 중..."
+        with self.profiler.activate(), stage('최근 시그널 확인'):
+            tail_start = MarketPanelLoader().window_start(start_date, end_date, bars)
+            if tail_start <= start_date:
+                return
+            panel = load_market_panel(tail_start, end_date)
+        if len(panel.dates) < bars:
+            return
+        # 모든 거래일에 값이 있는 종목만 판단 (종목별 전체 기간 계산의 마지막 거래일들과 같음)
+        complete = np.logical_and.reduce([np.isfinite(panel.fields[name]).all(axis=0) for name in OHLCV_FIELDS])
+        rejected = set(panel.tickers[complete & ~SignalEngine.recent_signals(panel.fields)])
+        stocks = [stock for stock in self.stocks if parse_stock(stock)[0] not in rejected]
+        with self._lock:
+            self.completed += len(self.stocks) - len(stocks)
+            self.stocks = stocks
+        # 남은 종목은 시그널을 확인했으므로 종목별 분석에서 다시 확인하지 않음
+        self.selection['tail_window'] = False
+
+    def _run(self):
+        try:
+            self._plan()
+            if self.selection['show_recent_only'] and len(self.stocks) >= BULK_PANEL_THRESHOLD:
+                self._screen_recent()
+            if len(self.stocks) >= BULK_PANEL_THRESHOLD:
+                with self._lock:
+                    self.status_text = "시장 전체 데이터 조회 중..."
+                with self.profiler.activate(), stage('시장 패널 로딩'):
+                    self._panel = load_market_panel(self.selection['start_date'], self.selection['end_date'])
+                with self.profiler.activate(), stage('시그널 이벤트 저장'):
+                    try:
+                        get_event_store().add_panel(self._panel, self.selection['signal_verify_days'])
+                    except Exception as e:
+                        print(f"시그널 이벤트 저장 중 오류 발생: {str(e)}")
+
+            if self.use_processes:
+                self._run_processes()
+            else:
+                self._run_threads()
+
+            with self._lock:
+                if not self.finished:
+                    self.state = 'done'
+                    self.finished_at = time.time()
+        except Exception as e:
+            with self._lock:
+                self.state = 'failed'
+                self.status_text = f"분석 중 오류 발생: {str(e)}"
+                self.finished_at = time.time()
+
+    def _run_threads(self):
+        pool = KrxFetchPool()
+        for batch_start in range(0, len(self.stocks), FETCH_BATCH_SIZE):
+            if not self._wait_if_paused():
+                return
+            batch = self.stocks[batch_start:batch_start + FETCH_BATCH_SIZE]
+            for selected_stock, result, error in pool.imap_unordered(self._analyze, batch):
+                if self._cancel.is_set():
+                    break
+                self._record(selected_stock, result, error)
+
+    def _run_processes(self):
+        """종목을 PROCESS_CHUNK_SIZE개씩 나눠 CPU 코어 수만큼의 프로세스에 분배
+
+        결과 캐시에 있는 종목은 워커에 넘기지 않고 바로 반영한다.
+        """
+        stocks = []
+        for selected_stock in self.stocks:
+            record = cached_record(parse_stock(selected_stock)[0], self.selection, self._panel)
+            if record is _MISSING:
+                stocks.append(selected_stock)
+            else:
+                self._record(selected_stock, record, None)
+        if not stocks:
+            return
+        workers = os.cpu_count() or 1
+        chunks = [stocks[i:i + PROCESS_CHUNK_SIZE] for i in range(0, len(stocks), PROCESS_CHUNK_SIZE)]
+        source = get_default_client().source
+        initargs = (KRX_REQUESTS_PER_SECOND / workers, max(1, KRX_BURST // workers),
+                    None if inspect.ismodule(source) else source)
+
+        # 워커는 부모의 패널 캐시/잠금을 거치지 않고 저장한 패널 파일을 메모리 매핑으로 공유
+        panel_path = None
+        if self._panel is not None:
+            with self.profiler.activate(), stage('패널 공유 파일 저장'):
+                panel_path = tempfile.mkdtemp(prefix="panel_")
+                self._panel.save(panel_path)
+
+        # 멀티스레드 서버에서 fork하면 다른 스레드가 잡고 있던 잠금/연결 상태가 복사되므로 spawn 사용
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_init_process_worker, initargs=initargs)
+        cancelled = False
+        try:
+            pending = set()
+            while chunks or pending:
+                if self._cancel.is_set():
+                    cancelled = True
+                    return
+                # 일시정지 중에는 새 묶음을 넘기지 않음 (진행 중인 묶음은 마저 처리해 결과 반영)
+                while chunks and len(pending) < workers * 2 and self._resume.is_set():
+                    chunk = chunks.pop(0)
+                    market_caps = None
+                    if self._market_caps is not None:
+                        tickers = (parse_stock(stock)[0] for stock in chunk)
+                        market_caps = {ticker: self._market_caps[ticker] for ticker in tickers if ticker in self._market_caps}
+                    pending.add(executor.submit(analyze_chunk, chunk, self.selection, panel_path, market_caps))
+                if not pending:
+                    self._wait_if_paused()
+                    continue
+                done, pending = wait(pending, timeout=0.5, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self._record_chunk(future.result())
+        finally:
+            # 취소하면 진행 중인 묶음을 기다리지 않고 바로 반환 (워커는 묶음을 마치면 종료)
+            executor.shutdown(wait=not cancelled, cancel_futures=True)
+            if panel_path is not None:
+                shutil.rmtree(panel_path, ignore_errors=True)
+
+    def _record_chunk(self, chunk):
+        with self._lock:
+            stats = self.worker_stats.setdefault(chunk['pid'], {'tickers': 0, 'seconds': 0.0})
+            stats['tickers'] += chunk['count']
+            stats['seconds'] += chunk['elapsed']
+        self.profiler.merge(chunk['profile'])
+        for selected_stock, record, error, key in chunk['records']:
+            # 워커 프로세스의 결과를 이 프로세스의 공유 캐시에도 보관
+            if key is not None:
+                cache_record(key, record)
+            self._record(selected_stock, record, error)
+
+
+class JobManager:
+    """프로세스 전역 분석 작업 목록 (세션이 끊겨도 작업은 계속 진행)"""
+
+    def __init__(self):
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, selection):
+        """분석 작업 제출 (같은 조건의 야간 분석 결과가 있으면 분석 없이 바로 완료)"""
+        job = AnalysisJob(selection)
+        with self._lock:
+            self._cleanup()
+            self._jobs[job.job_id] = job
+        snapshot, records = get_nightly_store().lookup(selection)
+        if records is not None:
+            created = datetime.fromtimestamp(snapshot.created_at).strftime('%Y-%m-%d %H:%M')
+            return job.load_results(records, f"야간 분석 결과 사용 ({created} 기준)")
+        return job.start()
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _cleanup(self):
+        now = time.time()
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished and now - job.finished_at > FINISHED_JOB_TTL]:
+            del self._jobs[job_id]
+
+
+_job_manager = JobManager()
+
+
+def get_job_manager():
+    return _job_manager
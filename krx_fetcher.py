@@ -0,0 +1,253 @@
+#@title ##**13.krx_fetcher.py**
+# %%writefile krx_fetcher.py
+import functools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from diagnostics import record_krx_call, result_nbytes
+from shared_cache import LRUCache
+
+KRX_REQUESTS_PER_SECOND = 5  # KRX 차단을 피하기 위한 초당 요청 수
+KRX_BURST = 5
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5  # 재시도 대기 시간 (초, 시도마다 2배)
+BACKOFF_MAX = 8.0
+BREAKER_FAILURE_THRESHOLD = 5  # 연속 실패 시 차단기 동작
+BREAKER_RESET_TIMEOUT = 30.0
+DEFAULT_WORKERS = 8
+KRX_CACHE_BYTES = 256 * 1024 * 1024  # 응답 공유 캐시 크기 (약 256MB)
+LIVE_DATA_TTL = 60.0  # 당일/날짜 없는 요청 응답의 캐시 유지 시간 (초)
+# 네트워크 요청 없이 pykrx 내부 표에서 찾는 함수 (요청 제한/차단기 제외)
+LOCAL_CALLS = frozenset(['get_market_ticker_name'])
+
+
+class CircuitOpenError(Exception):
+    """연속 실패로 KRX 요청이 일시 차단된 상태"""
+
+
+class TokenBucket:
+    """초당 rate개, 최대 capacity개까지 몰아서 허용하는 토큰 버킷"""
+
+    def __init__(self, rate=KRX_REQUESTS_PER_SECOND, capacity=KRX_BURST, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self.sleep(wait)
+
+
+class CircuitBreaker:
+    """연속 실패가 threshold번 이상이면 reset_timeout 동안 요청을 차단
+
+    차단 시간이 지나면 한 번의 시험 요청을 허용하고, 성공하면 다시 연다.
+    """
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def before_call(self):
+        with self._lock:
+            state = self.state
+            if state == 'open' or (state == 'half-open' and self._trial):
+                raise CircuitOpenError("KRX 요청이 연속 실패하여 일시 차단되었습니다.")
+            if state == 'half-open':
+                self._trial = True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+class _Flight:
+    """진행 중인 요청 하나 (같은 요청을 기다리는 호출들이 결과를 공유)"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def _is_live(args, kwargs, today):
+    """당일 이후 날짜가 있거나 날짜 인자가 없는 요청 (응답이 바뀔 수 있음)"""
+    dates = [value for value in list(args) + list(kwargs.values())
+             if isinstance(value, str) and len(value) == 8 and value.isdigit()]
+    return not dates or max(dates) >= today
+
+
+def _private_copy(result):
+    """공유 캐시의 응답을 호출한 쪽에서 수정해도 다른 세션에 영향이 없도록 복사"""
+    if hasattr(result, 'copy'):
+        return result.copy()
+    return result
+
+
+class KrxClient:
+    """pykrx stock 모듈과 같은 이름으로 호출하는 요청 제한/재시도 래퍼
+
+    client.get_market_ohlcv_by_date(...)처럼 사용하며, 모든 호출이 토큰 버킷,
+    지수 백오프 재시도, 차단기를 거친다. source를 바꿔 끼우면 가짜 pykrx
+    (fake_krx.FakeKrx)로 지연/오류를 주입해 확인할 수 있다.
+
+    같은 함수/인자의 요청이 동시에 들어오면 한 번만 조회해 모든 호출에 같은
+    결과를 돌려주고(single-flight), 응답은 크기 제한 공유 캐시에 보관한다.
+    당일 데이터가 포함된 응답은 LIVE_DATA_TTL 동안만 재사용한다.
+    """
+
+    def __init__(self, source=None, limiter=None, breaker=None, max_retries=MAX_RETRIES,
+                 backoff_base=BACKOFF_BASE, backoff_max=BACKOFF_MAX, sleep=time.sleep, cache=None):
+        if source is None:
+            from pykrx import stock as source
+        self.source = source
+        self.limiter = limiter if limiter is not None else TokenBucket()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.sleep = sleep
+        self.cache = cache if cache is not None else LRUCache(max_entries=100000, max_bytes=KRX_CACHE_BYTES,
+                                                              sizeof=lambda entry: result_nbytes(entry[1]))
+        self.stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'fetches': 0}
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def call(self, name, *args, **kwargs):
+        """캐시 → 진행 중인 같은 요청 → 실제 조회 순으로 응답 반환"""
+        key = (name, args, tuple(sorted(kwargs.items())))
+        now = time.time()
+        with self._inflight_lock:
+            self.stats['requests'] += 1
+            cached = self.cache.get(key)
+            if cached is not None and (cached[0] is None or cached[0] > now):
+                self.stats['cache_hits'] += 1
+                return _private_copy(cached[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+            else:
+                self.stats['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return _private_copy(flight.result)
+
+        try:
+            flight.result = self._fetch(name, args, kwargs)
+            live = _is_live(args, kwargs, time.strftime("%Y%m%d"))
+            self.cache.put(key, (now + LIVE_DATA_TTL if live else None, flight.result))
+            return _private_copy(flight.result)
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._inflight_lock:
+                del self._inflight[key]
+            flight.done.set()
+
+    def _fetch(self, name, args, kwargs):
+        func = getattr(self.source, name)
+        if name in LOCAL_CALLS:
+            return func(*args, **kwargs)
+        with self._inflight_lock:
+            self.stats['fetches'] += 1
+        for attempt in range(self.max_retries + 1):
+            self.breaker.before_call()
+            self.limiter.acquire()
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                record_krx_call(name, time.perf_counter() - started, error=True)
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+                self.sleep(delay * random.uniform(0.5, 1.0))
+            else:
+                record_krx_call(name, time.perf_counter() - started, result)
+                self.breaker.record_success()
+                return result
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return functools.partial(self.call, name)
+
+
+class KrxFetchPool:
+    """스레드 풀에서 종목별 작업을 병렬 실행하고 끝나는 순서대로 결과 반환"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS):
+        self.max_workers = max_workers
+
+    def imap_unordered(self, func, items):
+        """(item, 결과, 예외) 튜플을 완료 순서대로 생성"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(func, item): item for item in items}
+            for future in as_completed(futures):
+                error = future.exception()
+                yield futures[future], (None if error else future.result()), error
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+def get_default_client():
+    """프로세스 전역 KrxClient (요청 제한이 모든 세션에 함께 적용됨)"""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = KrxClient()
+    return _default_client
+
+
+def set_default_client(client):
+    """프로세스 전역 KrxClient 교체 (가짜 데이터로 벤치마크/오프라인 실행 시 사용)"""
+    global _default_client
+    with _default_client_lock:
+        _default_client = client
@@ -0,0 +1,175 @@
+#@title ##**9.market_panel.py**
+# %%writefile market_panel.py
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from krx_fetcher import get_default_client
+from stock_store import DEFAULT_STORE_DIR
+
+OHLCV_FIELDS = ['시가', '고가', '저가', '종가', '거래량', '거래대금', '등락률']
+INVESTOR_FIELDS = ['외국인합계', '기관합계']
+PANEL_FIELDS = OHLCV_FIELDS + ['시가총액'] + INVESTOR_FIELDS
+
+
+class MarketPanel:
+    """날짜 x 종목 2차원 배열로 구성된 시장 전체 패널"""
+
+    def __init__(self, dates, tickers, fields):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = pd.Index(tickers)
+        self.fields = fields  # 필드명 -> np.ndarray (len(dates), len(tickers))
+        self._columns = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self._version = None
+        # 여러 스레드가 같은 날짜 인덱스를 공유하므로 인덱스 엔진을 미리 생성
+        # (동시에 처음 생성되면 pandas가 중복 라벨로 오인하는 경우가 있음)
+        self.dates.is_unique
+
+    def __contains__(self, ticker):
+        return ticker in self._columns
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def version(self):
+        """패널 데이터 식별값 (기간/종목과 마지막 거래일 값이 같으면 어느 프로세스에서 만들어도 같음)
+
+        지난 거래일 스냅샷은 바뀌지 않으므로 마지막 거래일 값만 비교한다.
+        """
+        if self._version is None:
+            digest = zlib.crc32(self.tickers.to_numpy().astype(str).tobytes())
+            if len(self.dates):
+                for name in (field for field in PANEL_FIELDS if field in self.fields):
+                    digest = zlib.crc32(np.ascontiguousarray(self.fields[name][-1]).tobytes(), digest)
+            first = self.dates[0].strftime('%Y%m%d') if len(self.dates) else None
+            last = self.dates[-1].strftime('%Y%m%d') if len(self.dates) else None
+            self._version = (first, last, len(self.tickers), digest)
+        return self._version
+
+    def save(self, path):
+        """패널을 디렉터리에 배열 파일로 저장 (다른 프로세스가 open으로 복사 없이 공유)"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "dates.npy"), self.dates.to_numpy())
+        np.save(os.path.join(path, "tickers.npy"), self.tickers.to_numpy().astype(str))
+        names = list(self.fields)
+        for i, name in enumerate(names):
+            np.save(os.path.join(path, f"field_{i}.npy"), self.fields[name])
+        with open(os.path.join(path, "fields.json"), "w", encoding='utf-8') as file:
+            json.dump(names, file, ensure_ascii=False)
+
+    @classmethod
+    def open(cls, path):
+        """save로 저장한 패널을 읽기 전용 메모리 매핑으로 열기"""
+        with open(os.path.join(path, "fields.json"), "r", encoding='utf-8') as file:
+            names = json.load(file)
+        fields = {name: np.load(os.path.join(path, f"field_{i}.npy"), mmap_mode='r') for i, name in enumerate(names)}
+        return cls(np.load(os.path.join(path, "dates.npy")), np.load(os.path.join(path, "tickers.npy")).tolist(), fields)
+
+    def nbytes(self):
+        """필드 배열 메모리 크기 (바이트)"""
+        return sum(values.nbytes for values in self.fields.values())
+
+    def column_indices(self, tickers):
+        """패널에 있는 종목들의 열 위치 (없는 종목은 제외)"""
+        return [self._columns[ticker] for ticker in tickers if ticker in self._columns]
+
+    def column(self, field, ticker):
+        return self.fields[field][:, self._columns[ticker]]
+
+    def frame(self, ticker, columns):
+        """종목 하나의 일자별 DataFrame (상장 전 등 데이터가 없는 날은 제외)"""
+        df = pd.DataFrame({name: self.column(name, ticker) for name in columns}, index=self.dates)
+        return df.dropna(how='all')
+
+    def ohlcv(self, ticker):
+        return self.frame(ticker, OHLCV_FIELDS)
+
+    def investor(self, ticker):
+        return self.frame(ticker, INVESTOR_FIELDS)
+
+    def last_value(self, field, ticker):
+        return self.column(field, ticker)[-1]
+
+
+class MarketPanelLoader:
+    """거래일별 시장 전체 스냅샷을 받아 패널로 변환
+
+    종목마다 2~3번씩 호출하는 대신 거래일마다 시장 전체 스냅샷을 조회하므로
+    호출 수가 종목 수가 아닌 거래일 수에 비례한다. 지난 거래일 스냅샷은
+    바뀌지 않으므로 디스크에 저장해 재사용한다.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR, krx=None):
+        self.root = root
+        self.krx = krx if krx is not None else get_default_client()
+
+    def business_days(self, start_date, end_date):
+        days = self.krx.get_previous_business_days(fromdate=start_date, todate=end_date)
+        return [pd.Timestamp(day).strftime("%Y%m%d") for day in days]
+
+    def window_start(self, start_date, end_date, bars):
+        """end_date까지 마지막 bars 거래일이 시작하는 날 (start_date보다 앞이면 start_date)"""
+        lookback = (datetime.strptime(end_date, "%Y%m%d") - timedelta(days=bars * 2 + 20)).strftime("%Y%m%d")
+        days = self.business_days(max(lookback, start_date), end_date)
+        if len(days) < bars:
+            return start_date
+        return max(days[-bars], start_date)
+
+    def _fetch(self, kind, date):
+        if kind == 'ohlcv':
+            return self.krx.get_market_ohlcv_by_ticker(date, market="ALL")[OHLCV_FIELDS]
+        if kind == 'cap':
+            return self.krx.get_market_cap_by_ticker(date, market="ALL")[['시가총액']]
+
+        # 투자자별 순매수 거래량 (get_market_trading_volume_by_date의 외국인합계/기관합계와 동일 기준)
+        investors = {'외국인합계': ["외국인", "기타외국인"], '기관합계': ["기관합계"]}[kind]
+        total = None
+        for investor in investors:
+            net = self.krx.get_market_net_purchases_of_equities_by_ticker(date, date, "ALL", investor)['순매수거래량']
+            total = net if total is None else total.add(net, fill_value=0)
+        return total.to_frame(kind)
+
+    def snapshot(self, kind, date):
+        """거래일 하나의 시장 전체 스냅샷 (지난 거래일은 디스크에 저장해 재사용)"""
+        path = os.path.join(self.root, "snapshot", kind, f"{date}.parquet")
+        if os.path.exists(path):
+            return pd.read_parquet(path)
+
+        df = self._fetch(kind, date)
+        # 당일 스냅샷은 장중 변동이 있으므로 저장하지 않음
+        if date < datetime.now().strftime("%Y%m%d"):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            df.to_parquet(path + ".tmp")
+            os.replace(path + ".tmp", path)
+        return df
+
+    def load(self, start_date, end_date, progress=None):
+        """start_date~end_date 구간의 시장 전체 패널 생성"""
+        dates = self.business_days(start_date, end_date)
+        kinds = ['ohlcv', 'cap', '외국인합계', '기관합계']
+        snapshots = {kind: [] for kind in kinds}
+        for i, date in enumerate(dates):
+            for kind in kinds:
+                snapshots[kind].append(self.snapshot(kind, date))
+            if progress is not None:
+                progress(i + 1, len(dates))
+
+        tickers = sorted(set().union(*(df.index for df in snapshots['ohlcv'])))
+        fields = {}
+        for kind in kinds:
+            frames = [df.reindex(tickers) for df in snapshots[kind]]
+            for name in frames[0].columns if frames else []:
+                fields[name] = np.vstack([df[name].to_numpy(dtype=float) for df in frames])
+
+        # 순매수 데이터가 없는 날은 순매수 0으로 간주
+        for name in INVESTOR_FIELDS:
+            if name in fields:
+                listed = ~np.isnan(fields['종가'])
+                fields[name] = np.where(listed & np.isnan(fields[name]), 0.0, fields[name])
+
+        return MarketPanel(pd.to_datetime(dates), tickers, fields)
@@ -0,0 +1,267 @@
+#@title ##**26.nightly_screen.py**
+# %%writefile nightly_screen.py
+"""장 마감 후 기본 설정으로 전체 종목을 미리 분석해 버전별 결과를 저장하는 야간 작업
+
+예) 평일 15시 40분에 실행 (crontab)
+    40 15 * * 1-5  cd /app && python nightly_screen.py
+
+분석 화면에서 같은 조건(기간/검증일수/시가총액·거래대금 필터)으로 분석을 시작하면
+저장된 결과를 바로 불러오고, 조건이 다르면 기존처럼 분석 작업을 실행한다.
+"""
+import argparse
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from krx_fetcher import get_default_client
+from stock_store import DATE_FORMAT, DEFAULT_STORE_DIR
+
+# StockSelector 기본값 (화면 위젯 기본값도 이 값을 사용)
+DEFAULT_PERIOD_DAYS = 365
+DEFAULT_MARKET_CAP_FILTER = (0, 100000000)
+DEFAULT_DAEKUM_CAP_FILTER = (0, 100000)
+DEFAULT_VERIFY_DAYS = 3
+
+# 장 마감 시각 (이전에는 당일 결과를 저장하지 않음)
+MARKET_CLOSE = "15:30"
+# 보관할 결과 버전 수
+KEEP_VERSIONS = 5
+# 저장 형식이 바뀌면 올려서 이전 형식 파일을 쓰지 않도록 함
+SNAPSHOT_FORMAT = 2
+# 결과에 영향을 주는 선택 항목 (보기 옵션 show_all/show_recent_only는 저장된 결과에서 걸러냄)
+# 조회 기간은 날짜 그대로가 아니라 마감된 마지막 거래일과 기간 길이로 비교
+SCREEN_PARAMS = ('signal_verify_days', 'market_cap_filter', 'daekum_cap_filter')
+# 마지막 거래일을 찾을 때 거슬러 올라가는 기간 (일, 연휴 포함)
+CALENDAR_LOOKBACK = 20
+
+
+def default_selection(stocks, today=None):
+    """StockSelector 기본 설정과 같은 선택 dict (전체 종목 선택)"""
+    today = today or datetime.now()
+    return {
+        'start_date': (today - timedelta(days=DEFAULT_PERIOD_DAYS)).strftime(DATE_FORMAT),
+        'end_date': today.strftime(DATE_FORMAT),
+        'show_all': True,
+        'show_recent_only': False,
+        'selected_stocks': list(stocks),
+        'market_cap_filter': DEFAULT_MARKET_CAP_FILTER,
+        'daekum_cap_filter': DEFAULT_DAEKUM_CAP_FILTER,
+        'signal_verify_days': DEFAULT_VERIFY_DAYS,
+        'use_process_pool': False
+    }
+
+
+def last_closed_day(end_date, now=None):
+    """end_date까지 장이 마감된 마지막 거래일
+
+    종료일이 오늘이면서 장 마감 전이거나, 주말/휴일이면 그 이전 거래일이다.
+    """
+    now = now or datetime.now()
+    cutoff = now if now.strftime("%H:%M") >= MARKET_CLOSE else now - timedelta(days=1)
+    end_date = min(end_date, cutoff.strftime(DATE_FORMAT))
+    lookback = (datetime.strptime(end_date, DATE_FORMAT) - timedelta(days=CALENDAR_LOOKBACK)).strftime(DATE_FORMAT)
+    days = get_default_client().get_previous_business_days(fromdate=lookback, todate=end_date)
+    return days[-1].strftime(DATE_FORMAT) if len(days) else end_date
+
+
+def screen_params(selection, now=None):
+    """결과 비교용 선택 항목 (필터는 튜플로 통일)
+
+    화면의 종료일 기본값은 오늘이므로 날짜를 그대로 비교하면 다음 날 아침이나
+    주말에는 전날 밤 결과와 맞지 않는다. 종료일은 마감된 마지막 거래일로,
+    시작일은 종료일까지의 기간(일)으로 바꿔 비교한다.
+    """
+    period = (datetime.strptime(selection['end_date'], DATE_FORMAT) -
+              datetime.strptime(selection['start_date'], DATE_FORMAT)).days
+    values = tuple(tuple(selection[key]) if isinstance(selection[key], (list, tuple)) else selection[key]
+                   for key in SCREEN_PARAMS)
+    return (last_closed_day(selection['end_date'], now), period) + values
+
+
+def _ticker(selected_stock):
+    return selected_stock.split(":")[0].split("]")[1].strip()
+
+
+class ScreenSnapshot:
+    """한 번의 야간 분석 결과: 분석 조건, 분석을 마친 종목, 조건을 통과한 AnalysisRecord"""
+
+    __slots__ = ('version', 'created_at', 'params', 'analyzed', 'records')
+
+    def __init__(self, version, created_at, params, analyzed, records):
+        self.version = version
+        self.created_at = created_at
+        self.params = params
+        self.analyzed = frozenset(analyzed)  # 오류 없이 분석을 마친 티커 (조건 미통과 포함)
+        self.records = {record.ticker: record for record in records}
+
+    def select(self, selection, now=None):
+        """선택 조건이 같고 선택 종목을 모두 분석했으면 화면에 표시할 레코드 목록, 아니면 None"""
+        if screen_params(selection, now) != self.params:
+            return None
+        tickers = [_ticker(stock) for stock in selection['selected_stocks']]
+        if not all(ticker in self.analyzed for ticker in tickers):
+            return None
+        records = [self.records[ticker] for ticker in tickers if ticker in self.records]
+        # StockAnalyzer.analyze_stock의 보기 옵션과 같은 기준
+        if selection['show_recent_only']:
+            return [record for record in records if record.recent_signal]
+        if not selection['show_all']:
+            return [record for record in records if record.results['전체_매수_시그널'] > 0]
+        return records
+
+
+class NightlyScreenStore:
+    """야간 분석 결과를 버전별 파일로 저장하고 최신 버전을 공유
+
+    manifest.json이 최신 버전을 가리키며, 새 버전은 파일을 다 쓴 뒤 manifest를
+    원자적으로 바꿔 게시하므로 읽는 쪽은 항상 완성된 버전만 본다.
+    불러온 버전은 프로세스 안에서 모든 세션이 공유한다.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = os.path.join(root, "nightly")
+        self._loaded = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.root, "manifest.json")
+
+    def _path(self, version):
+        return os.path.join(self.root, f"screen_{version}.pkl")
+
+    def _manifest(self):
+        try:
+            with open(self.manifest_path, "r", encoding='utf-8') as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {'format': SNAPSHOT_FORMAT, 'versions': []}
+        if manifest.get('format') != SNAPSHOT_FORMAT:
+            return {'format': SNAPSHOT_FORMAT, 'versions': []}
+        return manifest
+
+    def publish(self, selection, analyzed, records, now=None):
+        """분석 결과를 새 버전으로 저장하고 최신 버전으로 게시, 버전 이름 반환
+
+        보기 옵션으로 걸러내기 전의 결과여야 하므로 show_all=True, show_recent_only=False로
+        분석한 결과만 받는다.
+        """
+        if not selection['show_all'] or selection['show_recent_only']:
+            raise ValueError("야간 분석 결과는 '시그널이 없는 종목도 표시' 설정으로만 게시할 수 있습니다.")
+        version = f"{selection['end_date']}_{datetime.now().strftime('%H%M%S')}"
+        snapshot = ScreenSnapshot(version, time.time(), screen_params(selection, now), analyzed, records)
+        os.makedirs(self.root, exist_ok=True)
+        with open(self._path(version) + ".tmp", "wb") as file:
+            pickle.dump(snapshot, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self._path(version) + ".tmp", self._path(version))
+
+        with self._lock:
+            manifest = self._manifest()
+            versions = [v for v in manifest['versions'] if v != version] + [version]
+            for old in versions[:-KEEP_VERSIONS]:
+                try:
+                    os.remove(self._path(old))
+                except OSError:
+                    pass
+            manifest = {'format': SNAPSHOT_FORMAT, 'latest': version, 'versions': versions[-KEEP_VERSIONS:]}
+            with open(self.manifest_path + ".tmp", "w", encoding='utf-8') as file:
+                json.dump(manifest, file, ensure_ascii=False)
+            os.replace(self.manifest_path + ".tmp", self.manifest_path)
+        return version
+
+    def latest(self):
+        """게시된 최신 ScreenSnapshot (없으면 None)"""
+        version = self._manifest().get('latest')
+        if version is None:
+            return None
+        with self._lock:
+            if self._loaded is not None and self._loaded.version == version:
+                return self._loaded
+            try:
+                with open(self._path(version), "rb") as file:
+                    self._loaded = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                print(f"야간 분석 결과 로딩 중 오류 발생: {str(e)}")
+                return None
+            return self._loaded
+
+    def lookup(self, selection, now=None):
+        """selection과 같은 조건의 최신 결과 (ScreenSnapshot, 레코드 목록), 없으면 (None, None)"""
+        snapshot = self.latest()
+        if snapshot is None:
+            return None, None
+        try:
+            records = snapshot.select(selection, now)
+        except Exception as e:
+            print(f"야간 분석 결과 비교 중 오류 발생: {str(e)}")
+            return None, None
+        return (snapshot, records) if records is not None else (None, None)
+
+
+_nightly_store = None
+_nightly_store_lock = threading.Lock()
+
+
+def get_nightly_store():
+    """프로세스 전역 NightlyScreenStore 인스턴스"""
+    global _nightly_store
+    if _nightly_store is None:
+        with _nightly_store_lock:
+            if _nightly_store is None:
+                _nightly_store = NightlyScreenStore()
+    return _nightly_store
+
+
+def run_nightly(selection, store=None):
+    """기본 설정 분석 작업을 끝까지 실행하고 게시, (버전 또는 None, 작업 snapshot) 반환"""
+    from job_runner import AnalysisJob
+
+    job = AnalysisJob(selection).start()
+    job.wait()
+    snapshot = job.snapshot()
+    if snapshot['state'] != 'done':
+        return None, snapshot
+    failed = {_ticker(stock) for stock in job.failed}
+    analyzed = [ticker for ticker in map(_ticker, selection['selected_stocks']) if ticker not in failed]
+    version = (store or get_nightly_store()).publish(selection, analyzed, snapshot['results'])
+    return version, snapshot
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="장 마감 후 기본 설정으로 전체 종목 분석 결과를 미리 계산해 게시")
+    parser.add_argument("--processes", action="store_true", help="멀티코어(프로세스 풀)로 분석")
+    parser.add_argument("--force", action="store_true", help=f"장 마감({MARKET_CLOSE}) 전에도 실행")
+    parser.add_argument("--quiet", action="store_true", help="결과 출력 안 함")
+    args = parser.parse_args(argv)
+
+    if not args.force and datetime.now().strftime("%H:%M") < MARKET_CLOSE:
+        print(f"장 마감({MARKET_CLOSE}) 전에는 당일 데이터가 바뀌므로 실행하지 않습니다. (--force로 강제 실행)",
+              file=sys.stderr)
+        return 1
+
+    from stock_universe import get_universe
+    try:
+        stocks = get_universe().get_stocks("전체")
+    except Exception as e:
+        print(f"종목 목록 조회 중 오류 발생: {str(e)}", file=sys.stderr)
+        return 1
+
+    selection = default_selection(stocks)
+    selection['use_process_pool'] = args.processes
+    started = time.perf_counter()
+    version, snapshot = run_nightly(selection)
+    if version is None:
+        print(f"분석이 완료되지 않아 게시하지 않았습니다: {snapshot['state']} {snapshot['status_text']}", file=sys.stderr)
+        return 1
+    if not args.quiet:
+        print(f"게시 {version}: {snapshot['total']}개 종목, {len(snapshot['results'])}개 통과, "
+              f"오류 {len(snapshot['errors'])}개, {time.perf_counter() - started:.1f}초", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
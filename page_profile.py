@@ -0,0 +1,70 @@
+#@title ##**20.page_profile.py**
+# %%writefile page_profile.py
+import importlib
+import subprocess
+import sys
+import threading
+import time
+
+# 메뉴별로 처음 열 때 불러오는 모듈 (pykrx/pandas/plotly 등 무거운 의존성 포함)
+PAGE_MODULES = {
+    "Home": [],
+    "증권분석(test)": ['stock_selector', 'stock_display', 'job_runner'],
+    "파라미터 스윕": ['stock_selector', 'sweep_display', 'param_sweep', 'job_runner'],
+    "증권분석2": [],
+    "포트폴리오 분석": ['stock_selector', 'portfolio_display', 'portfolio_backtest', 'job_runner']
+}
+
+_stats = {}  # 메뉴 -> {'import': 첫 로딩 import 시간, 'runs': 실행 횟수, 'last': 마지막 실행 시간, 'total': 합계}
+_lock = threading.Lock()
+
+
+def load_page(page):
+    """메뉴의 모듈을 처음 열 때만 import하고 걸린 시간(초)을 기록"""
+    modules = [name for name in PAGE_MODULES.get(page, []) if name not in sys.modules]
+    started = time.perf_counter()
+    for name in modules:
+        importlib.import_module(name)
+    elapsed = time.perf_counter() - started
+    with _lock:
+        stats = _stats.setdefault(page, {'import': 0.0, 'runs': 0, 'last': 0.0, 'total': 0.0})
+        if modules:
+            stats['import'] += elapsed
+    return elapsed
+
+
+def record_run(page, seconds):
+    """메뉴 한 번의 스크립트 실행(rerun) 시간 기록"""
+    with _lock:
+        stats = _stats.setdefault(page, {'import': 0.0, 'runs': 0, 'last': 0.0, 'total': 0.0})
+        stats['runs'] += 1
+        stats['last'] = seconds
+        stats['total'] += seconds
+
+
+def page_stats(page):
+    with _lock:
+        stats = _stats.get(page)
+        return dict(stats) if stats is not None else None
+
+
+def measure_cold_import(modules):
+    """새 파이썬 프로세스에서 streamlit 이후 모듈들을 import하는 시간(초)"""
+    code = ("import time, streamlit; t = time.perf_counter()\n"
+            f"for name in {modules!r}: __import__(name)\n"
+            "print(time.perf_counter() - t)")
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def main():
+    """메뉴별 콜드 스타트 import 시간 리포트 (rerun 시간은 앱 사이드바에 표시)"""
+    print(f"{'메뉴':<16}{'앱 시작 import(초)':>20}{'메뉴 첫 로딩 import(초)':>24}")
+    base = measure_cold_import(['side_menu', 'app'])
+    for page, modules in PAGE_MODULES.items():
+        page_import = measure_cold_import(['side_menu', 'app'] + modules) - base if modules else 0.0
+        print(f"{page:<16}{base:>20.3f}{max(page_import, 0.0):>24.3f}")
+
+
+if __name__ == "__main__":
+    main()
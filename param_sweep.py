@@ -0,0 +1,112 @@
+#@title ##**17.param_sweep.py**
+# %%writefile param_sweep.py
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import final_results, forward_max_sweep
+from signal_engine import SignalEngine, rolling_mean
+
+PARAM_COLUMNS = ['단기', '장기', '수급기간', '수급기준', '검증일수']
+METRIC_COLUMNS = ['전체_매수_시그널', '성공_시그널', '실패_시그널', '성공률', '평균_수익률',
+                  '최대_수익률', '평균_손실률', '최대_손실률', '기간_평균_수익률']
+
+# 현재 전략(5/40일선, 10일 수급, 10억, 3일 검증)을 포함하는 기본 탐색 범위
+DEFAULT_GRID = {
+    '단기': [3, 5, 10, 20],
+    '장기': [20, 40, 60, 120],
+    '수급기간': [5, 10, 20],
+    '수급기준': [0, 5, 10, 20],
+    '검증일수': [3, 5, 10]
+}
+
+
+def parameter_grid(grid):
+    """탐색 범위 dict에서 유효한 조합(단기 < 장기)을 생성"""
+    for combo in itertools.product(*(sorted(set(grid[name])) for name in PARAM_COLUMNS)):
+        params = dict(zip(PARAM_COLUMNS, combo))
+        if params['단기'] < params['장기']:
+            yield params
+
+
+class ParameterSweep:
+    """이동평균 교차/수급 전략의 파라미터 조합을 한 번에 백테스트
+
+    패널에서 선택 종목 열만 꺼낸 뒤, 파라미터와 무관한 평균거래가/수급 배열과
+    기간별 이동평균, 교차 시점, 검증일수별 forward max를 한 번씩만 계산해
+    모든 조합이 공유한다. 조합마다 남는 일은 교차 시점 중 수급 조건과 검증
+    기간을 만족하는 위치를 고르는 것뿐이다. 성과는 선택 종목 전체 시그널을
+    모아 StockAnalyzer와 같은 지표(final_results)로 요약한다.
+    """
+
+    def __init__(self, panel, tickers=None):
+        columns = panel.column_indices(tickers if tickers is not None else panel.tickers)
+        self.tickers = panel.tickers[columns]
+        field = lambda name: panel.fields[name][:, columns]
+
+        self.close = field('종가')
+        self.avg_price, _, _, self.flow = SignalEngine.prepare(
+            self.close, field('거래량'), field('거래대금'), field('외국인합계'), field('기관합계'))
+        self._ma = {}
+        self._flow_mean = {}
+        self._cross = {}
+        self._outcomes = {}
+
+    def _moving_average(self, window):
+        if window not in self._ma:
+            self._ma[window] = rolling_mean(self.avg_price, window)
+        return self._ma[window]
+
+    def _flow_means(self, window):
+        if window not in self._flow_mean:
+            self._flow_mean[window] = rolling_mean(self.flow, window).ravel()
+        return self._flow_mean[window]
+
+    def _crossings(self, short_window, long_window):
+        """교차 시점의 평탄화된 위치 (조합 간 공유)"""
+        key = (short_window, long_window)
+        if key not in self._cross:
+            cross = SignalEngine.crossover(self._moving_average(short_window), self._moving_average(long_window))
+            self._cross[key] = np.flatnonzero(cross)
+        return self._cross[key]
+
+    def _prepare_outcomes(self, verify_days):
+        """검증일수별 (검증 가능 여부, 수익률, 성공 여부) 평탄화 배열"""
+        needed = sorted(set(verify_days) - set(self._outcomes))
+        if not needed:
+            return
+        close = self.close.ravel()
+        for days, fwd in forward_max_sweep(self.close, max(needed)):
+            if days in needed:
+                fwd = fwd.ravel()
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    profit = ((fwd - close) / close) * 100
+                self._outcomes[days] = (~np.isnan(fwd), profit, fwd > close)
+
+    def evaluate(self, params):
+        """파라미터 조합 하나의 전체 종목 합산 성과"""
+        crossings = self._crossings(params['단기'], params['장기'])
+        valid, profit, success = self._outcomes[params['검증일수']]
+        with np.errstate(invalid='ignore'):
+            flow_ok = self._flow_means(params['수급기간'])[crossings] >= params['수급기준']
+        selected = crossings[flow_ok & valid[crossings]]
+        results = final_results(profit[selected], int(success[selected].sum()), params['검증일수'])
+        return dict(params, **dict(zip(METRIC_COLUMNS, results.values())))
+
+    def run(self, grid=None, progress=None):
+        """탐색 범위의 모든 조합을 평가해 조합별 한 행의 DataFrame 반환"""
+        combos = list(parameter_grid(grid or DEFAULT_GRID))
+        self._prepare_outcomes({params['검증일수'] for params in combos})
+        rows = []
+        for i, params in enumerate(combos):
+            rows.append(self.evaluate(params))
+            if progress is not None:
+                progress(i + 1, len(combos))
+        return pd.DataFrame(rows, columns=PARAM_COLUMNS + METRIC_COLUMNS)
+
+
+def heatmap_table(results, x, y, value='성공률', min_signals=1):
+    """두 파라미터 축의 히트맵 표 (나머지 파라미터는 value가 가장 좋은 조합 기준)"""
+    rows = results[results['전체_매수_시그널'] >= min_signals]
+    return rows.pivot_table(index=y, columns=x, values=value, aggfunc='max')
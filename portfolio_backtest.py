@@ -0,0 +1,182 @@
+#@title ##**28.portfolio_backtest.py**
+# %%writefile portfolio_backtest.py
+import numpy as np
+import pandas as pd
+
+# 자금 배분 방식
+ALLOCATIONS = {
+    'equal': "균등 비중 (전일 총자산 / 최대 보유 종목 수)",
+    'cash': "가용 현금 분할 (현금 / 남은 자리 수)"
+}
+TRADE_COLUMNS = ['티커', '매수일', '매도일', '매수가', '매도가', '수량', '수익률', '손익']
+TRADING_DAYS_PER_YEAR = 252
+
+
+class PortfolioConfig:
+    """포트폴리오 시뮬레이션 설정 (비용은 비율, 예: 0.00015 = 0.015%)"""
+
+    __slots__ = ('initial_capital', 'max_positions', 'allocation', 'holding_days',
+                 'commission', 'tax', 'slippage')
+
+    def __init__(self, initial_capital=100000000, max_positions=10, allocation='equal', holding_days=5,
+                 commission=0.00015, tax=0.0018, slippage=0.001):
+        if allocation not in ALLOCATIONS:
+            raise ValueError(f"지원하지 않는 자금 배분 방식입니다: {allocation}")
+        if max_positions < 1 or holding_days < 1:
+            raise ValueError("최대 보유 종목 수와 보유 기간은 1 이상이어야 합니다.")
+        self.initial_capital = float(initial_capital)
+        self.max_positions = int(max_positions)
+        self.allocation = allocation
+        self.holding_days = int(holding_days)
+        self.commission = float(commission)  # 매수/매도 수수료
+        self.tax = float(tax)  # 매도 시 거래세
+        self.slippage = float(slippage)  # 체결가 불리 폭 (매수는 위로, 매도는 아래로)
+
+
+class PortfolioResult:
+    """시뮬레이션 결과: 일별 총자산/낙폭/회전율, 체결된 거래, 요약 지표"""
+
+    __slots__ = ('equity', 'drawdown', 'turnover', 'positions', 'trades', 'summary')
+
+    def __init__(self, equity, drawdown, turnover, positions, trades, summary):
+        self.equity = equity
+        self.drawdown = drawdown
+        self.turnover = turnover
+        self.positions = positions
+        self.trades = trades
+        self.summary = summary
+
+
+class PortfolioBacktest:
+    """이동평균 교차/수급 시그널을 시장 전체에서 매매하는 포트폴리오 시뮬레이터
+
+    종목별로 시그널을 따로 채점하는 analyze_performance와 달리 자금과 보유
+    종목 수를 공유한다. 시그널이 난 다음 거래일 시가에 매수하고 holding_days
+    거래일 뒤 시가에 매도한다. 자리가 모자라면 10일 수급 금액이 큰 종목부터
+    산다. 거래가 없는 날(시가가 없거나 0)에는 매수하지 않고 매도는 다음 거래일로
+    미룬다.
+
+    날짜 x 종목 배열은 처음에 한 번만 준비하며(종가 앞값 채움, 날짜별 매수 후보
+    정렬), 하루 처리는 보유 자리 수 크기의 배열 연산이다. 그래서 설정을 바꿔 다시
+    실행해도 종목 수에 비례한 비용이 들지 않는다.
+    """
+
+    def __init__(self, panel, tickers=None):
+        columns = panel.column_indices(tickers if tickers is not None else panel.tickers)
+        self.dates = panel.dates
+        self.tickers = panel.tickers[columns]
+        self.open = panel.fields['시가'][:, columns]
+        close = panel.fields['종가'][:, columns]
+        # 평가용 종가 (거래가 없는 날은 직전 종가)
+        self.mark = pd.DataFrame(close).ffill().fillna(0.0).to_numpy()
+
+        # 날짜별 매수 후보: 시그널 종목을 10일 수급 금액이 큰 순서로
+        signal = panel.fields['Signal'][:, columns] == 1
+        rows, cols = np.nonzero(signal)
+        strength = np.nan_to_num(panel.fields['10일_매수금액'][:, columns][rows, cols], nan=-np.inf)
+        order = np.lexsort((-strength, rows))
+        self._candidates = cols[order]
+        self._bounds = np.searchsorted(rows[order], np.arange(len(self.dates) + 1))
+
+    def candidates(self, day):
+        """day 거래일 종가 기준 시그널 종목 열 위치 (우선순위 순)"""
+        return self._candidates[self._bounds[day]:self._bounds[day + 1]]
+
+    def run(self, config):
+        n_days = len(self.dates)
+        slots = config.max_positions
+        held = np.full(slots, -1)  # 자리별 종목 열 위치 (-1은 빈 자리)
+        shares = np.zeros(slots)
+        cost_basis = np.zeros(slots)  # 매수 금액 + 수수료
+        entry_day = np.zeros(slots, dtype=int)
+        holding = np.zeros(len(self.tickers), dtype=bool)
+
+        cash = config.initial_capital
+        equity = np.empty(n_days)
+        traded = np.zeros(n_days)
+        positions = np.zeros(n_days, dtype=int)
+        trades = []
+        buy_rate = 1 + config.slippage
+        sell_rate = 1 - config.slippage
+
+        for day in range(n_days):
+            opens = self.open[day]
+
+            # 1. 보유 기간이 끝난 종목 시가 매도
+            due = np.flatnonzero((held >= 0) & (day - entry_day >= config.holding_days))
+            for slot in due:
+                column = held[slot]
+                price = opens[column]
+                if not price > 0:
+                    continue
+                value = shares[slot] * price * sell_rate
+                proceeds = value * (1 - config.commission - config.tax)
+                cash += proceeds
+                traded[day] += value
+                trades.append((column, entry_day[slot], day, cost_basis[slot] / shares[slot], price * sell_rate,
+                               shares[slot], (proceeds / cost_basis[slot] - 1) * 100, proceeds - cost_basis[slot]))
+                holding[column] = False
+                held[slot] = -1
+
+            # 2. 전일 시그널 종목 시가 매수
+            free = np.flatnonzero(held < 0)
+            if day > 0 and free.size:
+                target = equity[day - 1] / slots
+                for column in self.candidates(day - 1):
+                    if not free.size:
+                        break
+                    price = opens[column]
+                    if holding[column] or not price > 0:
+                        continue
+                    budget = min(cash, target if config.allocation == 'equal' else cash / free.size)
+                    unit_cost = price * buy_rate * (1 + config.commission)
+                    count = np.floor(budget / unit_cost)
+                    if count <= 0:
+                        continue
+                    slot, free = free[0], free[1:]
+                    held[slot] = column
+                    shares[slot] = count
+                    cost_basis[slot] = count * unit_cost
+                    entry_day[slot] = day
+                    holding[column] = True
+                    cash -= cost_basis[slot]
+                    traded[day] += count * price * buy_rate
+
+            # 3. 종가 평가
+            active = held >= 0
+            positions[day] = active.sum()
+            equity[day] = cash + (shares[active] * self.mark[day, held[active]]).sum()
+
+        return self._result(config, equity, traded, positions, trades)
+
+    def _result(self, config, equity, traded, positions, trades):
+        equity = pd.Series(equity, index=self.dates, name='총자산')
+        drawdown = (equity / equity.cummax() - 1) * 100
+        with np.errstate(divide='ignore', invalid='ignore'):
+            turnover = pd.Series(np.where(equity > 0, traded / equity.to_numpy() * 100, 0.0), index=self.dates, name='회전율')
+
+        trades = pd.DataFrame(trades, columns=TRADE_COLUMNS)
+        if not trades.empty:
+            trades['티커'] = self.tickers[trades['티커'].to_numpy()]
+            trades['매수일'] = self.dates[trades['매수일'].to_numpy()]
+            trades['매도일'] = self.dates[trades['매도일'].to_numpy()]
+            trades['수량'] = trades['수량'].astype(int)
+
+        years = len(equity) / TRADING_DAYS_PER_YEAR
+        final = float(equity.iloc[-1]) if len(equity) else config.initial_capital
+        returns = equity.pct_change().dropna()
+        summary = {
+            '최종_자산': final,
+            '총_수익률': (final / config.initial_capital - 1) * 100,
+            '연환산_수익률': ((final / config.initial_capital) ** (1 / years) - 1) * 100 if years > 0 and final > 0 else 0.0,
+            '최대_낙폭': float(drawdown.min()) if len(drawdown) else 0.0,
+            '샤프_지수': float(returns.mean() / returns.std() * np.sqrt(TRADING_DAYS_PER_YEAR)) if returns.std() > 0 else 0.0,
+            '거래_수': len(trades),
+            '승률': float((trades['수익률'] > 0).mean() * 100) if len(trades) else 0.0,
+            '평균_거래_수익률': float(trades['수익률'].mean()) if len(trades) else 0.0,
+            # 연간 회전율: 매수+매도 체결 금액의 절반을 평균 자산으로 나눈 값 (배)
+            '연간_회전율': float(traded.sum() / 2 / equity.mean() / years) if years > 0 and equity.mean() > 0 else 0.0,
+            '평균_보유_종목_수': float(positions.mean()) if len(positions) else 0.0
+        }
+        return PortfolioResult(equity, drawdown, turnover, pd.Series(positions, index=self.dates, name='보유_종목_수'),
+                               trades, summary)
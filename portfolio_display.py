@@ -0,0 +1,100 @@
+#@title ##**29.portfolio_display.py**
+# %%writefile portfolio_display.py
+import streamlit as st
+from datetime import datetime, timedelta
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
+
+from portfolio_backtest import ALLOCATIONS, PortfolioConfig
+
+SUMMARY_FORMATS = {
+    '최종_자산': "{:,.0f}원",
+    '총_수익률': "{:.2f}%",
+    '연환산_수익률': "{:.2f}%",
+    '최대_낙폭': "{:.2f}%",
+    '샤프_지수': "{:.2f}",
+    '거래_수': "{:,}회",
+    '승률': "{:.2f}%",
+    '평균_거래_수익률': "{:.2f}%",
+    '연간_회전율': "{:.1f}배",
+    '평균_보유_종목_수': "{:.1f}개"
+}
+
+
+class PortfolioDisplay:
+    def __init__(self):
+        if 'portfolio_result' not in st.session_state:
+            st.session_state.portfolio_result = None
+
+    def show_inputs(self):
+        """시장/기간과 포트폴리오 설정 입력, (시장, 시작일, 종료일, PortfolioConfig) 반환"""
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            market_filter = st.radio("시장 선택", ["전체", "KOSPI", "KOSDAQ"], horizontal=True, key="portfolio_market")
+        with col2:
+            start_date = st.date_input("시작일", datetime.now() - timedelta(days=365 * 3),
+                                       key="portfolio_start").strftime("%Y%m%d")
+        with col3:
+            end_date = st.date_input("종료일", datetime.now(), key="portfolio_end").strftime("%Y%m%d")
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            initial_capital = st.number_input("초기 자금 (만원)", min_value=100, value=10000, step=1000,
+                                              key="portfolio_capital")
+        with col2:
+            max_positions = st.number_input("최대 보유 종목 수", min_value=1, max_value=100, value=10,
+                                            key="portfolio_positions")
+        with col3:
+            holding_days = st.number_input("보유 기간 (거래일)", min_value=1, max_value=60, value=5,
+                                           key="portfolio_holding")
+        with col4:
+            allocation_label = st.selectbox("자금 배분", list(ALLOCATIONS.values()), key="portfolio_allocation")
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            commission = st.number_input("수수료 (%)", min_value=0.0, value=0.015, step=0.005, format="%.3f",
+                                         key="portfolio_commission")
+        with col2:
+            tax = st.number_input("매도 거래세 (%)", min_value=0.0, value=0.18, step=0.01, format="%.2f",
+                                  key="portfolio_tax")
+        with col3:
+            slippage = st.number_input("슬리피지 (%)", min_value=0.0, value=0.1, step=0.05, format="%.2f",
+                                       key="portfolio_slippage")
+
+        allocation = next(name for name, label in ALLOCATIONS.items() if label == allocation_label)
+        config = PortfolioConfig(initial_capital * 10000, max_positions, allocation, holding_days,
+                                 commission / 100, tax / 100, slippage / 100)
+        return market_filter, start_date, end_date, config
+
+    def display_results(self, result):
+        """요약 지표, 총자산/낙폭/회전율 차트와 거래 내역 표시"""
+        if result is None:
+            return
+
+        st.write("### 요약")
+        items = list(result.summary.items())
+        for row in range(0, len(items), 5):
+            columns = st.columns(5)
+            for column, (name, value) in zip(columns, items[row:row + 5]):
+                column.metric(name.replace('_', ' '), SUMMARY_FORMATS[name].format(value))
+
+        fig = make_subplots(rows=3, cols=1, shared_xaxes=True, vertical_spacing=0.04,
+                            row_heights=[0.5, 0.25, 0.25],
+                            subplot_titles=("총자산", "낙폭 (%)", "일별 회전율 (%)"))
+        fig.add_trace(go.Scatter(x=result.equity.index, y=result.equity, name='총자산',
+                                 line=dict(color='royalblue')), row=1, col=1)
+        fig.add_trace(go.Scatter(x=result.drawdown.index, y=result.drawdown, name='낙폭', fill='tozeroy',
+                                 line=dict(color='indianred')), row=2, col=1)
+        fig.add_trace(go.Bar(x=result.turnover.index, y=result.turnover, name='회전율',
+                             marker_color='seagreen'), row=3, col=1)
+        fig.update_layout(template='plotly_dark', height=800, showlegend=False)
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.write("### 거래 내역")
+        if result.trades.empty:
+            st.info("체결된 거래가 없습니다.")
+        else:
+            trades = result.trades.copy()
+            trades['매수일'] = trades['매수일'].dt.strftime('%Y-%m-%d')
+            trades['매도일'] = trades['매도일'].dt.strftime('%Y-%m-%d')
+            st.dataframe(trades.round(2), use_container_width=True, hide_index=True)
@@ -0,0 +1,149 @@
+#@title ##**19.screener.py**
+# %%writefile screener.py
+"""Streamlit 없이 종목 스크리닝을 실행하는 명령행 도구
+
+예) 장 마감 후 코스피 전체를 분석해 Parquet으로 저장
+    python screener.py --market KOSPI --output signals.parquet --recent-only
+
+화면(StockSelector)과 같은 필터를 옵션으로 받아 백그라운드 분석 작업
+(job_runner.AnalysisJob)을 그대로 실행하고, 조건을 통과한 종목을 파일로 쓴다.
+streamlit/plotly는 불러오지 않는다.
+"""
+import argparse
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from analysis_record import records_frame
+from indicator_state import IndicatorStateStore
+from job_runner import AnalysisJob
+from stock_universe import get_universe
+
+# 진행 상황 출력 주기 (초)
+REPORT_INTERVAL = 5.0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="이동평균 교차/수급 시그널 종목 스크리너")
+    parser.add_argument("--market", choices=["전체", "KOSPI", "KOSDAQ"], default="전체", help="시장 선택")
+    parser.add_argument("--start", default=(datetime.now() - timedelta(days=365)).strftime("%Y%m%d"),
+                        help="시작일 (YYYYMMDD, 기본: 1년 전)")
+    parser.add_argument("--end", default=datetime.now().strftime("%Y%m%d"), help="종료일 (YYYYMMDD, 기본: 오늘)")
+    parser.add_argument("--tickers", nargs="+", help="분석할 종목 코드 (기본: 시장 전체)")
+    parser.add_argument("--market-cap", nargs=2, type=float, default=(0, 100000000), metavar=("MIN", "MAX"),
+                        help="시가총액 필터 (억원)")
+    parser.add_argument("--daekum", nargs=2, type=float, default=(0, 100000), metavar=("MIN", "MAX"),
+                        help="거래대금 필터 (억원, 최근 5거래일 평균)")
+    parser.add_argument("--verify-days", type=int, default=3, help="매수시그널 검증일수 (1~20)")
+    parser.add_argument("--signals-only", action="store_true", help="시그널이 없는 종목 제외")
+    parser.add_argument("--recent-only", action="store_true", help="최근 거래일 매수 시그널 종목만")
+    parser.add_argument("--processes", action="store_true", help="멀티코어(프로세스 풀)로 분석")
+    parser.add_argument("--incremental", action="store_true",
+                        help="백테스트 없이 저장된 지표 상태를 하루치만 갱신해 최신 시그널만 출력 (--start는 상태가 없는 종목의 초기화 시작일)")
+    parser.add_argument("--output", default="screen.parquet", help="결과 파일 (.parquet 또는 .csv)")
+    parser.add_argument("--diagnostics", help="단계별 소요 시간/pykrx 호출 기록을 저장할 JSON lines 파일")
+    parser.add_argument("--quiet", action="store_true", help="진행 상황 출력 안 함")
+    args = parser.parse_args(argv)
+    if not 1 <= args.verify_days <= 20:
+        parser.error("--verify-days는 1~20 사이여야 합니다.")
+    if not args.output.endswith((".parquet", ".csv")):
+        parser.error("--output은 .parquet 또는 .csv 파일이어야 합니다.")
+    return args
+
+
+def build_selection(args):
+    """명령행 옵션을 StockSelector.show_selector와 같은 형식의 선택 dict로 변환"""
+    stocks = get_universe().get_stocks(args.market)
+    if args.tickers:
+        wanted = set(args.tickers)
+        stocks = [stock for stock in stocks if stock.split(":")[0].split("]")[1].strip() in wanted]
+    return {
+        'start_date': args.start,
+        'end_date': args.end,
+        'show_all': not args.signals_only,
+        'show_recent_only': args.recent_only,
+        'selected_stocks': list(stocks),
+        'market_cap_filter': tuple(args.market_cap),
+        'daekum_cap_filter': tuple(args.daekum),
+        'signal_verify_days': args.verify_days,
+        'use_process_pool': args.processes
+    }
+
+
+def run_screen(selection, quiet=False, diagnostics_path=None):
+    """선택 dict로 분석 작업을 끝까지 실행하고 (결과 DataFrame, 오류 목록, 상태) 반환"""
+    job = AnalysisJob(selection).start()
+    last_report = 0.0
+    try:
+        while not job.finished:
+            time.sleep(0.2)
+            if not quiet and time.monotonic() - last_report >= REPORT_INTERVAL:
+                last_report = time.monotonic()
+                print(f"진행률: {job.progress*100:.1f}% ({job.completed}/{job.total})", file=sys.stderr)
+    except KeyboardInterrupt:
+        job.cancel()
+    snapshot = job.snapshot()
+    if diagnostics_path:
+        with open(diagnostics_path, "w", encoding='utf-8') as file:
+            file.write(job.profiler.to_jsonl())
+    return records_frame(snapshot['results']), snapshot['errors'], snapshot
+
+
+def run_incremental(selection):
+    """종목별 지표 상태(IndicatorStateStore)를 갱신해 마지막 거래일 지표/시그널 DataFrame 반환"""
+    stocks = {stock.split(":")[0].split("]")[1].strip(): stock for stock in selection['selected_stocks']}
+    states = IndicatorStateStore().refresh(list(stocks), selection['end_date'], selection['start_date'])
+    rows = []
+    for ticker, state in states.items():
+        row = {'티커': ticker, '종목명': stocks[ticker].split(":")[1].strip(), '기준일': state.last_date}
+        row.update(state.last)
+        rows.append(row)
+    df = pd.DataFrame(rows, columns=['티커', '종목명', '기준일', '5일선', '40일선', '10일_매수금액', 'Signal'])
+    if selection['show_recent_only']:
+        df = df[df['Signal'] == 1]
+    return df
+
+
+def write_results(df, path):
+    if path.endswith(".csv"):
+        df.to_csv(path, index=False, encoding="utf-8-sig")
+    else:
+        df.to_parquet(path, index=False)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        selection = build_selection(args)
+    except Exception as e:
+        print(f"종목 목록 조회 중 오류 발생: {str(e)}", file=sys.stderr)
+        return 1
+    if not selection['selected_stocks']:
+        print("분석할 종목이 없습니다.", file=sys.stderr)
+        return 1
+
+    started = time.perf_counter()
+    if args.incremental:
+        df = run_incremental(selection)
+        write_results(df, args.output)
+        if not args.quiet:
+            print(f"지표 상태 갱신: {len(df)}개 종목, {time.perf_counter() - started:.1f}초 -> {args.output}", file=sys.stderr)
+        return 0
+
+    df, errors, snapshot = run_screen(selection, args.quiet, args.diagnostics)
+    write_results(df, args.output)
+
+    if not args.quiet:
+        print(f"분석 {snapshot['state']}: {snapshot['completed']}/{snapshot['total']}개 종목, "
+              f"{len(df)}개 통과, 오류 {len(errors)}개, {time.perf_counter() - started:.1f}초 -> {args.output}",
+              file=sys.stderr)
+    if snapshot['state'] == 'failed':
+        print(snapshot['status_text'], file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+#@title ##**12.shared_cache.py**
+# %%writefile shared_cache.py
+import sys
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """프로세스 내 모든 세션이 공유하는 크기 제한 LRU 캐시
+
+    max_entries(항목 수)와 max_bytes(sizeof로 잰 크기 합) 중 하나라도
+    넘으면 가장 오래 사용하지 않은 항목부터 제거한다.
+    """
+
+    def __init__(self, max_entries=256, max_bytes=None, sizeof=sys.getsizeof):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._items:
+                return default
+            self._items.move_to_end(key)
+            return self._items[key][0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self.total_bytes -= self._items.pop(key)[1]
+            self._items[key] = (value, size)
+            self.total_bytes += size
+            while self._items and (len(self._items) > self.max_entries or
+                                   (self.max_bytes is not None and self.total_bytes > self.max_bytes)):
+                _, (_, evicted_size) = self._items.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.total_bytes = 0
+
+
+class _Flight:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """같은 키의 작업이 동시에 요청되면 한 번만 실행하고 결과를 공유
+
+    다른 키의 작업은 서로 기다리지 않으며, 실패하면 기다리던 호출에도 같은
+    예외를 전달한다 (결과를 보관하지 않으므로 다음 호출은 다시 실행).
+    """
+
+    def __init__(self):
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func, lookup=None):
+        """key의 func() 결과 반환 (lookup()이 None이 아닌 값을 주면 실행하지 않고 그 값을 반환)"""
+        with self._lock:
+            if lookup is not None:
+                value = lookup()
+                if value is not None:
+                    return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = func()
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            flight.done.set()
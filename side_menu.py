@@ -1,18 +1,36 @@
 #@title ##**2.side_menu.py**
 # %%writefile side_menu.py
+import os
+
 import streamlit as st
 
+# 정적 파일 내용 캐시 (경로, 수정 시각) -> 내용, 프로세스 내 모든 세션이 공유
+_asset_cache = {}
+
+
+def read_asset(path):
+    """정적 파일을 메모리에 캐시해 두고 파일이 바뀌었을 때만 다시 읽음"""
+    key = (path, os.path.getmtime(path))
+    content = _asset_cache.get(key)
+    if content is None:
+        with open(path, "r", encoding='utf-8') as file:
+            content = file.read()
+        _asset_cache.clear()  # 이전 버전 내용 제거
+        _asset_cache[key] = content
+    return content
+
 class SideMenu:
-    def __init__(self):
+    def __init__(self, show_stock_analysis, show_parameter_sweep, show_portfolio_backtest):
         if 'current_menu' not in st.session_state:
             st.session_state.current_menu = "Home"
                     
         self.menu_items = {
             "Home": self.show_home,
             "주식분석시스템": {
-                "증권분석(test)": self.show_analysis1,
+                "증권분석(test)": show_stock_analysis,
+                "파라미터 스윕": show_parameter_sweep,
                 "증권분석2": self.show_analysis2,
-                "증권분석3": self.show_analysis3
+                "포트폴리오 분석": show_portfolio_backtest
             }
         }
 
@@ -31,6 +49,17 @@ class SideMenu:
 
             return selected_menu, None
 
+    def show_page_stats(self, stats, import_seconds):
+        """현재 메뉴의 모듈 로딩/실행 시간 표시"""
+        if stats is None:
+            return
+        with st.sidebar.expander("페이지 로딩 시간", expanded=False):
+            st.caption(f"첫 로딩 import: {stats['import']:.3f}초" +
+                       (" (이번 실행)" if import_seconds > 0 and stats['runs'] == 0 else ""))
+            if stats['runs']:
+                st.caption(f"직전 실행: {stats['last']:.3f}초")
+                st.caption(f"평균 실행: {stats['total'] / stats['runs']:.3f}초 ({stats['runs']}회)")
+
     def clear_page(self):
         for key in st.session_state.keys():
             # if key not in ['current_menu', 'main_menu']:
@@ -68,14 +97,13 @@ class SideMenu:
         st.header("조직도")
         
         try:
-            # SVG 파일 표시
-            with open("organi.svg", "r", encoding='utf-8') as file:
-                svg_content = file.read()
-                st.markdown(f"""
-                    <div style="display: flex; justify-content: center; margin: 20px 0;">
-                        {svg_content}
-                    </div>
-                    """, unsafe_allow_html=True)
+            # SVG 파일 표시 (매 실행마다 디스크에서 읽지 않고 메모리 캐시 사용)
+            svg_content = read_asset("organi.svg")
+            st.markdown(f"""
+                <div style="display: flex; justify-content: center; margin: 20px 0;">
+                    {svg_content}
+                </div>
+                """, unsafe_allow_html=True)
         except FileNotFoundError:
             st.error("조직도 파일(organi.svg)을 찾을 수 없습니다.")
         except Exception as e:
@@ -93,16 +121,6 @@ class SideMenu:
         - **신기한 것들**: 딥페이크,챗,RAG
         """)
 
-    def show_analysis1(self):
-        self.clear_page()
-        st.title("기술적 분석 시스템(테스트용)")
-        st.write("""
-        ### 분석 방법
-        - 이동평균선 교차
-        - 외인/기관 순매수
-        - 거래량 분석
-        """)
-
     def show_analysis2(self):
         self.clear_page()
         st.title("펀더멘탈 분석")
@@ -112,13 +130,3 @@ class SideMenu:
         - 시장 동향 분석
         - 산업별 분석
         """)
-
-    def show_analysis3(self):
-        self.clear_page()
-        st.title("포트폴리오 분석")
-        st.write("""
-        ### 준비중입니다
-        - 포트폴리오 구성
-        - 자산 배분 전략
-        - 위험 관리
-        """)
@@ -0,0 +1,92 @@
+#@title ##**10.signal_engine.py**
+# %%writefile signal_engine.py
+import numpy as np
+import pandas as pd
+
+SIGNAL_FIELDS = ['5일선', '40일선', '외인_매수', '기관_매수', '10일_매수금액', 'Signal']
+
+
+def rolling_mean(values, window):
+    """날짜 x 종목 배열의 열별 이동평균 (pandas rolling(window).mean()과 동일)"""
+    return pd.DataFrame(values).rolling(window=window).mean().to_numpy()
+
+
+def average_price(close, volume, value):
+    """평균거래가 = 거래대금 / 거래량 (거래량이 0이면 종가)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(volume != 0, np.round(value / volume, 2), close)
+
+
+class SignalEngine:
+    """시장 전체 패널에 대해 이동평균 교차/수급 시그널을 한 번에 계산
+
+    StockAnalyzer.calculate_technical_indicators와 generate_signals를 종목별
+    반복 없이 날짜 x 종목 2차원 배열에 대해 수행한다. 종목별 결과는
+    StockAnalyzer가 계산한 값과 동일하다.
+    """
+
+    def __init__(self, short_window=5, long_window=40, flow_window=10, flow_threshold=10):
+        self.short_window = short_window
+        self.long_window = long_window
+        self.flow_window = flow_window
+        self.flow_threshold = flow_threshold
+
+    @property
+    def warmup_bars(self):
+        """마지막 거래일 시그널 계산에 필요한 거래일 수 (전일 이동평균 비교 포함)"""
+        return max(self.short_window + 1, self.long_window + 1, self.flow_window)
+
+    @staticmethod
+    def prepare(close, volume, value, foreign, institution):
+        """파라미터와 무관한 중간 배열 (평균거래가, 외인/기관 순매수 금액, 합산 수급)"""
+        avg_price = average_price(close, volume, value)
+        listed = ~np.isnan(avg_price)
+
+        foreign_amount = np.nan_to_num((foreign * avg_price) / 100000000, nan=0.0)
+        institution_amount = np.nan_to_num((institution * avg_price) / 100000000, nan=0.0)
+        # 상장 전 등 데이터가 없는 날은 종목별 계산과 같도록 창에서 제외
+        flow = np.where(listed, foreign_amount + institution_amount, np.nan)
+        return avg_price, foreign_amount, institution_amount, flow
+
+    @staticmethod
+    def crossover(short_ma, long_ma):
+        """단기선이 장기선을 아래에서 위로 돌파한 날"""
+        prev_short = np.vstack([np.full((1, short_ma.shape[1]), np.nan), short_ma[:-1]])
+        prev_long = np.vstack([np.full((1, long_ma.shape[1]), np.nan), long_ma[:-1]])
+        with np.errstate(invalid='ignore'):
+            return (short_ma > long_ma) & (prev_short <= prev_long)
+
+    def compute(self, close, volume, value, foreign, institution):
+        """원 단위 거래대금과 순매수 거래량으로 지표/시그널 배열 계산"""
+        avg_price, foreign_amount, institution_amount, flow = self.prepare(close, volume, value, foreign, institution)
+
+        short_ma = rolling_mean(avg_price, self.short_window)
+        long_ma = rolling_mean(avg_price, self.long_window)
+        flow_mean = rolling_mean(flow, self.flow_window)
+
+        조건1 = self.crossover(short_ma, long_ma)
+        with np.errstate(invalid='ignore'):
+            조건2 = flow_mean >= self.flow_threshold
+
+        return {
+            '평균거래가': avg_price,
+            '5일선': short_ma,
+            '40일선': long_ma,
+            '외인_매수': foreign_amount,
+            '기관_매수': institution_amount,
+            '10일_매수금액': flow_mean,
+            'Signal': (조건1 & 조건2).astype(np.int64)
+        }
+
+    def run(self, panel):
+        """MarketPanel에 지표/시그널 필드를 추가하고 계산 결과 반환"""
+        fields = self.compute(panel.fields['종가'], panel.fields['거래량'], panel.fields['거래대금'],
+                              panel.fields['외국인합계'], panel.fields['기관합계'])
+        for name in SIGNAL_FIELDS:
+            panel.fields[name] = fields[name]
+        return fields
+
+    @staticmethod
+    def recent_signals(fields):
+        """종목별 마지막 거래일 시그널 여부"""
+        return fields['Signal'][-1] == 1
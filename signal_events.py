@@ -0,0 +1,260 @@
+#@title ##**27.signal_events.py**
+# %%writefile signal_events.py
+"""매수 시그널 발생 기록을 SQLite에 쌓아 두고 기간/종목별로 바로 조회하는 이벤트 저장소
+
+분석 작업이 계산한 시그널(종목별 분석 또는 시장 전체 패널)을 거래일 단위로
+추가하므로, "이 기간에 어떤 종목에서 시그널이 났고 결과는 어땠나"를 다시
+계산하지 않고 조회할 수 있다.
+
+예) 2024년 상반기 시그널의 종목별 성공률
+    python signal_events.py --start 20240101 --end 20240630 --by ticker
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest_engine import forward_max
+from signal_engine import SignalEngine
+from stock_store import DATE_FORMAT, DEFAULT_STORE_DIR, merge_intervals
+
+EVENTS_DB = os.path.join(DEFAULT_STORE_DIR, "signal_events.sqlite")
+EVENT_COLUMNS = ['티커', '날짜', '진입가', '최고가', '수익률', '성공']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS signal_events (
+    params TEXT NOT NULL,
+    verify_days INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    ticker TEXT NOT NULL,
+    entry_price REAL NOT NULL,
+    forward_max REAL,
+    profit REAL,
+    outcome INTEGER,
+    PRIMARY KEY (params, verify_days, date, ticker)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS signal_events_ticker ON signal_events (params, verify_days, ticker, date);
+CREATE TABLE IF NOT EXISTS indexed_ranges (
+    params TEXT NOT NULL,
+    verify_days INTEGER NOT NULL,
+    ticker TEXT NOT NULL,
+    intervals TEXT NOT NULL,
+    PRIMARY KEY (params, verify_days, ticker)
+) WITHOUT ROWID;
+"""
+
+# 집계 기준별 SQL 그룹 식
+_GROUPS = {'ticker': "ticker", 'date': "date", 'month': "substr(date, 1, 6)"}
+
+
+def strategy_params(engine=None):
+    """시그널 전략 파라미터 문자열 (단기/장기 이동평균, 수급 기간, 수급 기준)"""
+    engine = engine or SignalEngine()
+    return f"{engine.short_window}/{engine.long_window}/{engine.flow_window}/{engine.flow_threshold}"
+
+
+def extract_events(dates, close, signal, verify_days, today=None):
+    """날짜 x 종목(또는 1차원) 배열에서 장이 끝난 거래일의 시그널 이벤트 추출
+
+    결과 검증 기간(verify_days 거래일)이 모두 지나지 않은 시그널은 최고가/성공을 NaN으로
+    둬서 다음 갱신 때 채운다. 당일(장중) 시그널은 바뀔 수 있으므로 넣지 않는다.
+    반환: (행 위치, 열 위치, 진입가, 최고가, 수익률, 성공) 배열
+    """
+    today = today or datetime.now().strftime(DATE_FORMAT)
+    dates = pd.DatetimeIndex(dates).strftime(DATE_FORMAT)
+    closed = int(np.searchsorted(dates, today))
+    close = np.asarray(close, dtype=float)[:closed]
+    signal = np.asarray(signal)[:closed]
+    if close.ndim == 1:
+        close, signal = close[:, None], signal[:, None]
+
+    fwd = forward_max(close, verify_days)
+    rows, cols = np.nonzero(signal == 1)
+    entry = close[rows, cols]
+    top = fwd[rows, cols]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        profit = ((top - entry) / entry) * 100
+    outcome = np.where(np.isnan(top), np.nan, (top > entry).astype(float))
+    return dates[rows], cols, entry, top, profit, outcome
+
+
+def _nullable(value):
+    return None if np.isnan(value) else float(value)
+
+
+class SignalEventStore:
+    """(전략 파라미터, 검증일수, 날짜, 종목)별 시그널 이벤트 테이블
+
+    날짜 순 기본 키와 종목 순 보조 인덱스가 있어 기간 조회와 종목 조회 모두
+    인덱스로 처리한다. 같은 이벤트를 다시 넣으면 덮어쓰므로(upsert) 갱신은
+    새 거래일과 검증 기간이 끝난 시그널의 결과만 바뀐다.
+    """
+
+    def __init__(self, path=EVENTS_DB):
+        self.path = path
+        self._local = threading.local()
+        self._indexed_panels = set()  # 이미 반영한 (패널 버전, 파라미터, 검증일수)
+        self._initialized = False
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        """스레드별 연결 (테이블 생성과 WAL 설정은 처음 한 번만)"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            with self._lock:
+                if not self._initialized:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with sqlite3.connect(self.path, timeout=30) as setup:
+                        setup.execute("PRAGMA journal_mode=WAL")
+                        setup.executescript(_SCHEMA)
+                    setup.close()
+                    self._initialized = True
+            # 트랜잭션은 upsert에서 직접 시작 (BEGIN IMMEDIATE로 쓰기 잠금을 기다림)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def upsert(self, params, verify_days, events, ranges):
+        """이벤트 행 (티커, 날짜, 진입가, 최고가, 수익률, 성공)과 종목별 반영 구간 {티커: (시작일, 종료일)} 저장"""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO signal_events VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (params, verify_days, date, ticker) DO UPDATE SET "
+                # 짧은 구간으로 다시 분석해 검증 전(NULL)이 된 행이 이미 검증된 결과를 지우지 않도록 함
+                "entry_price = excluded.entry_price, "
+                "forward_max = COALESCE(excluded.forward_max, signal_events.forward_max), "
+                "profit = COALESCE(excluded.profit, signal_events.profit), "
+                "outcome = COALESCE(excluded.outcome, signal_events.outcome)",
+                [(params, verify_days, date, ticker, float(entry), _nullable(top), _nullable(profit),
+                  None if np.isnan(outcome) else int(outcome))
+                 for ticker, date, entry, top, profit, outcome in events])
+            existing = dict(connection.execute(
+                "SELECT ticker, intervals FROM indexed_ranges WHERE params = ? AND verify_days = ?",
+                (params, verify_days)).fetchall()) if ranges else {}
+            connection.executemany(
+                "INSERT OR REPLACE INTO indexed_ranges VALUES (?, ?, ?, ?)",
+                [(params, verify_days, ticker,
+                  json.dumps(merge_intervals(json.loads(existing.get(ticker, "[]")) + [list(span)])))
+                 for ticker, span in ranges.items()])
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def add_analyzer(self, analyzer, params=None):
+        """분석이 끝난 StockAnalyzer의 시그널 이벤트 반영"""
+        df = analyzer.df
+        bars = SignalEngine().warmup_bars
+        if df is None or 'Signal' not in df.columns or len(df) < bars:
+            return 0
+        dates, _, entry, top, profit, outcome = extract_events(
+            df.index, df['종가'].to_numpy(dtype=float), df['Signal'].to_numpy(), analyzer.signal_verify_days)
+        closed = df.index[df.index.strftime(DATE_FORMAT) < datetime.now().strftime(DATE_FORMAT)]
+        ranges = {}
+        if len(closed) >= bars:
+            ranges[analyzer.ticker] = (closed[bars - 1].strftime(DATE_FORMAT), closed[-1].strftime(DATE_FORMAT))
+        self.upsert(params or strategy_params(), analyzer.signal_verify_days,
+                    zip([analyzer.ticker] * len(dates), dates, entry, top, profit, outcome), ranges)
+        return len(dates)
+
+    def add_panel(self, panel, verify_days, params=None):
+        """SignalEngine.run을 마친 시장 전체 패널의 시그널 이벤트를 한 번에 반영 (같은 패널은 한 번만)"""
+        params = params or strategy_params()
+        key = (panel.version, params, verify_days)
+        with self._lock:
+            if key in self._indexed_panels:
+                return 0
+        bars = SignalEngine().warmup_bars
+        dates, cols, entry, top, profit, outcome = extract_events(
+            panel.dates, panel.fields['종가'], panel.fields['Signal'], verify_days)
+        closed = panel.dates[panel.dates.strftime(DATE_FORMAT) < datetime.now().strftime(DATE_FORMAT)]
+        ranges = {}
+        if len(closed) >= bars:
+            span = (closed[bars - 1].strftime(DATE_FORMAT), closed[-1].strftime(DATE_FORMAT))
+            ranges = {ticker: span for ticker in panel.tickers}
+        self.upsert(params, verify_days, zip(panel.tickers[cols], dates, entry, top, profit, outcome), ranges)
+        with self._lock:
+            self._indexed_panels.add(key)
+        return len(dates)
+
+    def events(self, start_date, end_date, verify_days=3, tickers=None, params=None):
+        """기간 안의 시그널 이벤트 DataFrame (tickers를 주면 해당 종목만)"""
+        query = ("SELECT ticker, date, entry_price, forward_max, profit, outcome FROM signal_events "
+                 "WHERE params = ? AND verify_days = ? AND date BETWEEN ? AND ?")
+        args = [params or strategy_params(), verify_days, start_date, end_date]
+        if tickers:
+            query += f" AND ticker IN ({', '.join('?' * len(tickers))})"
+            args += list(tickers)
+        rows = self._connection().execute(query + " ORDER BY date, ticker", args).fetchall()
+        return pd.DataFrame(rows, columns=EVENT_COLUMNS)
+
+    def success_rates(self, start_date, end_date, verify_days=3, by='ticker', params=None):
+        """기간 안의 시그널을 종목/날짜/월별로 묶은 시그널 수, 성공률, 평균 수익률 (결과가 나온 시그널 기준)"""
+        group = _GROUPS[by]
+        rows = self._connection().execute(
+            f"SELECT {group} AS key, COUNT(*), COUNT(outcome), SUM(outcome), AVG(profit) FROM signal_events "
+            "WHERE params = ? AND verify_days = ? AND date BETWEEN ? AND ? GROUP BY key ORDER BY key",
+            (params or strategy_params(), verify_days, start_date, end_date)).fetchall()
+        df = pd.DataFrame(rows, columns=[by, '전체_시그널', '검증_완료', '성공_시그널', '평균_수익률'])
+        df['성공_시그널'] = df['성공_시그널'].fillna(0).astype(int)
+        df['성공률'] = np.where(df['검증_완료'] > 0, df['성공_시그널'] / df['검증_완료'].clip(lower=1) * 100, 0.0)
+        return df
+
+    def coverage(self, ticker, verify_days=3, params=None):
+        """종목의 시그널을 반영한 날짜 구간 목록 (이 구간 밖은 조회 결과에 없을 수 있음)"""
+        row = self._connection().execute(
+            "SELECT intervals FROM indexed_ranges WHERE params = ? AND verify_days = ? AND ticker = ?",
+            (params or strategy_params(), verify_days, ticker)).fetchone()
+        return json.loads(row[0]) if row else []
+
+
+_event_store = None
+_event_store_lock = threading.Lock()
+
+
+def get_event_store():
+    """프로세스 전역 SignalEventStore 인스턴스"""
+    global _event_store
+    if _event_store is None:
+        with _event_store_lock:
+            if _event_store is None:
+                _event_store = SignalEventStore()
+    return _event_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="저장된 매수 시그널 이벤트 조회/집계")
+    parser.add_argument("--start", required=True, help="시작일 (YYYYMMDD)")
+    parser.add_argument("--end", required=True, help="종료일 (YYYYMMDD)")
+    parser.add_argument("--verify-days", type=int, default=3, help="매수시그널 검증일수")
+    parser.add_argument("--tickers", nargs="+", help="조회할 종목 코드 (기본: 전체)")
+    parser.add_argument("--by", choices=list(_GROUPS), help="종목/날짜/월별 성공률 집계 (기본: 이벤트 목록)")
+    parser.add_argument("--build", action="store_true",
+                        help="조회 전에 기간의 시장 전체 패널로 시그널을 계산해 반영")
+    args = parser.parse_args(argv)
+
+    store = get_event_store()
+    if args.build:
+        from job_runner import load_market_panel
+        added = store.add_panel(load_market_panel(args.start, args.end), args.verify_days)
+        print(f"시그널 이벤트 {added}건 반영", file=sys.stderr)
+
+    with pd.option_context('display.max_rows', 200, 'display.width', 200):
+        if args.by:
+            print(store.success_rates(args.start, args.end, args.verify_days, args.by).to_string(index=False))
+        else:
+            print(store.events(args.start, args.end, args.verify_days, args.tickers).to_string(index=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
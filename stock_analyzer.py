@@ -1,20 +1,43 @@
 # #@title ##**3.stock_analyzer.py**
 # %%writefile stock_analyzer.py
-import plotly.graph_objects as go
 from datetime import datetime, timedelta
-from pykrx import stock
 import pandas as pd
 import numpy as np
-import streamlit as st
+from stock_store import StockDataStore
+from krx_fetcher import get_default_client
+from market_panel import MarketPanelLoader
+from signal_engine import SIGNAL_FIELDS, SignalEngine
+from backtest_engine import evaluate_signals, final_results, forward_max, summarize
+from shared_cache import LRUCache
+from diagnostics import stage
+from indicator_registry import CHART_INDICATORS, STRATEGY_INDICATORS, IndicatorEngine, default_registry
+
+CHART_MAX_POINTS = 1000  # 서버에서 다운샘플링 후 남길 최대 봉 개수
+WEBGL_THRESHOLD = 500  # 이 개수를 넘는 점은 WebGL(Scattergl)로 표시
+
+# 직렬화된 차트 JSON 캐시 (세션 간 공유, 약 256MB 제한)
+_chart_cache = LRUCache(max_entries=1024, max_bytes=256 * 1024 * 1024, sizeof=len)
 
 class StockAnalyzer:
-    def __init__(self):
+    def __init__(self, store=None, panel=None, krx=None):
         self.df = None
+        self.ticker = None
+        self.start_date = None
+        self.end_date = None
+        self.signal_outcomes = None
+        self.error = None  # 조회/분석 실패 사유 (조건 미달로 제외된 것과 구분, 실패한 결과는 캐시하지 않음)
+        self.store = store if store is not None else StockDataStore()
+        self.panel = panel  # 대량 분석 시 시장 전체 패널(MarketPanel)
+        self.krx = krx if krx is not None else get_default_client()  # 요청 제한/재시도 pykrx 래퍼
+        self.market_caps = None  # 사전 필터(FilterPlanner)가 스냅샷으로 조회한 종목별 시가총액(억원)
+        self.tail_window = True  # 최근 시그널 종목만 볼 때 마지막 몇 거래일로 먼저 시그널 확인
         self.show_all = False
         self.show_recent_only = False
         self.signal_verify_days = 3
         self.market_cap_filter = (0, 100000000) 
         self.daekum_cap_filter = (0, 1000000) 
+        self.chart_indicators = ()  # 차트에 추가로 표시할 보조지표 이름 (indicator_registry)
+        self.indicators = IndicatorEngine()
 
     def set_display_option(self, show_all, show_recent_only, market_cap_filter, signal_verify_days, daekum_cap_filter):
         """디스플레이 옵션 설정"""
@@ -24,17 +47,53 @@ class StockAnalyzer:
         self.daekum_cap_filter = daekum_cap_filter
         self.signal_verify_days = signal_verify_days
 
+    def set_chart_indicators(self, chart_indicators):
+        """차트 보조지표 설정 (default_registry.chart_options()의 표시 이름 목록)"""
+        options = default_registry.chart_options()
+        self.chart_indicators = tuple(name for label in chart_indicators for name in options.get(label, []))
+
+    def data_version(self):
+        """분석 데이터 버전 (패널이면 패널 식별값, 아니면 로컬 저장소의 일봉/투자자 버전)"""
+        if self.panel is not None and self.ticker in self.panel:
+            return self.panel.version
+        return (self.store.version('ohlcv', self.ticker), self.store.version('investor', self.ticker))
+
+    def _indicator_key(self):
+        """지표 캐시 키 (종목/기간과 데이터가 같으면 세션이 달라도 재사용)
+
+        저장소가 구간을 다시 받아 값이 바뀌면 데이터 버전이 달라지므로 이전 값을 쓰지 않는다.
+        """
+        if self.ticker is None or self.df is None or self.df.empty:
+            return None
+        return (self.ticker, self.start_date, self.end_date, self.data_version(),
+                len(self.df), self.df.index[-1], float(self.df['종가'].iloc[-1]))
+
+    def _business_days(self, start_date, end_date):
+        return self.krx.get_previous_business_days(fromdate=start_date, todate=end_date)
+
     # @st.cache_data(ttl=3600)  # 1시간 캐시
     def get_stock_data(self, ticker, start_date, end_date):
         """주식 데이터 조회 및 전처리"""
         try:
-            # OHLCV 데이터 조회
-            df = stock.get_market_ohlcv_by_date(start_date, end_date, ticker, adjusted=False)
+            use_panel = self.panel is not None and ticker in self.panel
+
+            # OHLCV 데이터 조회 (패널이 있으면 패널에서, 없으면 로컬 저장소에 없는 구간만 pykrx 조회)
+            if use_panel:
+                df = self.panel.ohlcv(ticker)
+            else:
+                df = self.store.get('ohlcv', ticker, start_date, end_date,
+                                    lambda s, e: self.krx.get_market_ohlcv_by_date(s, e, ticker, adjusted=False),
+                                    self._business_days)
             if df is None or df.empty or len(df) < 40:
                 return None
 
             # 투자자 데이터 조회
-            inv_df = stock.get_market_trading_volume_by_date(start_date, end_date, ticker)
+            if use_panel:
+                inv_df = self.panel.investor(ticker)
+            else:
+                inv_df = self.store.get('investor', ticker, start_date, end_date,
+                                        lambda s, e: self.krx.get_market_trading_volume_by_date(s, e, ticker),
+                                        self._business_days)
             if inv_df is None or inv_df.empty:
                 return None
 
@@ -53,40 +112,54 @@ class StockAnalyzer:
             df['외인순매수금액'] = (inv_df['외국인합계'] * df['평균거래가']) / 100000000
             df['기관순매수금액'] = (inv_df['기관합계'] * df['평균거래가']) / 100000000
 
+            # SignalEngine이 패널 전체에 대해 미리 계산한 지표/시그널 사용
+            if use_panel and 'Signal' in self.panel.fields:
+                precomputed = self.panel.frame(ticker, SIGNAL_FIELDS)
+                for column in SIGNAL_FIELDS:
+                    df[column] = precomputed[column]
+                df['Signal'] = df['Signal'].astype(int)
+
             self.df = df
             return df
 
         except Exception as e:
             print(f"데이터 조회 중 오류 발생: {str(e)}")
+            self.error = f"데이터 조회 실패: {str(e)}"
             return None
 
     def calculate_technical_indicators(self):
-        """기술적 지표 계산"""
+        """기술적 지표 계산 (보조지표는 차트를 그릴 때 plot_stock_chart에서 계산)"""
         try:
-            self.df['5일선'] = self.df['평균거래가'].rolling(window=5).mean()
-            self.df['40일선'] = self.df['평균거래가'].rolling(window=40).mean()
-            return self.df
+            return self.indicators.apply(self.df, CHART_INDICATORS, self._indicator_key())
         except Exception as e:
             print(f"기술적 지표 계산 중 오류: {str(e)}")
             return None
 
     def generate_signals(self):
-        """매매 시그널 생성"""
+        """매매 시그널 생성 (이미 계산한 이동평균선 등 공통 입력은 캐시에서 재사용)"""
         try:
-            self.df['외인_매수'] = self.df['외인순매수금액'].fillna(0)
-            self.df['기관_매수'] = self.df['기관순매수금액'].fillna(0)
-            self.df['10일_매수금액'] = (self.df['외인_매수'] + self.df['기관_매수']).rolling(window=10).mean()
-
-            self.df['Signal'] = 0
-            조건1 = (self.df['5일선'] > self.df['40일선']) & (self.df['5일선'].shift(1) <= self.df['40일선'].shift(1))
-            조건2 = self.df['10일_매수금액'] >= 10
-
-            self.df.loc[조건1 & 조건2, 'Signal'] = 1
-            return self.df
+            return self.indicators.apply(self.df, STRATEGY_INDICATORS, self._indicator_key())
         except Exception as e:
             print(f"시그널 생성 중 오류: {str(e)}")
             return None
 
+    def recent_signal_in_tail(self, ticker, start_date, end_date):
+        """마지막 거래일 시그널 여부를 시그널 계산에 필요한 마지막 거래일들만 조회해 판단
+
+        구간 안에 빈 날이 있는 등 전체 기간 계산과 같다고 볼 수 없으면 None.
+        """
+        bars = SignalEngine().warmup_bars
+        tail_start = MarketPanelLoader(krx=self.krx).window_start(start_date, end_date, bars)
+        if tail_start <= start_date:
+            return None
+        df = self.get_stock_data(ticker, tail_start, end_date)
+        if df is None or len(df) < bars:
+            # 판단하지 못하면 전체 기간 조회 결과로 판단 (그 조회가 성공하면 실패로 보지 않음)
+            self.error = None
+            return None
+        signal = self.indicators.compute(df, ['Signal'])['Signal']
+        return bool(signal.iloc[-1] == 1)
+
     def has_recent_signal(self):
         """최근 거래일의 매수 시그널 확인"""
         try:
@@ -100,25 +173,39 @@ class StockAnalyzer:
     def analyze_stock(self, ticker, start_date, end_date):
         """종목 분석 통합 함수"""
         try:
-            df = self.get_stock_data(ticker, start_date, end_date)
+            self.ticker, self.start_date, self.end_date = ticker, start_date, end_date
+            self.error = None
+            # 최근 시그널이 없는 종목은 전체 기간 조회/백테스트 없이 제외
+            if self.show_recent_only and self.tail_window and self.panel is None:
+                with stage('최근 시그널 확인'):
+                    recent = self.recent_signal_in_tail(ticker, start_date, end_date)
+                if recent is False:
+                    return None, None
+
+            with stage('데이터 조회'):
+                df = self.get_stock_data(ticker, start_date, end_date)
             if df is None:
                 return None, None
 
-            self.calculate_technical_indicators()
-            self.generate_signals()
-            results = self.analyze_performance()
-            capbool = self.filter_by_market_cap(ticker, end_date)
-            
+            # 거래대금/시가총액 필터를 지표 계산과 백테스트보다 먼저 적용
             # last_5_avg = df['거래대금'].tail(5).mean()
             last_5_avg = df['거래대금'].iloc[-6:-1].mean()
-
-
             if not(self.daekum_cap_filter[0] <= last_5_avg <= self.daekum_cap_filter[1]):
                 return None, None
-            
+
+            with stage('시가총액 조회'):
+                capbool = self.filter_by_market_cap(ticker, end_date)
             if(not capbool):
-                return None, None  
-                        
+                return None, None
+
+            if 'Signal' not in df.columns:
+                with stage('지표 계산'):
+                    self.calculate_technical_indicators()
+                with stage('시그널 생성'):
+                    self.generate_signals()
+            with stage('백테스트'):
+                results = self.analyze_performance()
+
             # 최근 매수 시그널 필터링
             if self.show_recent_only:
                 if not self.has_recent_signal():
@@ -131,6 +218,7 @@ class StockAnalyzer:
 
         except Exception as e:
             print(f"종목 분석 중 오류 발생: {str(e)}")
+            self.error = f"분석 실패: {str(e)}"
             return None, None
         
     def filter_by_market_cap(self, ticker, end_date):
@@ -141,153 +229,159 @@ class StockAnalyzer:
             #     market_cap = cap_df.loc[ticker, '시가총액'] / 100000000  # 억원 단위
             #     return self.market_cap_filter[0] <= market_cap <= self.market_cap_filter[1]
             # return False
-        
+
+            if self.panel is not None and ticker in self.panel:
+                sigatot = self.panel.last_value('시가총액', ticker)/100000000
+                return self.market_cap_filter[0] <= sigatot <= self.market_cap_filter[1]
+
+            if self.market_caps is not None and ticker in self.market_caps:
+                sigatot = self.market_caps[ticker]
+                return self.market_cap_filter[0] <= sigatot <= self.market_cap_filter[1]
+
             cap_end = datetime.strptime(end_date, '%Y%m%d')
             cap_start = cap_end - timedelta(days=10)
-            df1 = stock.get_market_cap_by_date(cap_start.strftime('%Y%m%d'), 
+            df1 = self.krx.get_market_cap_by_date(cap_start.strftime('%Y%m%d'), 
                                                 end_date, 
                                                 ticker)
+            if df1 is None or df1.empty:
+                return False  # 최근 시가총액이 없는 종목 (조회 실패가 아님)
             sigatot = df1.iloc[-1]['시가총액']/100000000 
             return self.market_cap_filter[0] <= sigatot <= self.market_cap_filter[1]
 
-        except Exception:
-            return False        
+        except Exception as e:
+            # 조회 실패(KRX 오류/차단 등)는 조건 미달이 아니므로 제외 결과로 남기지 않음
+            self.error = f"시가총액 조회 실패: {str(e)}"
+            return False
 
     def analyze_performance(self):
-        """매매 성과 분석"""
+        """매매 성과 분석 (시그널 전체를 배열 연산으로 한 번에 검증)"""
         try:
-            signals = self.df[self.df['Signal'] == 1].index
-            results = {
-                '전체_매수_시그널': 0,
-                '성공_시그널': 0,
-                '실패_시그널': 0,
-                '수익률_리스트': []
-            }
-
-            for signal_date in signals:
-                idx = self.df.index.get_loc(signal_date)
-                if idx + self.signal_verify_days >= len(self.df):
-                    continue
-
-                entry_price = self.df.iloc[idx]['종가']
-                future_prices = self.df.iloc[idx+1:idx+(self.signal_verify_days + 1)]['종가']
-                max_price = future_prices.max()
-
-                profit = ((max_price - entry_price) / entry_price) * 100
-                results['수익률_리스트'].append(profit)
-                results['전체_매수_시그널'] += 1
-
-                if max_price > entry_price:
-                    results['성공_시그널'] += 1
-                else:
-                    results['실패_시그널'] += 1
-
-            return self.calculate_final_results(results)
+            close = self.df['종가'].to_numpy(dtype=float)
+            self.signal_outcomes = evaluate_signals(close, self.df['Signal'].to_numpy(),
+                                                    forward_max(close, self.signal_verify_days))
+            return summarize(self.signal_outcomes, self.signal_verify_days)
         except Exception as e:
             print(f"성과 분석 중 오류: {str(e)}")
             return None
 
     def calculate_final_results(self, results):
         """최종 결과 계산"""
-        if results['전체_매수_시그널'] == 0:
-            return {
-                '전체_매수_시그널': 0,
-                '성공_시그널': 0,
-                '실패_시그널': 0,
-                '성공률': 0,
-                '평균_수익률': 0,
-                '최대_수익률': 0,
-                '평균_손실률': 0,
-                '최대_손실률': 0,
-                f'{self.signal_verify_days}일후_평균_수익률': 0
-            }
-
-        수익률_array = np.array(results['수익률_리스트'])
-        양수_수익률 = 수익률_array[수익률_array > 0]
-        음수_수익률 = 수익률_array[수익률_array <= 0]
-
-        return {
-            '전체_매수_시그널': results['전체_매수_시그널'],
-            '성공_시그널': results['성공_시그널'],
-            '실패_시그널': results['실패_시그널'],
-            '성공률': (results['성공_시그널'] / results['전체_매수_시그널']) * 100,
-            '평균_수익률': np.mean(양수_수익률) if len(양수_수익률) > 0 else 0,
-            '최대_수익률': np.max(수익률_array) if len(수익률_array) > 0 else 0,
-            '평균_손실률': np.mean(음수_수익률) if len(음수_수익률) > 0 else 0,
-            '최대_손실률': np.min(수익률_array) if len(수익률_array) > 0 else 0,
-            f'{self.signal_verify_days}일후_평균_수익률': np.mean(수익률_array)
-        }
-
-    # @st.cache_data
+        return final_results(results['수익률_리스트'], results['성공_시그널'], self.signal_verify_days)
+
+    def _downsample(self, df):
+        """봉 개수가 CHART_MAX_POINTS를 넘으면 연속된 봉을 묶어 OHLC로 축약"""
+        if len(df) <= CHART_MAX_POINTS:
+            return df
+        bucket = -(-len(df) // CHART_MAX_POINTS)
+        groups = np.arange(len(df)) // bucket
+        aggregations = {'시가': 'first', '고가': 'max', '저가': 'min', '종가': 'last'}
+        aggregations.update({name: 'last' for name in CHART_INDICATORS + self.chart_indicators})
+        sampled = df.groupby(groups).agg(aggregations)
+        sampled.index = df.index[np.minimum((sampled.index + 1) * bucket, len(df)) - 1]
+        return sampled
+
+    def _chart_cache_key(self):
+        """차트 캐시 키 (종목/기간, 데이터 버전, 표시 파라미터)
+
+        과거 구간 값이 수정되어도 데이터 버전이 바뀌므로 이전 차트를 쓰지 않는다.
+        """
+        if self.ticker is None:
+            return None
+        return (self.ticker, self.start_date, self.end_date, self.data_version(),
+                self.signal_verify_days, self.chart_indicators)
+
     def plot_stock_chart(self):
-        """주가 차트 생성"""
+        """주가 차트 생성 (종목/기간/파라미터별 직렬화된 차트 캐시)"""
+        # 분석만 하는 배치/CLI 실행에서는 plotly를 불러오지 않도록 차트 생성 시점에 import
+        import plotly.graph_objects as go
+        import plotly.io as pio
+        from plotly.subplots import make_subplots
+
         try:
             if self.df is None or self.df.empty:
                 return None
 
-            fig = go.Figure()
+            cache_key = self._chart_cache_key()
+            cached = _chart_cache.get(cache_key) if cache_key is not None else None
+            if cached is not None:
+                return pio.from_json(cached)
+
+            if self.chart_indicators:
+                self.indicators.apply(self.df, self.chart_indicators, self._indicator_key())
+            chart_df = self._downsample(self.df)
+            # 점이 많으면 WebGL 트레이스로 그려 브라우저 부하를 줄임
+            scatter = go.Scattergl if len(chart_df) > WEBGL_THRESHOLD else go.Scatter
+
+            # RSI/MACD처럼 주가와 단위가 다른 보조지표는 아래 패널에 표시
+            lower = [name for name in self.chart_indicators if not default_registry.indicators[name].overlay]
+            if lower:
+                fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.03)
+            else:
+                fig = go.Figure()
 
             # 캔들스틱 차트
             fig.add_trace(go.Candlestick(
-                x=self.df.index,
-                open=self.df['시가'],
-                high=self.df['고가'],
-                low=self.df['저가'],
-                close=self.df['종가'],
+                x=chart_df.index,
+                open=chart_df['시가'],
+                high=chart_df['고가'],
+                low=chart_df['저가'],
+                close=chart_df['종가'],
                 increasing_line_color='red',
                 decreasing_line_color='blue',
                 name='주가'
             ))
 
             # 이동평균선
-            fig.add_trace(go.Scatter(
-                x=self.df.index,
-                y=self.df['5일선'],
+            fig.add_trace(scatter(
+                x=chart_df.index,
+                y=chart_df['5일선'],
                 line=dict(color='red', width=1),
                 name='5일 이동평균'
             ))
 
-            fig.add_trace(go.Scatter(
-                x=self.df.index,
-                y=self.df['40일선'],
+            fig.add_trace(scatter(
+                x=chart_df.index,
+                y=chart_df['40일선'],
                 line=dict(color='blue', width=1),
                 name='40일 이동평균'
             ))
 
-            # 매수 시그널 표시
-            buy_signals = self.df[self.df['Signal'] == 1]            
-
-            if not buy_signals.empty:
-                # 성공/실패 시그널 구분
-                success_signals = buy_signals[buy_signals.index.map(
-                    lambda x: self.df.loc[x:].iloc[1:self.signal_verify_days + 1]['종가'].max() > self.df.loc[x]['종가']
-                    if x < self.df.index[self.signal_verify_days * -1] else False
-                )]
-
-                failed_signals = buy_signals[buy_signals.index.map(
-                    lambda x: self.df.loc[x:].iloc[1:self.signal_verify_days + 1]['종가'].max() <= self.df.loc[x]['종가']
-                    if x < self.df.index[self.signal_verify_days * -1] else False
-                )]
-
-                # 성공 시그널 표시
-                if not success_signals.empty:
-                    fig.add_trace(go.Scatter(
-                        x=success_signals.index,
-                        y=success_signals['종가'],
-                        mode='markers',
-                        marker=dict(symbol='star', size=15, color='yellow'),
-                        name='성공 시그널'
-                    ))
-
-                # 실패 시그널 표시
-                if not failed_signals.empty:
-                    fig.add_trace(go.Scatter(
-                        x=failed_signals.index,
-                        y=failed_signals['종가'],
-                        mode='markers',
-                        marker=dict(symbol='x', size=12, color='white'),
-                        name='실패 시그널'
-                    ))
+            # 보조지표
+            for name in self.chart_indicators:
+                trace = scatter(x=chart_df.index, y=chart_df[name], line=dict(width=1), name=name)
+                if name in lower:
+                    fig.add_trace(trace, row=2, col=1)
+                else:
+                    fig.add_trace(trace)
+
+            # 매수 시그널 표시 (성과 분석에서 계산한 성공/실패 결과 재사용)
+            if self.signal_outcomes is None:
+                close = self.df['종가'].to_numpy(dtype=float)
+                self.signal_outcomes = evaluate_signals(close, self.df['Signal'].to_numpy(),
+                                                        forward_max(close, self.signal_verify_days))
+            outcome = self.signal_outcomes['outcome']
+            success_signals = self.df[outcome == 1]
+            failed_signals = self.df[outcome == 0]
+
+            # 성공 시그널 표시
+            if not success_signals.empty:
+                fig.add_trace(scatter(
+                    x=success_signals.index,
+                    y=success_signals['종가'],
+                    mode='markers',
+                    marker=dict(symbol='star', size=15, color='yellow'),
+                    name='성공 시그널'
+                ))
+
+            # 실패 시그널 표시
+            if not failed_signals.empty:
+                fig.add_trace(scatter(
+                    x=failed_signals.index,
+                    y=failed_signals['종가'],
+                    mode='markers',
+                    marker=dict(symbol='x', size=12, color='white'),
+                    name='실패 시그널'
+                ))
 
             # 차트 스타일링
             fig.update_layout(
@@ -300,10 +394,9 @@ class StockAnalyzer:
                 height=600
             )
 
+            if cache_key is not None:
+                _chart_cache.put(cache_key, fig.to_json())
             return fig
         except Exception as e:
             print(f"차트 생성 중 오류: {str(e)}")
             return None
-
-
-
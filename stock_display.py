@@ -1,141 +1,188 @@
 #@title ##**5.stock_display.py**
 # %%writefile stock_display.py
+import math
+from contextlib import nullcontext
+
+import pandas as pd
 import streamlit as st
 
+from diagnostics import stage
+
+# 상세 영역 한 페이지에 표시할 종목 수
+RESULTS_PER_PAGE = 10
+
 class StockDisplay:
     def __init__(self):
-        # Initialize all required session state variables
-        if 'current_progress' not in st.session_state:
-            st.session_state.current_progress = 0
-        if 'analysis_running' not in st.session_state:
-            st.session_state.analysis_running = False
-        if 'analysis_paused' not in st.session_state:
-            st.session_state.analysis_paused = False
-        if 'analysis_index' not in st.session_state:
-            st.session_state.analysis_index = 0
-        if 'current_stocks' not in st.session_state:
-            st.session_state.current_stocks = []
-        if 'analysis_results' not in st.session_state:
-            st.session_state.analysis_results = {}
-        if 'current_status_text' not in st.session_state:
-            st.session_state.current_status_text = ""
-
-        # Instance variables
-        self.result_placeholders = {}
-
-    def initialize_display(self):
-        # Create containers for UI elements
+        # 세션에는 백그라운드 분석 작업 ID만 보관
+        if 'analysis_job_id' not in st.session_state:
+            st.session_state.analysis_job_id = None
+
+    def initialize_display(self, job):
+        """제어 버튼과 진행률 영역 생성, '분석 시작'을 눌렀으면 True 반환"""
         progress_container = st.container()
         control_container = st.container()
+        state = job.state if job is not None else None
 
         with control_container:
-            col1, col2, col3 = st.columns(3)
+            col1, col2, col3, col4 = st.columns(4)
             with col1:
-                if st.button("분석 시작", key="start_button"):
-                    self._reset_analysis_state()
+                st.button("분석 시작", key="start_button", on_click=self._request_start)
             with col2:
                 if st.button("분석 일시정지",
                            key="pause_button",
-                           disabled=not st.session_state.analysis_running):
-                    st.session_state.analysis_paused = True
+                           disabled=state != 'running'):
+                    job.pause()
             with col3:
                 if st.button("분석 재시작",
                            key="resume_button",
-                           disabled=not st.session_state.analysis_paused):
-                    st.session_state.analysis_paused = False
-                    st.session_state.analysis_running = True
+                           disabled=state != 'paused'):
+                    job.resume()
+            with col4:
+                if st.button("분석 취소",
+                           key="cancel_button",
+                           disabled=state not in ('running', 'paused')):
+                    job.cancel()
 
         with progress_container:
-            self.progress_bar = st.progress(st.session_state.current_progress)
+            self.progress_bar = st.progress(0)
             self.progress_text = st.empty()
             self.status_text = st.empty()
 
-            if st.session_state.current_progress > 0:
-                self.progress_text.text(
-                    f"진행률: {st.session_state.current_progress*100:.1f}% "
-                    f"({st.session_state.analysis_index}/{len(st.session_state.current_stocks)})"
-                )
-                self.status_text.text(st.session_state.current_status_text)
-
-    def _reset_analysis_state(self):
-        st.session_state.analysis_running = True
-        st.session_state.analysis_paused = False
-        st.session_state.analysis_index = 0
-        st.session_state.current_progress = 0
-        st.session_state.current_status_text = ""
-        st.session_state.analysis_results = {}
-
-        st.session_state.current_stocks = []
-
-    def create_placeholders(self, selected_stocks):
-        self.result_placeholders.clear()
-        for stock in selected_stocks:
-            self.result_placeholders[stock] = st.empty()
-
-    def update_progress(self, current, total):
-        if not st.session_state.analysis_paused:
-            progress = (current + 1) / total
-            st.session_state.current_progress = progress
-            self.progress_bar.progress(progress)
-            self.progress_text.text(
-                f"진행률: {progress*100:.1f}% ({current+1}/{total})"
-            )
-            
-
-    def update_status(self, text):
-        if not st.session_state.analysis_paused:
-            st.session_state.current_status_text = text
-            self.status_text.text(text)
-
-
-    def _handle_start_analysis(self):
-        st.session_state.analysis_running = True
-        st.session_state.analysis_paused = False
-        st.session_state.analysis_index = 0
-        st.session_state.current_progress = 0
-        st.session_state.current_status_text = ""
-        st.session_state.analysis_results = {}
-        st.rerun()
-
-    def _handle_pause_analysis(self):
-        st.session_state.analysis_paused = True
-        st.rerun()
-
-    def _handle_resume_analysis(self):
-        st.session_state.analysis_paused = False
-        st.session_state.analysis_running = True
-        st.rerun()
-
-    def _display_current_state(self):
-        if st.session_state.current_progress > 0:
-            st.session_state.progress_bar.progress(st.session_state.current_progress)
-            st.session_state.progress_text.text(
-                f"진행률: {st.session_state.current_progress*100:.1f}% "
-                f"({st.session_state.analysis_index}/{len(st.session_state.current_stocks)})"
-            )
-            st.session_state.status_text.text(st.session_state.current_status_text)
-
-    def create_placeholders(self, selected_stocks):
-        self.result_placeholders = {stock: st.empty() for stock in selected_stocks}
-
-    def display_stock_result(self, selected_stock, analyzer, results, verify_days):
-        if selected_stock not in self.result_placeholders:
-            self.result_placeholders[selected_stock] = st.empty()
-
-        market_type = "KOSPI" if "[KOSPI]" in selected_stock else "KOSDAQ"
-        stock_name = selected_stock.split(":")[1].strip()
-
-        with self.result_placeholders[selected_stock].container():
-            with st.expander(
-                f"📊 [{market_type}] {stock_name} " +
-                ("(최근 매수 시그널)" if analyzer.has_recent_signal() else ""),
-                expanded=True
-            ):
-                chart_col, metrics_col = st.columns([2, 1])
-                with chart_col:
-                    st.plotly_chart(analyzer.plot_stock_chart(), use_container_width=True)
-                with metrics_col:
-                    self.display_metrics(results, verify_days)
+        # 재실행(st.rerun) 때 클릭이 중복 처리되지 않도록 콜백에서 한 번만 기록
+        return st.session_state.pop('analysis_start_requested', False)
+
+    def _request_start(self):
+        st.session_state.analysis_start_requested = True
+
+    def update_progress(self, snapshot):
+        """작업 스냅샷의 진행률/상태 표시"""
+        self.progress_bar.progress(snapshot['progress'])
+        self.progress_text.text(
+            f"진행률: {snapshot['progress']*100:.1f}% ({snapshot['completed']}/{snapshot['total']})"
+        )
+        self.status_text.text(snapshot['status_text'])
+
+    def display_worker_stats(self, worker_stats):
+        """프로세스 풀 워커별 처리량 표시"""
+        if not worker_stats:
+            return
+        with st.expander("워커별 처리량", expanded=False):
+            rows = [{
+                '워커(PID)': pid,
+                '처리 종목 수': stats['tickers'],
+                '처리 시간(초)': round(stats['seconds'], 2),
+                '종목/초': round(stats['tickers'] / stats['seconds'], 2) if stats['seconds'] > 0 else 0
+            } for pid, stats in sorted(worker_stats.items())]
+            st.dataframe(rows, use_container_width=True, hide_index=True)
+
+    def display_diagnostics(self, diagnostics, profiler=None):
+        """단계별 소요 시간과 pykrx 호출 수/응답 크기 (JSON lines 내보내기 포함)"""
+        if not diagnostics['stages'] and not diagnostics['krx']:
+            return
+        with st.expander("진단 정보", expanded=False):
+            stage_rows = [{
+                '단계': name,
+                '호출 수': stats['calls'],
+                '전체(초)': round(stats['seconds'], 3),
+                '평균(ms)': round(stats['seconds'] / stats['calls'] * 1000, 2) if stats['calls'] else 0,
+                '최대(ms)': round(stats['max'] * 1000, 2)
+            } for name, stats in sorted(diagnostics['stages'].items(), key=lambda item: -item[1]['seconds'])]
+            krx_rows = [{
+                'pykrx 함수': name,
+                '호출 수': stats['calls'],
+                '오류': stats['errors'],
+                '전체(초)': round(stats['seconds'], 3),
+                '응답 크기(KB)': round(stats['bytes'] / 1024, 1)
+            } for name, stats in sorted(diagnostics['krx'].items(), key=lambda item: -item[1]['calls'])]
+            if stage_rows:
+                st.dataframe(stage_rows, use_container_width=True, hide_index=True)
+            if krx_rows:
+                st.dataframe(krx_rows, use_container_width=True, hide_index=True)
+            client = diagnostics.get('client')
+            if client:
+                st.caption(f"KRX 요청 공유 (모든 세션): 요청 {client['requests']}회, 캐시 적중 {client['cache_hits']}회, "
+                           f"동시 요청 병합 {client['coalesced']}회, 실제 조회 {client['fetches']}회")
+            results = diagnostics.get('results')
+            if results:
+                st.caption(f"분석 결과 캐시 (모든 세션): 적중 {results['hits']}회, 미적중 {results['misses']}회")
+            # 내보내기 데이터는 요청했을 때만 만들어 재실행 비용을 늘리지 않음
+            if profiler is not None and st.toggle("JSON lines 내보내기", key="diagnostics_export"):
+                st.download_button("다운로드", profiler.to_jsonl(), file_name="diagnostics.jsonl",
+                                   mime="application/x-ndjson", key="diagnostics_download")
+
+    def display_memory_usage(self, memory):
+        """분석 작업의 결과/차트 데이터 메모리 사용량 표시"""
+        used = memory['records'] + memory['charts']
+        st.caption(
+            f"메모리 사용량: {used / 1024 / 1024:.1f}MB / {memory['budget'] / 1024 / 1024:.0f}MB "
+            f"(결과 {memory['records'] / 1024:.0f}KB, 차트 데이터 {memory['charts'] / 1024 / 1024:.1f}MB)"
+        )
+
+    def results_frame(self, records, verify_days):
+        """결과 레코드 요약 표 (행 순서는 records 순서와 같음)"""
+        return pd.DataFrame({
+            '종목': [record.name for record in records],
+            '시장': [record.market for record in records],
+            '최근 시그널': [record.recent_signal for record in records],
+            '매수 시그널': [int(record.metrics[0]) for record in records],
+            '성공률(%)': [record.metrics[3] for record in records],
+            '평균 수익률(%)': [record.metrics[4] for record in records],
+            '최대 수익률(%)': [record.metrics[5] for record in records],
+            '최대 손실률(%)': [record.metrics[7] for record in records],
+            f'{verify_days}일후 평균 수익률(%)': [record.metrics[-1] for record in records],
+        }).round(2)
+
+    def display_results(self, records, verify_days, load_analyzer, profiler=None):
+        """전체 결과 요약 표와 현재 페이지의 종목별 상세 표시
+
+        차트는 상세 영역에서 '차트 보기'를 켠 종목만 load_analyzer로 만들어
+        그리므로, 재실행 비용이 결과 수와 무관하게 한 페이지 분량으로 유지된다.
+        """
+        if not records:
+            return
+
+        table = self.results_frame(records, verify_days)
+        sort_col, order_col = st.columns([3, 1])
+        with sort_col:
+            sort_by = st.selectbox("정렬 기준", table.columns, index=4, key="result_sort")
+        with order_col:
+            descending = st.toggle("내림차순", value=True, key="result_sort_desc")
+        order = table.sort_values(sort_by, ascending=not descending, kind='stable').index
+        st.dataframe(table.loc[order], use_container_width=True, hide_index=True)
+
+        pages = max(1, math.ceil(len(records) / RESULTS_PER_PAGE))
+        if st.session_state.get('result_page', 1) > pages:
+            st.session_state.result_page = pages
+        page = st.number_input(f"페이지 (전체 {pages}페이지)", min_value=1, max_value=pages, step=1, key="result_page")
+        start = (page - 1) * RESULTS_PER_PAGE
+        for position in order[start:start + RESULTS_PER_PAGE]:
+            record = records[position]
+            with profiler.activate(record.ticker) if profiler is not None else nullcontext(), stage('결과 표시'):
+                self.display_stock_result(record, verify_days, load_analyzer)
+
+    def display_stock_result(self, record, verify_days, load_analyzer):
+        chart_key = f"chart_{record.selected_stock}"
+        with st.expander(
+            f"📊 [{record.market}] {record.name} " +
+            ("(최근 매수 시그널)" if record.recent_signal else ""),
+            expanded=st.session_state.get(chart_key, False)
+        ):
+            if not st.toggle("차트 보기", key=chart_key):
+                self.display_metrics(record.results, verify_days)
+                return
+
+            chart_col, metrics_col = st.columns([2, 1])
+            with chart_col:
+                with stage('분석기 재생성'):
+                    analyzer = load_analyzer(record)
+                if analyzer is None:
+                    st.warning("차트 데이터를 불러오지 못했습니다.")
+                else:
+                    with stage('차트 생성'):
+                        fig = analyzer.plot_stock_chart()
+                    st.plotly_chart(fig, use_container_width=True)
+            with metrics_col:
+                self.display_metrics(record.results, verify_days)
 
     def display_metrics(self, results, verify_days):
         col1, col2 = st.columns(2)
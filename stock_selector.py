@@ -3,7 +3,10 @@
 # stock_selector.py
 import streamlit as st
 from datetime import datetime, timedelta
-from pykrx import stock
+from stock_universe import get_universe
+from indicator_registry import default_registry
+from nightly_screen import (DEFAULT_DAEKUM_CAP_FILTER, DEFAULT_MARKET_CAP_FILTER, DEFAULT_PERIOD_DAYS,
+                            DEFAULT_VERIFY_DAYS)
 
 class StockSelector:
     def __init__(self):
@@ -17,19 +20,13 @@ class StockSelector:
         self.market_cap_filter = None  # 시가총액 필터 추가
         self.daekum_cap_filter = None  # 거래대금 필터 추가
         self.signal_verify_days = None  # 매수시그널 검증일수 추가        
+        self.use_process_pool = None  # 멀티코어(프로세스 풀) 실행 여부
+        self.chart_indicators = None  # 차트 보조지표
 
-    def get_all_stock_codes(self):
-        """코스피와 코스닥의 모든 종목 코드와 이름을 가져오는 함수"""
+    def get_all_stock_codes(self, market_filter="전체"):
+        """코스피와 코스닥의 모든 종목 코드와 이름을 가져오는 함수 (거래일 단위 캐시)"""
         try:
-            kospi_tickers = stock.get_market_ticker_list(market="KOSPI")
-            kosdaq_tickers = stock.get_market_ticker_list(market="KOSDAQ")
-
-            kospi_names = [f"[KOSPI] {ticker}: {stock.get_market_ticker_name(ticker)}"
-                          for ticker in kospi_tickers]
-            kosdaq_names = [f"[KOSDAQ] {ticker}: {stock.get_market_ticker_name(ticker)}"
-                          for ticker in kosdaq_tickers]
-
-            return kospi_names + kosdaq_names
+            return get_universe().get_stocks(market_filter)
         except Exception as e:
             st.error(f"종목 목록 조회 중 오류 발생: {str(e)}")
             return []
@@ -46,14 +43,11 @@ class StockSelector:
                 horizontal=True
             )
 
-            all_stocks = self.get_all_stock_codes()
-            filtered_stocks = [stock for stock in all_stocks if
-                            self.market_filter == "전체" or
-                            f"[{self.market_filter}]" in stock]
+            filtered_stocks = self.get_all_stock_codes(self.market_filter)
         with col2:
             self.start_date = st.date_input(
                 "시작일",
-                datetime.now() - timedelta(days=365)
+                datetime.now() - timedelta(days=DEFAULT_PERIOD_DAYS)
             ).strftime("%Y%m%d")
         with col3:
             self.end_date = st.date_input(
@@ -68,7 +62,7 @@ class StockSelector:
             self.market_cap_filter = st.select_slider(
                 "시가총액 필터 (억원)",
                 options=[0, 1000, 5000, 10000, 50000, 100000, 500000, 100000000],
-                value=(0, 100000000)
+                value=DEFAULT_MARKET_CAP_FILTER
             ) 
             
         with col2:   
@@ -76,7 +70,7 @@ class StockSelector:
             self.daekum_cap_filter = st.select_slider(
                 "거래대금 필터 (억원)",
                 options=[0, 5, 10, 20, 30, 50, 100, 500, 1000, 1500, 5000, 10000, 100000],
-                value=(0, 100000)
+                value=DEFAULT_DAEKUM_CAP_FILTER
             )             
         with col3:    
             # 매수시그널 검증일수 추가
@@ -84,16 +78,25 @@ class StockSelector:
                 "매수시그널 검증일수",
                 min_value=1,
                 max_value=20,
-                value=3,
+                value=DEFAULT_VERIFY_DAYS,
                 help="매수시그널 발생 후 수익률을 계산할 기간"
             )            
 
         # 분석 옵션 설정
-        col1, col2 = st.columns(2)
+        col1, col2, col3 = st.columns(3)
         with col1:
             self.show_all = st.checkbox("시그널이 없는 종목도 표시", value=True)
         with col2:
             self.show_recent_only = st.checkbox("최근 매수 시그널 종목만 표시", value=False)
+        with col3:
+            self.use_process_pool = st.checkbox("멀티코어 분석 (대량 종목용)", value=False,
+                                                help="종목을 묶음으로 나눠 CPU 코어 수만큼의 프로세스에서 분석")
+
+        # 차트 보조지표 (차트를 펼친 종목만 계산)
+        self.chart_indicators = st.multiselect(
+            "차트 보조지표",
+            list(default_registry.chart_options())
+        )
 
         # 종목 선택
         self.selected_stocks = st.multiselect(
@@ -102,7 +105,7 @@ class StockSelector:
         )
 
         if st.checkbox("현재 필터된 전체 종목 선택"):
-            self.selected_stocks = filtered_stocks
+            self.selected_stocks = list(filtered_stocks)
 
         return {
             'start_date': self.start_date,
@@ -112,7 +115,9 @@ class StockSelector:
             'selected_stocks': self.selected_stocks,
             'market_cap_filter': self.market_cap_filter,  # 시가총액 필터 추가
             'daekum_cap_filter': self.daekum_cap_filter,
-            'signal_verify_days': self.signal_verify_days  # 검증일수 추가            
+            'signal_verify_days': self.signal_verify_days,  # 검증일수 추가            
+            'use_process_pool': self.use_process_pool,
+            'chart_indicators': self.chart_indicators
         }
 
 
@@ -0,0 +1,155 @@
+#@title ##**7.stock_store.py**
+# %%writefile stock_store.py
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+DEFAULT_STORE_DIR = ".stock_cache"
+DATE_FORMAT = "%Y%m%d"
+
+
+def _to_date(value):
+    return datetime.strptime(value, DATE_FORMAT).date()
+
+
+def _to_str(value):
+    return value.strftime(DATE_FORMAT)
+
+
+def merge_intervals(intervals):
+    """겹치거나 인접한 날짜 구간 병합 (구간은 양 끝 포함)"""
+    merged = []
+    for start, end in sorted((_to_date(s), _to_date(e)) for s, e in intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [[_to_str(s), _to_str(e)] for s, e in merged]
+
+
+def missing_intervals(intervals, start_date, end_date):
+    """보유 구간을 제외하고 새로 조회해야 하는 날짜 구간 계산"""
+    gaps = []
+    cursor = _to_date(start_date)
+    end = _to_date(end_date)
+    for s, e in merge_intervals(intervals):
+        s, e = _to_date(s), _to_date(e)
+        if e < cursor:
+            continue
+        if s > end:
+            break
+        if s > cursor:
+            gaps.append([_to_str(cursor), _to_str(s - timedelta(days=1))])
+        cursor = max(cursor, e + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        gaps.append([_to_str(cursor), _to_str(end)])
+    return gaps
+
+
+def _no_trading_days(calendar, start_date, end_date):
+    """지난 구간에 거래일이 없다고 확인되면 True (오늘이 포함되었거나 확인할 수 없으면 False)"""
+    if calendar is None or end_date >= _to_str(datetime.now().date()):
+        return False
+    try:
+        return len(calendar(start_date, end_date)) == 0
+    except Exception as e:
+        print(f"거래일 확인 중 오류 발생: {str(e)}")
+        return False
+
+
+class StockDataStore:
+    """종목별 일자 데이터 로컬 저장소
+
+    데이터 종류(kind)별로 종목마다 parquet 파일 하나와 보유 구간을 기록한
+    메타 파일을 둔다. 요청 구간 중 보유하지 않은 구간만 fetcher로 조회해
+    병합하므로, 하루 뒤 재조회 시에는 새로 추가된 거래일만 내려받는다.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+
+    def _paths(self, kind, ticker):
+        directory = os.path.join(self.root, kind)
+        return (os.path.join(directory, f"{ticker}.parquet"),
+                os.path.join(directory, f"{ticker}.json"))
+
+    def _lock(self, kind, ticker):
+        with self._locks_guard:
+            return self._locks.setdefault((self.root, kind, ticker), threading.Lock())
+
+    def _read(self, kind, ticker):
+        data_path, meta_path = self._paths(kind, ticker)
+        if not os.path.exists(meta_path) or not os.path.exists(data_path):
+            return None, {'intervals': [], 'version': 0}
+        with open(meta_path, "r", encoding='utf-8') as file:
+            meta = json.load(file)
+        return pd.read_parquet(data_path), meta
+
+    def _write(self, kind, ticker, df, meta):
+        data_path, meta_path = self._paths(kind, ticker)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        # 다른 세션이 읽는 도중 깨진 파일을 보지 않도록 임시 파일에 쓴 뒤 교체
+        df.to_parquet(data_path + ".tmp")
+        os.replace(data_path + ".tmp", data_path)
+        with open(meta_path + ".tmp", "w", encoding='utf-8') as file:
+            json.dump(meta, file)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def get(self, kind, ticker, start_date, end_date, fetcher, calendar=None):
+        """저장소 조회 후 부족한 구간만 fetcher(start, end)로 보충
+
+        보유 구간으로는 데이터를 받은 구간과, calendar(start, end)로 거래일이
+        없다고 확인한 지난 구간만 기록한다. 빈 응답은 조회 실패(요청 제한 등)일
+        수 있으므로 거래일이 있거나 확인할 수 없으면 다음에 다시 조회한다.
+        """
+        with self._lock(kind, ticker):
+            df, meta = self._read(kind, ticker)
+            gaps = missing_intervals(meta['intervals'], start_date, end_date)
+
+            if gaps:
+                previous = df
+                frames = [] if df is None else [df]
+                covered = []
+                for gap_start, gap_end in gaps:
+                    fetched = fetcher(gap_start, gap_end)
+                    if fetched is not None and not fetched.empty:
+                        frames.append(fetched)
+                        covered.append([gap_start, gap_end])
+                    elif fetched is not None and _no_trading_days(calendar, gap_start, gap_end):
+                        covered.append([gap_start, gap_end])
+
+                if frames:
+                    df = pd.concat(frames)
+                    df = df[~df.index.duplicated(keep='last')].sort_index()
+
+                # 오늘 데이터는 장중 변동이 있으므로 보유 구간으로 기록하지 않음
+                yesterday = _to_str(datetime.now().date() - timedelta(days=1))
+                covered = [[s, min(e, yesterday)] for s, e in covered if s <= yesterday]
+                intervals = merge_intervals(meta['intervals'] + covered)
+                # 다시 받은 데이터가 같으면 버전을 올리지 않음 (버전으로 계산 결과 캐시를 무효화하므로)
+                changed = df is not None and (previous is None or not df.equals(previous))
+                if changed or intervals != meta['intervals']:
+                    meta = {'intervals': intervals, 'version': meta['version'] + int(changed)}
+                    if df is not None:
+                        self._write(kind, ticker, df, meta)
+
+            if df is None or df.empty:
+                return df
+            return df.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)].copy()
+
+    def version(self, kind, ticker):
+        """저장된 데이터가 바뀔 때마다 증가하는 버전 번호"""
+        _, meta_path = self._paths(kind, ticker)
+        try:
+            with open(meta_path, "r", encoding='utf-8') as file:
+                return json.load(file)['version']
+        except (OSError, ValueError, KeyError):
+            return 0
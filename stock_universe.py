@@ -0,0 +1,91 @@
+#@title ##**8.stock_universe.py**
+# %%writefile stock_universe.py
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+from krx_fetcher import get_default_client
+from stock_store import DEFAULT_STORE_DIR
+
+MARKETS = ("KOSPI", "KOSDAQ")
+
+
+def latest_trading_day_key(now=None):
+    """주말을 제외한 가장 최근 거래일(YYYYMMDD)"""
+    day = (now or datetime.now()).date()
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return day.strftime("%Y%m%d")
+
+
+class StockUniverse:
+    """거래일별 종목 목록 서비스
+
+    `[시장] 티커: 종목명` 목록을 거래일마다 한 번만 만들어 디스크에 저장하고,
+    프로세스 내 모든 세션이 같은 인스턴스를 공유한다.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._day = None
+        self._by_market = {}
+
+    def _path(self, day):
+        return os.path.join(self.root, "universe", f"{day}.json")
+
+    def _build(self):
+        # 여러 세션이 동시에 목록을 만들어도 KRX 조회는 한 번만 (KrxClient single-flight)
+        krx = get_default_client()
+        by_market = {}
+        for market in MARKETS:
+            tickers = krx.get_market_ticker_list(market=market)
+            by_market[market] = [f"[{market}] {ticker}: {krx.get_market_ticker_name(ticker)}"
+                                 for ticker in tickers]
+        return by_market
+
+    def _load(self, day):
+        path = self._path(day)
+        if os.path.exists(path):
+            with open(path, "r", encoding='utf-8') as file:
+                return json.load(file)
+
+        by_market = self._build()
+        if not any(by_market.values()):
+            raise ValueError("KRX에서 종목 목록을 받지 못했습니다.")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "w", encoding='utf-8') as file:
+            json.dump(by_market, file, ensure_ascii=False)
+        os.replace(path + ".tmp", path)
+        return by_market
+
+    def _ensure_loaded(self):
+        day = latest_trading_day_key()
+        if self._day == day:
+            return
+        with self._lock:
+            if self._day != day:
+                by_market = self._load(day)
+                self._by_market = {market: tuple(by_market[market]) for market in MARKETS}
+                self._by_market["전체"] = self._by_market["KOSPI"] + self._by_market["KOSDAQ"]
+                self._day = day
+
+    def get_stocks(self, market_filter="전체"):
+        """시장 필터에 해당하는 종목 목록 반환 (재생성 없이 캐시된 튜플)"""
+        self._ensure_loaded()
+        return self._by_market[market_filter]
+
+
+_universe = None
+_universe_lock = threading.Lock()
+
+
+def get_universe():
+    """프로세스 전역 StockUniverse 인스턴스"""
+    global _universe
+    if _universe is None:
+        with _universe_lock:
+            if _universe is None:
+                _universe = StockUniverse()
+    return _universe
@@ -0,0 +1,89 @@
+#@title ##**18.sweep_display.py**
+# %%writefile sweep_display.py
+import plotly.graph_objects as go
+import streamlit as st
+from datetime import datetime, timedelta
+
+from param_sweep import DEFAULT_GRID, METRIC_COLUMNS, PARAM_COLUMNS, heatmap_table
+
+GRID_LABELS = {
+    '단기': "단기 이동평균 (일)",
+    '장기': "장기 이동평균 (일)",
+    '수급기간': "수급 평균 기간 (일)",
+    '수급기준': "수급 기준 (억원)",
+    '검증일수': "검증일수"
+}
+
+
+class SweepDisplay:
+    def __init__(self):
+        if 'sweep_results' not in st.session_state:
+            st.session_state.sweep_results = None
+
+    def show_inputs(self):
+        """시장/기간과 파라미터 탐색 범위 입력, (시장, 시작일, 종료일, 탐색 범위) 반환"""
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            market_filter = st.radio("시장 선택", ["전체", "KOSPI", "KOSDAQ"], horizontal=True, key="sweep_market")
+        with col2:
+            start_date = st.date_input("시작일", datetime.now() - timedelta(days=365), key="sweep_start").strftime("%Y%m%d")
+        with col3:
+            end_date = st.date_input("종료일", datetime.now(), key="sweep_end").strftime("%Y%m%d")
+
+        st.write("### 탐색 범위 (쉼표로 구분)")
+        grid = {}
+        columns = st.columns(len(PARAM_COLUMNS))
+        for column, name in zip(columns, PARAM_COLUMNS):
+            with column:
+                text = st.text_input(GRID_LABELS[name], ", ".join(str(v) for v in DEFAULT_GRID[name]), key=f"sweep_{name}")
+            try:
+                grid[name] = [float(v) if name == '수급기준' else int(v) for v in text.split(",") if v.strip()]
+            except ValueError:
+                st.error(f"{GRID_LABELS[name]}: 숫자를 쉼표로 구분해 입력해주세요.")
+                return market_filter, start_date, end_date, None
+            if not grid[name] or min(grid[name]) < (0 if name == '수급기준' else 1):
+                st.error(f"{GRID_LABELS[name]}: 올바른 값을 입력해주세요.")
+                return market_filter, start_date, end_date, None
+        return market_filter, start_date, end_date, grid
+
+    def display_results(self, results):
+        """파라미터 두 축의 히트맵과 상위 조합 표시"""
+        if results is None or results.empty:
+            st.warning("평가할 파라미터 조합이 없습니다.")
+            return
+
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            x = st.selectbox("가로축", PARAM_COLUMNS, index=0, key="sweep_x")
+        with col2:
+            y = st.selectbox("세로축", [name for name in PARAM_COLUMNS if name != x], index=0, key="sweep_y")
+        with col3:
+            value = st.selectbox("지표", ['성공률', '평균_수익률', '기간_평균_수익률'], key="sweep_value")
+        with col4:
+            min_signals = st.number_input("최소 시그널 수", min_value=1, value=20, key="sweep_min_signals")
+
+        table = heatmap_table(results, x, y, value, min_signals)
+        if table.empty:
+            st.warning("최소 시그널 수를 만족하는 조합이 없습니다.")
+        else:
+            fig = go.Figure(go.Heatmap(
+                z=table.to_numpy(),
+                x=[str(v) for v in table.columns],
+                y=[str(v) for v in table.index],
+                colorscale='RdYlGn',
+                text=table.round(2).to_numpy(),
+                texttemplate="%{text}",
+                colorbar=dict(title=value)
+            ))
+            fig.update_layout(
+                template='plotly_dark',
+                xaxis_title=GRID_LABELS[x],
+                yaxis_title=GRID_LABELS[y],
+                height=500
+            )
+            st.caption(f"칸마다 나머지 파라미터 중 {value}이(가) 가장 높은 조합의 값")
+            st.plotly_chart(fig, use_container_width=True)
+
+        st.write("### 상위 조합")
+        top = results[results['전체_매수_시그널'] >= min_signals].sort_values(value, ascending=False).head(20)
+        st.dataframe(top[PARAM_COLUMNS + METRIC_COLUMNS].round(2), use_container_width=True, hide_index=True)
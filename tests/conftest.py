@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import indicator_registry  # noqa: E402
+import job_runner  # noqa: E402
+import krx_fetcher  # noqa: E402
+from fake_krx import FakeKrx  # noqa: E402
+from krx_fetcher import KrxClient, TokenBucket  # noqa: E402
+
+
+@pytest.fixture
+def fake_krx(tmp_path, monkeypatch):
+    """가짜 KRX를 전역 클라이언트로 쓰고 로컬 저장소는 임시 디렉터리에 만듦"""
+    monkeypatch.chdir(tmp_path)
+    fake = FakeKrx(30, "20230101", "20241231")
+    monkeypatch.setattr(krx_fetcher, "_default_client",
+                        KrxClient(source=fake, limiter=TokenBucket(rate=1e9, capacity=1e9)))
+    # 다른 테스트가 같은 가짜 데이터로 계산한 결과를 재사용하지 않도록 공유 캐시 비움
+    for cache in (job_runner._result_cache, job_runner._panel_cache, indicator_registry._indicator_cache):
+        cache.clear()
+    return fake
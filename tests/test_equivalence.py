@@ -0,0 +1,115 @@
+"""시장 패널/로컬 저장소/사전 필터/최근 구간 확인 경로가 종목별 StockAnalyzer 결과와 같은지 확인"""
+import numpy as np
+import pytest
+
+import job_runner
+from job_runner import AnalysisJob, analyze_selected_stock, load_market_panel
+from market_panel import MarketPanelLoader
+from stock_analyzer import StockAnalyzer
+from stock_store import StockDataStore
+
+START, END = "20230301", "20241115"
+
+
+def _selection(fake, **options):
+    selection = {
+        'start_date': START, 'end_date': END, 'show_all': True, 'show_recent_only': False,
+        'market_cap_filter': (0, 100000000), 'daekum_cap_filter': (0, 100000), 'signal_verify_days': 3,
+        'selected_stocks': [f"[KOSPI] {ticker}: 가짜종목{ticker}" for ticker in fake.tickers],
+        'use_process_pool': False
+    }
+    selection.update(options)
+    return selection
+
+
+def _per_ticker(selection):
+    """사전 필터/패널 없이 종목마다 StockAnalyzer로 분석한 {선택 항목: 결과}"""
+    results = {}
+    for stock in selection['selected_stocks']:
+        _, df, result = analyze_selected_stock(stock, dict(selection, tail_window=False))
+        if df is not None and result is not None:
+            results[stock] = result
+    return results
+
+
+def _assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for stock, results in expected.items():
+        assert actual[stock] == pytest.approx(results, rel=1e-12), stock
+
+
+def _job(selection):
+    job = AnalysisJob(selection).start()
+    job.wait()
+    snapshot = job.snapshot()
+    assert snapshot['state'] == 'done', snapshot['status_text']
+    return {record.selected_stock: record.results for record in snapshot['results']}
+
+
+def test_panel_matches_per_ticker(fake_krx):
+    selection = _selection(fake_krx)
+    panel = load_market_panel(START, END)
+    signals = 0
+    for stock in selection['selected_stocks']:
+        ticker = stock.split(":")[0].split("]")[1].strip()
+        expected_analyzer, expected_df, expected = analyze_selected_stock(stock, selection)
+        analyzer, df, results = analyze_selected_stock(stock, selection, panel)
+        assert (results is None) == (expected is None)
+        if expected is None:
+            continue
+        assert results == pytest.approx(expected, rel=1e-12), ticker
+        assert np.array_equal(df['Signal'].to_numpy(), expected_df['Signal'].to_numpy()), ticker
+        assert analyzer.has_recent_signal() == expected_analyzer.has_recent_signal()
+        signals += expected['전체_매수_시그널']
+    assert signals > 0
+
+
+def test_incremental_store_matches_single_fetch(fake_krx, tmp_path):
+    krx = job_runner.get_default_client()
+    for ticker in fake_krx.tickers[:5]:
+        incremental = StockAnalyzer(store=StockDataStore(str(tmp_path / "incremental")))
+        # 나눠서 조회해 구간을 이어 붙인 저장소와 한 번에 조회한 저장소의 분석 결과가 같아야 함
+        for end in ("20230630", "20240315", END):
+            incremental.analyze_stock(ticker, START, end)
+        _, incremental_results = incremental.analyze_stock(ticker, START, END)
+
+        single = StockAnalyzer(store=StockDataStore(str(tmp_path / "single")), krx=krx)
+        _, single_results = single.analyze_stock(ticker, START, END)
+        assert incremental_results == single_results
+        assert incremental.df.equals(single.df)
+
+
+def test_filter_pushdown_matches_per_ticker(fake_krx):
+    # 시가총액/거래대금 모두 일부 종목만 통과하는 범위
+    panel = MarketPanelLoader().load(START, END)
+    caps = np.sort(panel.fields['시가총액'][-1] / 100000000)
+    selection = _selection(fake_krx, market_cap_filter=(caps[5], caps[-5]), daekum_cap_filter=(1, 100000))
+
+    expected = _per_ticker(selection)
+    assert 0 < len(expected) < len(selection['selected_stocks'])
+    _assert_same(_job(selection), expected)
+
+
+def test_tail_window_matches_full_history(fake_krx, monkeypatch):
+    # 최근 시그널이 있는 종목이 생기는 종료일 (시그널은 과거 값만 쓰므로 전체 구간 패널에서 골라도 같음)
+    panel = load_market_panel(START, END)
+    signal_days = panel.dates[panel.fields['Signal'].sum(axis=1) > 0]
+    end_dates = [day.strftime("%Y%m%d") for day in signal_days[-3:]] + [END]
+    # 분석 작업의 최근 구간 패널 확인도 적은 종목으로 하도록 기준을 낮춤
+    monkeypatch.setattr(job_runner, "BULK_PANEL_THRESHOLD", 10)
+
+    recent = 0
+    for end_date in end_dates:
+        selection = _selection(fake_krx, end_date=end_date, show_recent_only=True)
+        expected = _per_ticker(selection)
+        recent += len(expected)
+
+        # 종목별 분석기의 최근 구간 확인 (판단할 수 없으면 None)
+        for stock in selection['selected_stocks']:
+            ticker = stock.split(":")[0].split("]")[1].strip()
+            tail = StockAnalyzer().recent_signal_in_tail(ticker, START, end_date)
+            if tail is not None:
+                assert tail == (stock in expected), (ticker, end_date)
+
+        _assert_same(_job(selection), expected)
+    assert recent > 0
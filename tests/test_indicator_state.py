@@ -0,0 +1,40 @@
+import numpy as np
+
+from indicator_state import IndicatorState, bar_inputs
+from stock_analyzer import StockAnalyzer
+
+COLUMNS = ['5일선', '40일선', '10일_매수금액']
+
+
+def _replay(bars, restore_at=None):
+    """봉을 하나씩 반영한 지표/시그널 (restore_at번째 봉에서 저장 후 다시 불러옴)"""
+    state = IndicatorState()
+    rows = []
+    for i, (date, row) in enumerate(bars.iterrows()):
+        if i == restore_at:
+            state = IndicatorState.from_dict(state.to_dict())
+        state.extend(bars.loc[[date]])
+        rows.append([state.last[name] for name in COLUMNS + ['Signal']])
+    return np.array(rows, dtype=float)
+
+
+def test_incremental_matches_full_recompute(fake_krx):
+    start, end = "20230101", "20241231"
+    signals = 0
+    for ticker in fake_krx.tickers[:10]:
+        analyzer = StockAnalyzer()
+        df = analyzer.get_stock_data(ticker, start, end)
+        analyzer.calculate_technical_indicators()
+        analyzer.generate_signals()
+        bars = bar_inputs(fake_krx.get_market_ohlcv_by_date(start, end, ticker),
+                          fake_krx.get_market_trading_volume_by_date(start, end, ticker))
+        replayed = _replay(bars, restore_at=len(bars) // 2)
+        assert bars.index.equals(df.index)
+
+        # 누적합 갱신은 전체 재계산(pandas rolling)과 부동소수점 반올림 순서가 달라 값은 근사적으로만 같음
+        expected = df[COLUMNS].to_numpy(dtype=float)
+        assert np.allclose(replayed[:, :3], expected, rtol=1e-9, atol=1e-9, equal_nan=True)
+        # 시그널은 정확히 같아야 함
+        assert np.array_equal(replayed[:, 3].astype(int), df['Signal'].to_numpy())
+        signals += int(df['Signal'].sum())
+    assert signals > 0
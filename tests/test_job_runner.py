@@ -0,0 +1,141 @@
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import pytest
+
+import job_runner
+import krx_fetcher
+from analysis_record import SESSION_MEMORY_BUDGET
+from fake_krx import FakeKrx, FakeKrxError
+from job_runner import AnalysisJob, analyze_record
+from krx_fetcher import KrxClient, TokenBucket
+
+START, END = "20230301", "20241115"
+
+
+def _selection(fake, **options):
+    selection = {
+        'start_date': START, 'end_date': END, 'show_all': True, 'show_recent_only': False,
+        'market_cap_filter': (0, 100000000), 'daekum_cap_filter': (0, 100000), 'signal_verify_days': 3,
+        'selected_stocks': [f"[KOSPI] {ticker}: 가짜종목{ticker}" for ticker in fake.tickers],
+        'use_process_pool': False
+    }
+    selection.update(options)
+    return selection
+
+
+def test_failed_market_cap_lookup_is_error_not_cached_rejection(fake_krx, monkeypatch):
+    monkeypatch.setattr(krx_fetcher, "_default_client",
+                        KrxClient(source=fake_krx, limiter=TokenBucket(rate=1e9, capacity=1e9), max_retries=0))
+    stock = _selection(fake_krx)['selected_stocks'][0]
+    lookup = fake_krx.get_market_cap_by_date
+
+    def failing(*args, **kwargs):
+        raise FakeKrxError("injected KRX error")
+
+    monkeypatch.setattr(fake_krx, "get_market_cap_by_date", failing)
+    with pytest.raises(RuntimeError, match="시가총액 조회 실패"):
+        analyze_record(stock, _selection(fake_krx))
+    assert len(job_runner._result_cache) == 0
+
+    # KRX가 복구되면 캐시된 제외 결과 없이 다시 분석
+    monkeypatch.setattr(fake_krx, "get_market_cap_by_date", lookup)
+    record, key = analyze_record(stock, _selection(fake_krx))
+    assert record is not None and key is not None
+
+
+def test_live_records_expire(fake_krx, monkeypatch):
+    today = datetime.now().strftime("%Y%m%d")
+    fake = FakeKrx(5, "20230101", today)
+    monkeypatch.setattr(krx_fetcher, "_default_client",
+                        KrxClient(source=fake, limiter=TokenBucket(rate=1e9, capacity=1e9)))
+    stock = _selection(fake_krx)['selected_stocks'][0]
+    past = _selection(fake_krx)
+    live = _selection(fake_krx, end_date=today)
+
+    first, _ = analyze_record(stock, live)
+    assert analyze_record(stock, live)[0] is first
+    analyze_record(stock, past)
+
+    # 오늘이 포함된 결과는 LIVE_PANEL_TTL이 지나면 다시 분석 (지난 기간 결과는 계속 사용)
+    monkeypatch.setattr(job_runner, "LIVE_PANEL_TTL", -1)
+    job_runner._result_cache.clear()
+    first, _ = analyze_record(stock, live)
+    assert analyze_record(stock, live)[0] is not first
+    past_record, _ = analyze_record(stock, past)
+    assert analyze_record(stock, past)[0] is past_record
+
+
+def _finished_job(selection):
+    job = AnalysisJob(selection).start()
+    assert job.wait(120)
+    return job
+
+
+def test_progress_and_memory_usage(fake_krx):
+    job = AnalysisJob(_selection(fake_krx))
+    assert job.progress == 0
+    job.start().wait(120)
+    snapshot = job.snapshot()
+    assert snapshot['state'] == 'done', snapshot['status_text']
+    assert snapshot['completed'] == snapshot['total'] == len(fake_krx.tickers)
+    assert snapshot['progress'] == 1.0
+    assert snapshot['results'] and not snapshot['errors']
+
+    # 결과 크기와 차트 분석기 예산은 결과를 보관할 때 정해지고, 상태 조회는 값을 바꾸지 않음
+    records = sum(record.nbytes() for record in snapshot['results'])
+    assert snapshot['memory']['records'] == records
+    assert job._reloaded.max_bytes == SESSION_MEMORY_BUDGET - records
+    job._reloaded.max_bytes = 123
+    job.snapshot()
+    assert job._reloaded.max_bytes == 123
+
+
+def test_pause_resume_and_cancel(fake_krx):
+    fake_krx.latency = 0.02
+    job = AnalysisJob(_selection(fake_krx)).start()
+    job.pause()
+    assert job.snapshot()['state'] == 'paused'
+    # 진행 중이던 종목만 마치고 멈춤
+    time.sleep(1.0)
+    completed = job.completed
+    time.sleep(0.5)
+    assert job.completed == completed < job.total
+
+    job.cancel()
+    assert job.wait(30)
+    snapshot = job.snapshot()
+    assert snapshot['state'] == 'cancelled'
+    assert snapshot['completed'] < snapshot['total']
+
+    # 재개한 작업은 끝까지 분석
+    job = AnalysisJob(_selection(fake_krx)).start()
+    job.pause()
+    job.resume()
+    assert job.wait(120)
+    assert job.snapshot()['state'] == 'done'
+    assert job.completed == job.total
+
+
+def test_process_pool_matches_threads(fake_krx, monkeypatch):
+    # 패널 파일을 워커가 메모리 매핑으로 여는 경로도 확인하도록 기준을 낮춤
+    monkeypatch.setattr(job_runner, "BULK_PANEL_THRESHOLD", 10)
+    saved = []
+    mkdtemp = tempfile.mkdtemp
+    monkeypatch.setattr(job_runner.tempfile, "mkdtemp", lambda **kwargs: saved.append(mkdtemp(**kwargs)) or saved[-1])
+
+    threads = _finished_job(_selection(fake_krx))
+    expected = {record.selected_stock: record.results for record in threads.snapshot()['results']}
+    assert expected
+
+    # 캐시된 결과를 쓰지 않고 워커 프로세스가 다시 분석
+    job_runner._result_cache.clear()
+    processes = _finished_job(_selection(fake_krx, use_process_pool=True))
+    snapshot = processes.snapshot()
+    assert snapshot['state'] == 'done', snapshot['status_text']
+    assert {record.selected_stock: record.results for record in snapshot['results']} == expected
+    assert sum(stats['tickers'] for stats in snapshot['worker_stats'].values()) == len(fake_krx.tickers)
+    # 공유용 패널 파일은 작업이 끝나면 삭제
+    assert len(saved) == 1 and not os.path.exists(saved[0])
@@ -0,0 +1,173 @@
+"""KrxClient 요청 제한/재시도/차단기/single-flight와 KrxFetchPool 확인 (가짜 시계와 가짜 KRX 사용)"""
+import threading
+
+import pytest
+
+from fake_krx import FakeKrx, FakeKrxError
+from krx_fetcher import CircuitBreaker, CircuitOpenError, KrxClient, KrxFetchPool, TokenBucket
+
+START, END = "20240101", "20240331"
+
+
+class FakeClock:
+    """sleep을 부르면 그만큼 시간이 흐르는 가짜 시계"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def _client(fake, clock, **options):
+    options.setdefault('limiter', TokenBucket(rate=1e9, capacity=1e9, clock=clock, sleep=clock.sleep))
+    return KrxClient(source=fake, sleep=clock.sleep, **options)
+
+
+def test_token_bucket_limits_rate():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=3, clock=clock, sleep=clock.sleep)
+    for _ in range(3):
+        bucket.acquire()
+    # 몰아서 쓸 수 있는 capacity개까지는 기다리지 않음
+    assert clock.sleeps == []
+
+    for _ in range(4):
+        bucket.acquire()
+    # 이후에는 초당 rate개: 4개를 더 받는 데 2초
+    assert clock.now == pytest.approx(2.0)
+    assert clock.sleeps == pytest.approx([0.5] * 4)
+
+    # 쉬는 동안 쌓이는 토큰은 capacity까지만
+    clock.now += 100
+    for _ in range(3):
+        bucket.acquire()
+    assert len(clock.sleeps) == 4
+
+
+def test_retries_with_exponential_backoff():
+    clock = FakeClock()
+    fake = FakeKrx(3, START, END, error_rate=1.0)
+    client = _client(fake, clock, breaker=CircuitBreaker(threshold=100, clock=clock),
+                     max_retries=3, backoff_base=0.5, backoff_max=1.5)
+
+    with pytest.raises(FakeKrxError):
+        client.get_market_ohlcv_by_date(START, END, fake.tickers[0])
+    # 첫 시도 + 재시도 3번, 대기는 재시도 전마다 base * 2^n (최대 backoff_max)에 0.5~1배 지터
+    assert fake.calls == 4
+    assert len(clock.sleeps) == 3
+    for seconds, delay in zip(clock.sleeps, [0.5, 1.0, 1.5]):
+        assert delay * 0.5 <= seconds <= delay
+
+    # 실패한 응답은 캐시하지 않음
+    with pytest.raises(FakeKrxError):
+        client.get_market_ohlcv_by_date(START, END, fake.tickers[0])
+    assert fake.calls == 8
+
+
+def test_retries_until_success():
+    clock = FakeClock()
+    fake = FakeKrx(20, START, END, error_rate=0.3, seed=1)
+    client = _client(fake, clock, breaker=CircuitBreaker(threshold=100, clock=clock), max_retries=10)
+
+    retried = 0
+    for ticker in fake.tickers:
+        calls, sleeps = fake.calls, len(clock.sleeps)
+        df = client.get_market_ohlcv_by_date(START, END, ticker)
+        attempts = fake.calls - calls
+        # 실패한 시도마다 한 번 대기한 뒤 다시 요청
+        assert len(clock.sleeps) - sleeps == attempts - 1
+        assert not df.empty
+        retried += attempts > 1
+    assert retried > 0
+
+
+def test_circuit_breaker_opens_and_recovers():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, reset_timeout=10, clock=clock)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+    # 차단 시간이 지나면 시험 요청 하나만 허용, 실패하면 다시 차단
+    clock.now += 10
+    assert breaker.state == 'half-open'
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    # 시험 요청이 성공하면 다시 열림
+    clock.now += 10
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    breaker.before_call()
+
+
+def test_open_breaker_stops_retries():
+    clock = FakeClock()
+    fake = FakeKrx(3, START, END, error_rate=1.0)
+    breaker = CircuitBreaker(threshold=2, reset_timeout=30, clock=clock)
+    client = _client(fake, clock, breaker=breaker, max_retries=5, backoff_base=0.1)
+
+    with pytest.raises(CircuitOpenError):
+        client.get_market_ohlcv_by_date(START, END, fake.tickers[0])
+    # 두 번 연속 실패한 뒤에는 KRX에 더 요청하지 않음
+    assert fake.calls == 2
+    with pytest.raises(CircuitOpenError):
+        client.get_market_ohlcv_by_date(START, END, fake.tickers[1])
+    assert fake.calls == 2
+
+    clock.now += 30
+    fake.error_rate = 0.0
+    assert not client.get_market_ohlcv_by_date(START, END, fake.tickers[1]).empty
+    assert breaker.state == 'closed'
+
+
+def test_concurrent_identical_requests_fetch_once():
+    fake = FakeKrx(3, START, END, latency=0.2)
+    client = KrxClient(source=fake, limiter=TokenBucket(rate=1e9, capacity=1e9))
+    ticker = fake.tickers[0]
+
+    results = list(KrxFetchPool(max_workers=8).imap_unordered(
+        lambda _: client.get_market_ohlcv_by_date(START, END, ticker), range(8)))
+    # 동시에 들어온 같은 요청은 한 번만 조회하고 나머지는 그 결과(또는 캐시)를 받음
+    assert fake.calls == 1
+    assert client.stats['fetches'] == 1
+    assert client.stats['coalesced'] + client.stats['cache_hits'] == 7
+    assert client.stats['coalesced'] > 0
+    assert all(error is None for _, _, error in results)
+    first = results[0][1]
+    assert all(df.equals(first) for _, df, _ in results)
+    # 호출한 쪽마다 복사본을 받으므로 수정해도 다른 결과에 영향이 없음
+    assert len({id(df) for _, df, _ in results}) == 8
+
+
+def test_fetch_pool_runs_concurrently_and_reports_errors():
+    barrier = threading.Barrier(4, timeout=5)
+
+    def work(item):
+        # 작업 4개가 동시에 실행 중이어야 통과
+        barrier.wait()
+        if item % 2:
+            raise ValueError(item)
+        return item * 10
+
+    results = list(KrxFetchPool(max_workers=4).imap_unordered(work, range(4)))
+    assert sorted(item for item, _, _ in results) == [0, 1, 2, 3]
+    for item, value, error in results:
+        if item % 2:
+            assert isinstance(error, ValueError) and value is None
+        else:
+            assert error is None and value == item * 10
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+
+from analysis_record import AnalysisRecord
+from nightly_screen import NightlyScreenStore, default_selection
+
+FRIDAY_NIGHT = datetime(2024, 11, 15, 16, 0)
+
+
+def _record(stock):
+    ticker = stock.split(":")[0].split("]")[1].strip()
+    empty = np.array([])
+    return AnalysisRecord(stock, ticker, "20231116", "20241115", 3, np.zeros(9), False,
+                          empty, empty, empty, empty)
+
+
+def _publish(tmp_path, fake):
+    stocks = [f"[KOSPI] {ticker}: 가짜종목{ticker}" for ticker in fake.tickers]
+    store = NightlyScreenStore(root=str(tmp_path))
+    selection = default_selection(stocks, FRIDAY_NIGHT)
+    store.publish(selection, fake.tickers, [_record(stock) for stock in stocks], now=FRIDAY_NIGHT)
+    return store, stocks
+
+
+def test_next_day_default_session_uses_snapshot(tmp_path, fake_krx):
+    store, stocks = _publish(tmp_path, fake_krx)
+    for now in (datetime(2024, 11, 16, 10, 0),   # 토요일
+                datetime(2024, 11, 18, 9, 0)):   # 월요일 장 마감 전
+        snapshot, records = store.lookup(default_selection(stocks, now), now=now)
+        assert snapshot is not None
+        assert [record.selected_stock for record in records] == stocks
+
+
+def test_snapshot_not_used_after_next_close_or_other_filters(tmp_path, fake_krx):
+    store, stocks = _publish(tmp_path, fake_krx)
+    monday_close = datetime(2024, 11, 18, 16, 0)
+    assert store.lookup(default_selection(stocks, monday_close), now=monday_close) == (None, None)
+
+    saturday = datetime(2024, 11, 16, 10, 0)
+    selection = dict(default_selection(stocks, saturday), market_cap_filter=(100, 1000))
+    assert store.lookup(selection, now=saturday) == (None, None)
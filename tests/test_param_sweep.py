@@ -0,0 +1,55 @@
+"""파라미터 스윕의 현재 전략 조합이 종목별 StockAnalyzer 성과와 같은지 확인"""
+import numpy as np
+import pytest
+
+from job_runner import load_market_panel
+from param_sweep import METRIC_COLUMNS, ParameterSweep
+from stock_analyzer import StockAnalyzer
+
+START, END = "20230301", "20241115"
+
+# StockAnalyzer(SignalEngine 기본값)와 같은 5/40일선, 10일 수급 10억, 3일 검증
+CURRENT_PARAMS = {'단기': 5, '장기': 40, '수급기간': 10, '수급기준': 10, '검증일수': 3}
+
+
+def _analyze(ticker):
+    """필터 없이 종목별 경로(로컬 저장소)로 분석한 StockAnalyzer"""
+    analyzer = StockAnalyzer()
+    analyzer.set_display_option(True, False, (0, 100000000), CURRENT_PARAMS['검증일수'], (0, 100000))
+    df, results = analyzer.analyze_stock(ticker, START, END)
+    assert results is not None, (ticker, analyzer.error)
+    return analyzer
+
+
+def _metrics(results):
+    return dict(zip(METRIC_COLUMNS, results.values()))
+
+
+def test_sweep_matches_per_ticker_final_results(fake_krx):
+    panel = load_market_panel(START, END)
+    profits, successes = [], 0
+    for ticker in fake_krx.tickers:
+        analyzer = _analyze(ticker)
+        outcomes = analyzer.signal_outcomes
+        valid = outcomes['valid']
+        ticker_results = {'수익률_리스트': outcomes['profit'][valid], '성공_시그널': int(outcomes['outcome'][valid].sum())}
+
+        # 종목 하나만 스윕하면 그 종목의 최종 결과와 같아야 함
+        swept = ParameterSweep(panel, [ticker])
+        swept._prepare_outcomes({CURRENT_PARAMS['검증일수']})
+        expected = _metrics(analyzer.calculate_final_results(ticker_results))
+        actual = swept.evaluate(CURRENT_PARAMS)
+        assert {name: actual[name] for name in METRIC_COLUMNS} == pytest.approx(expected, rel=1e-12), ticker
+
+        profits.append(ticker_results['수익률_리스트'])
+        successes += ticker_results['성공_시그널']
+
+    # 전체 종목 스윕은 종목별 시그널을 모두 모은 최종 결과와 같아야 함 (합산 순서만 다름)
+    analyzer = StockAnalyzer()
+    expected = _metrics(analyzer.calculate_final_results(
+        {'수익률_리스트': np.concatenate(profits), '성공_시그널': successes}))
+    results = ParameterSweep(panel, fake_krx.tickers).run({name: [value] for name, value in CURRENT_PARAMS.items()})
+    assert len(results) == 1
+    row = results.iloc[0]
+    assert {name: row[name] for name in METRIC_COLUMNS} == pytest.approx(expected, rel=1e-12)
+    assert expected['전체_매수_시그널'] > 0
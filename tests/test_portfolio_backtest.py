@@ -0,0 +1,58 @@
+"""포트폴리오 시뮬레이션의 현금/총자산 계산, 매도 연기, 최대 보유 종목 수 확인"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from market_panel import MarketPanel
+from portfolio_backtest import PortfolioBacktest, PortfolioConfig
+
+NAN = np.nan
+
+
+def _panel():
+    """종목 A/B/C가 첫날 모두 시그널(10일 수급 A > C > B), A는 4번째 날 거래 없음"""
+    opens = np.array([
+        [100, 100, 100],
+        [100, 40, 50],
+        [110, 40, 55],
+        [NAN, 40, 60],
+        [120, 40, 65],
+        [130, 40, 70],
+    ], dtype=float)
+    signal = np.zeros(opens.shape)
+    signal[0] = 1
+    strength = np.zeros(opens.shape)
+    strength[0] = [3, 1, 2]
+    return MarketPanel(pd.bdate_range("2024-01-01", periods=len(opens)), ['A', 'B', 'C'],
+                       {'시가': opens, '종가': opens.copy(), 'Signal': signal, '10일_매수금액': strength})
+
+
+def _config(max_positions):
+    return PortfolioConfig(initial_capital=1000000, max_positions=max_positions, allocation='equal',
+                           holding_days=2, commission=0, tax=0, slippage=0)
+
+
+def test_zero_cost_accounting_and_deferred_sell():
+    result = PortfolioBacktest(_panel()).run(_config(2))
+
+    # 2일째 시가에 A(100원 5000주), C(50원 10000주)를 50만원씩 매수해 현금 0
+    # 4일째 C는 60원에 매도하고, 시가가 없는 A는 5일째 120원으로 매도를 미룸 (평가는 직전 종가 110원)
+    expected = [1000000, 1000000, 5000 * 110 + 10000 * 55, 10000 * 60 + 5000 * 110, 1200000, 1200000]
+    assert result.equity.to_numpy() == pytest.approx(expected)
+    assert result.positions.tolist() == [0, 2, 2, 1, 0, 0]
+
+    trades = result.trades
+    assert trades['티커'].tolist() == ['C', 'A']
+    assert trades['매도일'].tolist() == [result.equity.index[3], result.equity.index[4]]
+    assert trades['수량'].tolist() == [10000, 5000]
+    assert trades['수익률'].to_numpy() == pytest.approx([20, 20])
+    assert trades['손익'].to_numpy() == pytest.approx([100000, 100000])
+    assert result.summary['총_수익률'] == pytest.approx(20)
+
+
+def test_max_positions_buys_strongest_signals_first():
+    # 자리가 모자라면 10일 수급 금액이 큰 종목부터 매수
+    for max_positions, bought in [(1, ['A']), (2, ['A', 'C']), (3, ['A', 'C', 'B'])]:
+        result = PortfolioBacktest(_panel()).run(_config(max_positions))
+        assert result.positions.max() == len(bought)
+        assert sorted(result.trades['티커']) == sorted(bought)
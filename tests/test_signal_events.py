@@ -0,0 +1,27 @@
+import numpy as np
+
+from signal_events import SignalEventStore
+
+PARAMS = "5/40/10/10"
+
+
+def test_unresolved_reanalysis_keeps_resolved_outcome(tmp_path):
+    store = SignalEventStore(str(tmp_path / "events.db"))
+    ranges = {'000001': ("20230101", "20231231")}
+    store.upsert(PARAMS, 3, [('000001', '20231228', 17000.0, 17970.0, 5.705882, 1.0)], ranges)
+    # 종료일을 20231228로 다시 분석하면 같은 시그널의 검증 결과가 아직 없음 (NaN)
+    store.upsert(PARAMS, 3, [('000001', '20231228', 17000.0, np.nan, np.nan, np.nan)],
+                 {'000001': ("20230101", "20231228")})
+
+    events = store.events("20231201", "20231231", verify_days=3, params=PARAMS)
+    assert len(events) == 1
+    row = events.iloc[0]
+    assert row['최고가'] == 17970.0
+    assert row['수익률'] == 5.705882
+    assert row['성공'] == 1
+
+    # 검증되지 않았던 시그널은 결과가 나오면 채워짐
+    store.upsert(PARAMS, 3, [('000001', '20231229', 18000.0, np.nan, np.nan, np.nan)], ranges)
+    store.upsert(PARAMS, 3, [('000001', '20231229', 18000.0, 17500.0, -2.777778, 0.0)], ranges)
+    row = store.events("20231229", "20231229", verify_days=3, params=PARAMS).iloc[0]
+    assert (row['최고가'], row['성공']) == (17500.0, 0)
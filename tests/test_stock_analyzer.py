@@ -0,0 +1,39 @@
+"""차트 캐시가 저장소 데이터 버전을 따라 무효화되는지 확인"""
+import stock_analyzer
+from stock_analyzer import StockAnalyzer
+from stock_store import StockDataStore
+
+START, END = "20230301", "20241115"
+
+
+def _chart(ticker):
+    analyzer = StockAnalyzer()
+    analyzer.set_display_option(True, False, (0, 100000000), 3, (0, 100000))
+    df, results = analyzer.analyze_stock(ticker, START, END)
+    assert results is not None, analyzer.error
+    return analyzer, analyzer.plot_stock_chart()
+
+
+def _candles(fig):
+    return next(trace for trace in fig.data if trace.type == 'candlestick')
+
+
+def test_chart_cache_follows_store_version(fake_krx):
+    stock_analyzer._chart_cache.clear()
+    ticker = fake_krx.tickers[0]
+    analyzer, first = _chart(ticker)
+    assert first is not None
+    key = analyzer._chart_cache_key()
+    assert _chart(ticker)[0]._chart_cache_key() == key
+    assert len(stock_analyzer._chart_cache) == 1
+
+    # 마지막 거래일/종가/봉 개수는 그대로 두고 과거 종가만 수정 (수정주가 반영 등)
+    store = StockDataStore()
+    df, meta = store._read('ohlcv', ticker)
+    df.iloc[len(df) // 2, df.columns.get_loc('종가')] *= 1.1
+    store._write('ohlcv', ticker, df, dict(meta, version=meta['version'] + 1))
+
+    updated, second = _chart(ticker)
+    assert updated._chart_cache_key() != key
+    assert len(stock_analyzer._chart_cache) == 2
+    assert list(_candles(second).close) != list(_candles(first).close)
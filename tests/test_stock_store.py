@@ -0,0 +1,46 @@
+import pandas as pd
+
+from stock_store import StockDataStore
+
+
+def _calendar(start, end):
+    return list(pd.bdate_range(start, end))
+
+
+class FlakyFetcher:
+    """첫 번째 조회는 실패(빈 응답/None), 이후에는 정상 데이터를 반환"""
+
+    def __init__(self, failure):
+        self.failure = failure
+        self.calls = []
+
+    def __call__(self, start, end):
+        self.calls.append((start, end))
+        if len(self.calls) == 1:
+            return self.failure
+        days = pd.bdate_range(start, end)
+        return pd.DataFrame({'종가': range(1, len(days) + 1)}, index=days, dtype=float)
+
+
+def test_failed_fetch_is_not_recorded_as_covered(tmp_path):
+    for failure in (None, pd.DataFrame(columns=['종가'])):
+        store = StockDataStore(str(tmp_path / str(failure is None)))
+        fetcher = FlakyFetcher(failure)
+        store.get('ohlcv', '000001', '20240102', '20240131', fetcher, _calendar)
+        store.get('ohlcv', '000001', '20240101', '20240131', fetcher, _calendar)
+        df = store.get('ohlcv', '000001', '20240101', '20240131', fetcher, _calendar)
+        # 실패한 구간은 다시 조회해 채우고, 채운 뒤에는 조회하지 않음
+        assert fetcher.calls[1] == ('20240101', '20240131')
+        assert len(fetcher.calls) == 2
+        assert len(df) == len(pd.bdate_range('20240101', '20240131'))
+
+
+def test_empty_range_without_trading_days_is_covered(tmp_path):
+    store = StockDataStore(str(tmp_path))
+    fetcher = FlakyFetcher(None)
+    fetcher.calls.append(None)  # 첫 조회부터 정상 데이터
+    store.get('ohlcv', '000001', '20240102', '20240105', fetcher, _calendar)
+    # 주말 구간은 빈 응답이지만 거래일이 없으므로 보유 구간으로 기록
+    store.get('ohlcv', '000001', '20240102', '20240107', fetcher, _calendar)
+    store.get('ohlcv', '000001', '20240102', '20240107', fetcher, _calendar)
+    assert fetcher.calls[1:] == [('20240102', '20240105'), ('20240106', '20240107')]